@@ -1,68 +1,33 @@
-import datetime
-from typing import List, Dict
+import os
 
+from history import DEFAULT_ARCHIVE_AFTER_DAYS
+from pricing import PricingEngine, load_rules
+from records import format_fare
+from reservation_service import ReservationService, ReservationError, SeatUnavailableError
+from storage import DurableStore
+from validation import (AIRPORTS, ORIGIN, airport_name, block_minutes, format_minutes,
+                        is_valid_customer_id, is_valid_flight_no, is_valid_telephone,
+                        parse_booking_id, validate_date, validate_time)
 
-class FlightReservationSystem:
-    def __init__(self):
-        self.flights = []
-        self.customers = []
-        self.bookings = []
-        
-        # Default credentials
-        self.username = "Staff"
-        self.password = "Cloud123"
-        
-        # Initialize default flights
-        self.initialize_default_flights()
-    
-    def initialize_default_flights(self):
-        """Initialize the three default flights as specified in the coursework"""
-        tomorrow = (datetime.datetime.now() + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
-        
-        # Default flight schedule
-        default_flights = [
-            {
-                'flight_no': "JFK001",
-                'departure_from': "JFK",
-                'arrival_to': "Orlando",
-                'departure_date': tomorrow,
-                'departure_time': "06:30",
-                'economy_seats': 20,
-                'business_seats': 20,
-                'economy_fare': 500,
-                'business_fare': 1000,
-                'economy_booked': 0,
-                'business_booked': 0
-            },
-            {
-                'flight_no': "JFK002",
-                'departure_from': "JFK",
-                'arrival_to': "Miami",
-                'departure_date': tomorrow,
-                'departure_time': "14:00",
-                'economy_seats': 20,
-                'business_seats': 20,
-                'economy_fare': 500,
-                'business_fare': 1000,
-                'economy_booked': 0,
-                'business_booked': 0
-            },
-            {
-                'flight_no': "JFK003",
-                'departure_from': "JFK",
-                'arrival_to': "Los Angeles",
-                'departure_date': tomorrow,
-                'departure_time': "20:30",
-                'economy_seats': 20,
-                'business_seats': 20,
-                'economy_fare': 500,
-                'business_fare': 1000,
-                'economy_booked': 0,
-                'business_booked': 0
-            }
-        ]
+# Directory holding the write-ahead log and snapshots between runs
+DATA_DIR = "reservation_data"
+
+# Optional fare rules in the pricing.FareRules.to_dict() layout
+FARE_RULES_FILE = os.path.join(DATA_DIR, "fare_rules.json")
+
+# Bookings shown per screen in view_bookings
+BOOKINGS_PER_PAGE = 20
+
+
+class FlightReservationSystem(ReservationService):
+    """Interactive staff menus on top of the reservation service"""
+
+    def __init__(self, store=None, pricing=None):
+        super().__init__(store, pricing=pricing)
         
-        self.flights.extend(default_flights)
+        # Initialize default flights on first run only
+        if not self.flight_count() and not self.archived_flight_count():
+            self.initialize_default_flights()
     
     def display_header(self, title):
         """Display a consistent header for all screens"""
@@ -72,19 +37,11 @@ class FlightReservationSystem:
     
     def validate_date(self, date_str):
         """Validate date format (YYYY-MM-DD)"""
-        try:
-            datetime.datetime.strptime(date_str, "%Y-%m-%d")
-            return True
-        except ValueError:
-            return False
+        return validate_date(date_str)
     
     def validate_time(self, time_str):
         """Validate time format (HH:MM)"""
-        try:
-            datetime.datetime.strptime(time_str, "%H:%M")
-            return True
-        except ValueError:
-            return False
+        return validate_time(time_str)
     
     def staff_login(self):
         """Handle staff login with validation"""
@@ -94,7 +51,7 @@ class FlightReservationSystem:
             username = input("Username: ").strip()
             password = input("Password: ").strip()
             
-            if username == self.username and password == self.password:
+            if self.authenticate(username, password):
                 print("\nLogin successful!")
                 return True
             
@@ -111,10 +68,12 @@ class FlightReservationSystem:
             print("3. Search for available flights")
             print("4. Book a flight")
             print("5. View booking details")
-            print("6. Exit")
+            print("6. Cancel a booking")
+            print("7. Plan a trip with connections")
+            print("8. Exit")
             
             try:
-                choice = int(input("\nEnter your choice (1-6): "))
+                choice = int(input("\nEnter your choice (1-8): "))
                 
                 if choice == 1:
                     self.add_flight()
@@ -127,10 +86,14 @@ class FlightReservationSystem:
                 elif choice == 5:
                     self.view_bookings()
                 elif choice == 6:
+                    self.cancel_booking()
+                elif choice == 7:
+                    self.plan_trip_menu()
+                elif choice == 8:
                     print("Thank you for using CloudFare Airlines!")
                     break
                 else:
-                    print("Invalid choice. Please enter a number between 1-6.")
+                    print("Invalid choice. Please enter a number between 1-8.")
             except ValueError:
                 print("Please enter a valid number!")
     
@@ -143,31 +106,35 @@ class FlightReservationSystem:
             flight_no = ""
             while True:
                 flight_no = input("Flight No (JFKxxx): ").strip().upper()
-                if not (flight_no.startswith('JFK') and flight_no[3:].isdigit() and len(flight_no) == 6):
+                if not is_valid_flight_no(flight_no):
                     print("Invalid flight number format. Must be JFK followed by 3 digits (e.g., JFK001)")
                     continue
                 
-                if any(f['flight_no'] == flight_no for f in self.flights):
+                if self.get_flight(flight_no):
                     print("Flight number already exists!")
                     continue
                 
                 break  # Valid and unique flight number
             
-            # Departure validation (must be JFK) with while loop
+            # Departure airport validation with while loop
             departure_from = ""
             while True:
-                departure_from = input("Departure From (must be JFK): ").strip().upper()
-                if departure_from != "JFK":
-                    print("All flights must depart from JFK!")
+                departure_from = airport_name(input(f"Departure From ({'/'.join(AIRPORTS)}, default {ORIGIN}): ")
+                                              or ORIGIN)
+                if not departure_from:
+                    print(f"Invalid departure airport. Must be {', '.join(AIRPORTS)}")
                     continue
                 break
             
             # Destination validation with while loop
             arrival_to = ""
             while True:
-                arrival_to = input("Arrival To (Orlando/Miami/Los Angeles): ").strip()
-                if arrival_to not in ["Orlando", "Miami", "Los Angeles"]:
-                    print("Invalid destination. Must be Orlando, Miami, or Los Angeles")
+                arrival_to = airport_name(input(f"Arrival To ({'/'.join(AIRPORTS)}): "))
+                if not arrival_to:
+                    print(f"Invalid destination. Must be {', '.join(AIRPORTS)}")
+                    continue
+                if arrival_to == departure_from:
+                    print("Destination must differ from the departure airport")
                     continue
                 break
             
@@ -189,6 +156,20 @@ class FlightReservationSystem:
                     continue
                 break
             
+            # Flight duration with validation loop
+            duration_minutes = block_minutes(departure_from, arrival_to)
+            while True:
+                try:
+                    duration_minutes = int(input(f"Flight duration in minutes (default {duration_minutes}): ")
+                                           or duration_minutes)
+                except ValueError:
+                    print("Invalid number entered for the duration!")
+                    continue
+                if duration_minutes <= 0:
+                    print("Flight duration must be positive")
+                    continue
+                break
+            
             # Seat and fare information with while loops
             economy_seats = 70
             business_seats = 30
@@ -210,22 +191,13 @@ class FlightReservationSystem:
             while True:
                 confirm = input("Add this flight? (Yes/No): ").strip().lower()
                 if confirm in ['yes', 'y']:
-                    new_flight = {
-                        'flight_no': flight_no,
-                        'departure_from': departure_from,
-                        'arrival_to': arrival_to,
-                        'departure_date': departure_date,
-                        'departure_time': departure_time,
-                        'economy_seats': economy_seats,
-                        'business_seats': business_seats,
-                        'economy_fare': economy_fare,
-                        'business_fare': business_fare,
-                        'economy_booked': 0,
-                        'business_booked': 0
-                    }
-                    
-                    self.flights.append(new_flight)
-                    print("Flight added successfully!")
+                    try:
+                        self.create_flight(flight_no, arrival_to, departure_date, departure_time,
+                                           economy_seats, business_seats, economy_fare, business_fare,
+                                           departure_from, duration_minutes)
+                        print("Flight added successfully!")
+                    except ReservationError as e:
+                        print(e)
                     break
                 elif confirm in ['no', 'n']:
                     print("Flight addition cancelled.")
@@ -246,11 +218,11 @@ class FlightReservationSystem:
             customer_id = ""
             while True:
                 customer_id = input("Customer ID (Cxxx): ").strip().upper()
-                if not (customer_id.startswith('C') and customer_id[1:].isdigit() and len(customer_id) == 4):
+                if not is_valid_customer_id(customer_id):
                     print("Invalid format. Must be C followed by 3 digits (e.g., C001)")
                     continue
                 
-                if any(c['customer_id'] == customer_id for c in self.customers):
+                if self.get_customer(customer_id):
                     print("Customer ID already exists! Please choose another.")
                     continue
                 
@@ -272,7 +244,13 @@ class FlightReservationSystem:
                 if not passport_no:
                     print("Passport number is required!")
                     continue
-                break
+                
+                existing = self.find_customer(passport_no)
+                if existing:
+                    print(f"Passport number already registered to customer {existing.customer_id}!")
+                    continue
+                
+                break  # Valid and unique passport number
             
             # Address validation with while loop
             address = ""
@@ -287,7 +265,7 @@ class FlightReservationSystem:
             telephone = ""
             while True:
                 telephone = input("Telephone Number (minimum 7 digits): ").strip()
-                if not telephone.isdigit() or len(telephone) < 7:
+                if not is_valid_telephone(telephone):
                     print("Invalid telephone number! Must be at least 7 digits.")
                     continue
                 break
@@ -296,16 +274,11 @@ class FlightReservationSystem:
             while True:
                 confirm = input("Register this customer? (Yes/No): ").strip().lower()
                 if confirm in ['yes', 'y']:
-                    new_customer = {
-                        'customer_id': customer_id,
-                        'name': name,
-                        'passport_no': passport_no,
-                        'address': address,
-                        'telephone': telephone
-                    }
-                    
-                    self.customers.append(new_customer)
-                    print(f"Customer {name} registered successfully with ID {customer_id}!")
+                    try:
+                        self.register(customer_id, name, passport_no, address, telephone)
+                        print(f"Customer {name} registered successfully with ID {customer_id}!")
+                    except ReservationError as e:
+                        print(e)
                     break
                 elif confirm in ['no', 'n']:
                     print("Customer registration cancelled.")
@@ -320,98 +293,90 @@ class FlightReservationSystem:
 
     def search_flights(self):
         """Search for available flights with continuous validation"""
-        self.display_header("Search Available Flights")
-        
         try:
-            # Initialize search criteria
-            departure_date = ""
-            departure_time = ""
-            destination = ""
-            travel_class = ""
-            
-            # Date input with validation loop
-            while True:
-                departure_date = input("Departure Date (YYYY-MM-DD, press Enter to skip): ").strip()
-                if departure_date == "":
-                    break  # Skip if empty
-                if self.validate_date(departure_date):
-                    break
-                print("Invalid date format. Please use YYYY-MM-DD or press Enter to skip")
-            
-            # Time input with validation loop
             while True:
-                departure_time = input("Departure Time (HH:MM, press Enter to skip): ").strip()
-                if departure_time == "":
-                    break  # Skip if empty
-                if self.validate_time(departure_time):
-                    break
-                print("Invalid time format. Please use HH:MM or press Enter to skip")
-            
-            # Destination input with validation loop
-            while True:
-                destination = input("Destination (Orlando/Miami/Los Angeles, press Enter to skip): ").strip()
-                if destination == "":
-                    break  # Skip if empty
-                if destination in ["Orlando", "Miami", "Los Angeles"]:
-                    break
-                print("Invalid destination. Must be Orlando, Miami, or Los Angeles (or press Enter to skip)")
-            
-            # Travel class input with validation loop
-            while True:
-                travel_class = input("Class (Economy/Business, press Enter to skip): ").strip().lower()
-                if travel_class in ["economy", "business", ""]:
-                    break
-                print("Invalid class. Must be Economy or Business (or press Enter to skip)")
-            
-            # Find matching flights
-            matching_flights = []
-            for flight in self.flights:
-                match = True
+                self.display_header("Search Available Flights")
                 
-                if departure_date and flight['departure_date'] != departure_date:
-                    match = False
-                if departure_time and flight['departure_time'] != departure_time:
-                    match = False
-                if destination and flight['arrival_to'] != destination:
-                    match = False
+                # Initialize search criteria
+                departure_date = ""
+                departure_time = ""
+                destination = ""
+                travel_class = ""
                 
-                if match:
-                    matching_flights.append(flight)
-            
-            # Display results
-            if not matching_flights:
-                print("\nNo flights found matching your criteria.")
-            else:
-                print("\nAvailable Flights:")
-                print("-" * 80)
-                print(f"{'Flight No':<10}{'Departure':<20}{'Destination':<15}{'Economy':<15}{'Business':<15}")
-                print(f"{'':<10}{'Date/Time':<20}{'':<15}{'Seats':<15}{'Seats':<15}")
-                print("-" * 80)
+                # Date input with validation loop
+                while True:
+                    departure_date = input("Departure Date (YYYY-MM-DD, press Enter to skip): ").strip()
+                    if departure_date == "":
+                        break  # Skip if empty
+                    if self.validate_date(departure_date):
+                        break
+                    print("Invalid date format. Please use YYYY-MM-DD or press Enter to skip")
+                
+                # Time input with validation loop
+                while True:
+                    departure_time = input("Departure Time (HH:MM, press Enter to skip): ").strip()
+                    if departure_time == "":
+                        break  # Skip if empty
+                    if self.validate_time(departure_time):
+                        break
+                    print("Invalid time format. Please use HH:MM or press Enter to skip")
+                
+                # Destination input with validation loop
+                while True:
+                    destination = input(f"Destination ({'/'.join(AIRPORTS)}, press Enter to skip): ").strip()
+                    if destination == "":
+                        break  # Skip if empty
+                    if airport_name(destination):
+                        destination = airport_name(destination)
+                        break
+                    print(f"Invalid destination. Must be {', '.join(AIRPORTS)} (or press Enter to skip)")
+                
+                # Travel class input with validation loop
+                while True:
+                    travel_class = input("Class (Economy/Business, press Enter to skip): ").strip().lower()
+                    if travel_class in ["economy", "business", ""]:
+                        break
+                    print("Invalid class. Must be Economy or Business (or press Enter to skip)")
+                
+                # Find matching flights through the search index
+                matching_flights = self.search(departure_date, departure_time, destination, travel_class)
                 
-                for flight in matching_flights:
-                    avail_economy = flight['economy_seats'] - flight['economy_booked']
-                    avail_business = flight['business_seats'] - flight['business_booked']
+                # Display results
+                if not matching_flights:
+                    print("\nNo flights found matching your criteria.")
+                else:
+                    print("\nAvailable Flights:")
+                    print("-" * 90)
+                    print(f"{'Flight No':<10}{'Departure':<20}{'Destination':<15}{'Economy':<22}{'Business':<22}")
+                    print(f"{'':<10}{'Date/Time':<20}{'':<15}{'Seats / Fare':<22}{'Seats / Fare':<22}")
+                    print("-" * 90)
                     
-                    # Only show if matches class filter or no filter
-                    if (not travel_class) or \
-                    (travel_class == "economy" and avail_economy > 0) or \
-                    (travel_class == "business" and avail_business > 0):
+                    for flight in matching_flights:
+                        columns = []
+                        for cabin in ("economy", "business"):
+                            available = flight.available(cabin)
+                            if available > 0:
+                                fare = self.quote_fare(flight, cabin)
+                                columns.append(f"{available} / ${format_fare(fare.fare_cents)} {fare.bucket}")
+                            else:
+                                columns.append("Full")
                         
-                        print(f"{flight['flight_no']:<10}"
-                            f"{flight['departure_date']} {flight['departure_time']:<20}"
-                            f"{flight['arrival_to']:<15}"
-                            f"{avail_economy if avail_economy > 0 else 'Full':<15}"
-                            f"{avail_business if avail_business > 0 else 'Full':<15}")
-            
-            # Continue prompt
-            while True:
-                choice = input("\nSearch again? (Yes/No): ").strip().lower()
-                if choice in ['yes', 'y']:
-                    return self.search_flights()  # Recursive call for new search
-                elif choice in ['no', 'n']:
-                    break
-                else:
+                        print(f"{flight.flight_no:<10}"
+                            f"{flight.departure_date} {flight.departure_time:<20}"
+                            f"{flight.arrival_to:<15}"
+                            f"{columns[0]:<22}"
+                            f"{columns[1]:<22}")
+                
+                # Continue prompt
+                choice = ""
+                while True:
+                    choice = input("\nSearch again? (Yes/No): ").strip().lower()
+                    if choice in ['yes', 'y', 'no', 'n']:
+                        break
                     print("Please enter Yes or No")
+                
+                if choice in ['no', 'n']:
+                    break
                     
         except Exception as e:
             print(f"An error occurred: {e}")
@@ -433,12 +398,12 @@ class FlightReservationSystem:
                     print("Booking cancelled.")
                     return
                 
-                flight = next((f for f in self.flights if f['flight_no'] == flight_no), None)
+                flight = self.get_flight(flight_no)
                 
                 if not flight:
                     print("Flight not found! Available flights:")
-                    for f in self.flights:
-                        print(f"{f['flight_no']} - {f['arrival_to']} ({f['departure_date']} {f['departure_time']})")
+                    for f in self.iter_flights():
+                        print(f"{f.flight_no} - {f.arrival_to} ({f.departure_date} {f.departure_time})")
                     continue
                 
                 break  # Valid flight selected
@@ -452,7 +417,7 @@ class FlightReservationSystem:
                     print("Booking cancelled.")
                     return
                 
-                customer = next((c for c in self.customers if c['passport_no'] == passport_no), None)
+                customer = self.find_customer(passport_no)
                 
                 if not customer:
                     print("Customer not found! Please register first or try another passport number.")
@@ -471,66 +436,73 @@ class FlightReservationSystem:
                 
                 break  # Valid class selected
             
-            # Check seat availability
-            if travel_class == "economy":
-                if flight['economy_booked'] >= flight['economy_seats']:
-                    print("No economy seats available on this flight!")
+            # Seat selection from the cabin's seat map
+            cabin = flight.cabin(travel_class)
+            if cabin.available() > 0:
+                print(f"\n{travel_class.title()} seats (. free, X taken):")
+                for line in cabin.chart():
+                    print(line)
+            
+            # Hold the chosen seat while the summary is shown
+            while True:
+                seat = ""
+                if cabin.available() > 0:
+                    seat = input("Seat (e.g. 12C, press Enter for the first free seat): ").strip().upper()
+                    if seat and cabin.cabin.index(seat) is None:
+                        print(f"Invalid seat. {travel_class.title()} seats are rows "
+                              f"{cabin.cabin.first_row}-{cabin.cabin.last_row}, seats {cabin.cabin.layout}")
+                        continue
+                try:
+                    hold = self.hold_seat(flight.flight_no, passport_no, travel_class, seat=seat)
+                    break
+                except SeatUnavailableError as e:
+                    print(e)
+                    if seat and cabin.available() > 0:
+                        continue  # Taken in the meantime; pick another
+                    self.offer_waitlist(flight.flight_no, passport_no, travel_class)
                     input("Press Enter to continue...")
                     return
-                fare = flight['economy_fare']
-            else:
-                if flight['business_booked'] >= flight['business_seats']:
-                    print("No business seats available on this flight!")
+                except ReservationError as e:
+                    print(e)
                     input("Press Enter to continue...")
                     return
-                fare = flight['business_fare']
-            
-            # Display booking summary
-            print("\nBooking Summary:")
-            print("-" * 40)
-            print(f"Flight: {flight['flight_no']} to {flight['arrival_to']}")
-            print(f"Date: {flight['departure_date']} at {flight['departure_time']}")
-            print(f"Passenger: {customer['name']} ({passport_no})")
-            print(f"Class: {travel_class.title()}")
-            print(f"Fare: ${fare}")
-            print("-" * 40)
-            
-            # Confirmation with validation loop
-            while True:
-                confirm = input("\nConfirm booking? (Yes/No): ").strip().lower()
+            
+            try:
+                # Display booking summary
+                print("\nBooking Summary:")
+                print("-" * 40)
+                print(f"Flight: {flight.flight_no} to {flight.arrival_to}")
+                print(f"Date: {flight.departure_date} at {flight.departure_time}")
+                print(f"Passenger: {customer.name} ({passport_no})")
+                print(f"Class: {travel_class.title()}")
+                print(f"Seat: {hold.seat_label}")
+                print(f"Fare: ${format_fare(hold.fare_cents)} "
+                      f"(base fare ${format_fare(flight.fare_cents(hold.travel_class))})")
+                print(f"Seat held for {self.holds.ttl // 60:.0f} minutes")
+                print("-" * 40)
                 
-                if confirm in ['yes', 'y']:
-                    # Create booking
-                    booking_id = f"B{len(self.bookings) + 1:03d}"
-                    new_booking = {
-                        'booking_id': booking_id,
-                        'flight_no': flight['flight_no'],
-                        'customer_id': customer['customer_id'],
-                        'passport_no': passport_no,
-                        'customer_name': customer['name'],
-                        'departure_date': flight['departure_date'],
-                        'departure_time': flight['departure_time'],
-                        'destination': flight['arrival_to'],
-                        'travel_class': travel_class,
-                        'fare': fare,
-                        'booking_date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-                    }
+                # Confirmation with validation loop
+                while True:
+                    confirm = input("\nConfirm booking? (Yes/No): ").strip().lower()
                     
-                    # Update seat counts
-                    if travel_class == "economy":
-                        flight['economy_booked'] += 1
+                    if confirm in ['yes', 'y']:
+                        # Create booking from the held seat
+                        try:
+                            new_booking = self.confirm_hold(hold.hold_id)
+                            print(f"\nBooking confirmed! Booking ID: {new_booking.booking_id}, "
+                                  f"seat {new_booking.seat_label}")
+                        except ReservationError as e:
+                            print(e)
+                        break
+                    elif confirm in ['no', 'n']:
+                        print("Booking cancelled.")
+                        break
                     else:
-                        flight['business_booked'] += 1
-                    
-                    self.bookings.append(new_booking)
-                    print(f"\nBooking confirmed! Booking ID: {booking_id}")
-                    break
-                elif confirm in ['no', 'n']:
-                    print("Booking cancelled.")
-                    break
-                else:
-                    print("Please enter 'Yes' or 'No'")
-                    continue
+                        print("Please enter 'Yes' or 'No'")
+                        continue
+            finally:
+                # Give the seat back unless it was booked
+                self.release_hold(hold.hold_id)
             
             input("\nPress Enter to continue...")
             
@@ -538,52 +510,213 @@ class FlightReservationSystem:
             print(f"An error occurred: {e}")
             input("Press Enter to continue...")
 
-    
+    def plan_trip_menu(self):
+        """Find the earliest or cheapest itinerary between two airports, with connections"""
+        self.display_header("Plan a Trip")
+        
+        try:
+            origin = ""
+            while True:
+                origin = airport_name(input(f"From ({'/'.join(AIRPORTS)}): "))
+                if origin:
+                    break
+                print(f"Invalid airport. Must be {', '.join(AIRPORTS)}")
+            
+            destination = ""
+            while True:
+                destination = airport_name(input(f"To ({'/'.join(AIRPORTS)}): "))
+                if not destination:
+                    print(f"Invalid airport. Must be {', '.join(AIRPORTS)}")
+                    continue
+                if destination == origin:
+                    print("Destination must differ from the departure airport")
+                    continue
+                break
+            
+            departure_date = ""
+            while True:
+                departure_date = input("Departure Date (YYYY-MM-DD): ").strip()
+                if self.validate_date(departure_date):
+                    break
+                print("Invalid date format. Please use YYYY-MM-DD")
+            
+            departure_time = ""
+            while True:
+                departure_time = input("Earliest departure time (HH:MM, default 00:00): ").strip() or "00:00"
+                if self.validate_time(departure_time):
+                    break
+                print("Invalid time format. Please use HH:MM")
+            
+            travel_class = ""
+            while True:
+                travel_class = input("Class (Economy/Business, press Enter to skip): ").strip().lower()
+                if travel_class in ["economy", "business", ""]:
+                    break
+                print("Invalid class. Must be Economy or Business (or press Enter to skip)")
+            
+            optimize = ""
+            while True:
+                optimize = input("Optimise for (Arrival/Fare, default Arrival): ").strip().lower() or "arrival"
+                if optimize in ["arrival", "fare"]:
+                    break
+                print("Please enter 'Arrival' or 'Fare'")
+            
+            itinerary = self.plan_trip(origin, destination, departure_date, departure_time,
+                                       travel_class, optimize)
+            if itinerary is None:
+                print("\nNo itinerary found for that day.")
+            else:
+                print("\nItinerary:")
+                print("-" * 80)
+                print(f"{'Flight No':<10}{'From':<14}{'To':<14}{'Departs':<20}{'Arrives':<20}")
+                print("-" * 80)
+                for leg in itinerary.legs:
+                    print(f"{leg.flight_no:<10}{leg.departure_from:<14}{leg.arrival_to:<14}"
+                          f"{format_minutes(leg.departs_at):<20}{format_minutes(leg.arrives_at):<20}")
+                print("-" * 80)
+                print(f"Total fare ({(travel_class or 'economy').title()}): ${format_fare(itinerary.fare_cents)}")
+        except ReservationError as e:
+            print(e)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+        
+        input("\nPress Enter to continue...")
+
+    def offer_waitlist(self, flight_no, passport_no, travel_class):
+        """Offer to put a passenger on the waitlist of a full class"""
+        while True:
+            choice = input("Join the waitlist for this class? (Yes/No): ").strip().lower()
+            if choice in ['no', 'n']:
+                return
+            if choice in ['yes', 'y']:
+                break
+            print("Please enter 'Yes' or 'No'")
+        
+        try:
+            entry = self.join_waitlist(flight_no, passport_no, travel_class)
+            print(f"Added to the waitlist at position {self.waitlist.position(entry.entry_id)}. "
+                  f"The passenger will be booked automatically when a seat frees up.")
+        except ReservationError as e:
+            print(e)
+
+    def cancel_booking(self):
+        """Cancel a booking and report any waitlisted passengers it made room for"""
+        self.display_header("Cancel a Booking")
+        
+        try:
+            while True:
+                booking_id = input("Booking ID (or 'exit' to return): ").strip()
+                
+                if booking_id.lower() == 'exit':
+                    return
+                
+                booking_no = parse_booking_id(booking_id)
+                if booking_no is None:
+                    print("Invalid booking ID. Must be B followed by digits (e.g., B001)")
+                    continue
+                
+                booking = self.get_booking(booking_no)
+                if not booking:
+                    print("Booking not found!")
+                    continue
+                
+                break  # Valid booking found
+            
+            print(f"\n{booking.booking_id}: {booking.customer_name} on {booking.flight_no} "
+                  f"({booking.departure_date} {booking.departure_time}), {booking.travel_class.title()} "
+                  f"seat {booking.seat_label}")
+            
+            while True:
+                confirm = input("Cancel this booking? (Yes/No): ").strip().lower()
+                if confirm in ['no', 'n']:
+                    print("Booking kept.")
+                    break
+                if confirm not in ['yes', 'y']:
+                    print("Please enter 'Yes' or 'No'")
+                    continue
+                
+                try:
+                    cancellation = self.cancel(booking_no)
+                    print(f"\nBooking {cancellation.booking.booking_id} cancelled.")
+                    for promoted in cancellation.promoted:
+                        print(f"Seat {promoted.seat_label} given to waitlisted passenger "
+                              f"{promoted.customer_name}: Booking ID {promoted.booking_id}")
+                except ReservationError as e:
+                    print(e)
+                break
+        except Exception as e:
+            print(f"An error occurred: {e}")
+        
+        input("\nPress Enter to continue...")
 
-    
     def view_bookings(self):
-        """View all bookings"""
+        """View booking totals by date and page through one date's bookings"""
         self.display_header("View Bookings")
         
-        if not self.bookings:
+        if not self.booking_count() and not self.archived_flight_count():
             print("No bookings found.")
             input("Press Enter to continue...")
             return
         
-        # Group bookings by date
-        bookings_by_date = {}
-        for booking in self.bookings:
-            date = booking['departure_date']
-            if date not in bookings_by_date:
-                bookings_by_date[date] = []
-            bookings_by_date[date].append(booking)
+        # Display the running totals for each date
+        totals_by_date = self.reports.by_date()
+        print(f"{'Departure Date':<20}{'Bookings':<12}{'Revenue':<15}")
+        print("-" * 47)
+        for date, totals in totals_by_date.items():
+            print(f"{date:<20}{totals.bookings:<12}${format_fare(totals.revenue_cents):<15}")
+        if self.archived_flight_count():
+            print("Earlier departures are archived; enter their date to list them.")
+        
+        while True:
+            date = input("\nDeparture date to list (YYYY-MM-DD, press Enter to return): ").strip()
+            if date == "":
+                return
+            if date not in totals_by_date and not self.page_bookings(departure_date=date, limit=1).bookings:
+                print("No bookings on that date.")
+                continue
+            break
+        
+        # Display the date's bookings one page at a time
+        print(f"\nDeparture Date: {date}")
+        print("-" * 80)
+        print(f"{'Booking ID':<12}{'Flight No':<10}{'Customer':<20}{'Class':<12}{'Seat':<7}{'Fare':<10}")
+        print("-" * 80)
         
-        # Display bookings for each date
-        for date, date_bookings in bookings_by_date.items():
-            print(f"\nDeparture Date: {date}")
-            print("-" * 80)
-            print(f"{'Booking ID':<12}{'Flight No':<10}{'Customer':<20}{'Class':<12}{'Fare':<10}")
-            print("-" * 80)
-            
-            for booking in date_bookings:
-                print(f"{booking['booking_id']:<12}"
-                      f"{booking['flight_no']:<10}"
-                      f"{booking['customer_name']:<20}"
-                      f"{booking['travel_class'].title():<12}"
-                      f"${booking['fare']:<10}")
+        cursor = None
+        while True:
+            page = self.page_bookings(departure_date=date, cursor=cursor, limit=BOOKINGS_PER_PAGE)
+            for booking in page.bookings:
+                print(f"{booking.booking_id:<12}"
+                      f"{booking.flight_no:<10}"
+                      f"{booking.customer_name:<20}"
+                      f"{booking.travel_class.title():<12}"
+                      f"{booking.seat_label:<7}"
+                      f"${format_fare(booking.fare_cents):<10}")
+            
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+            if input("-- Press Enter for more, or 'q' to stop --").strip().lower() == 'q':
+                break
         
         input("\nPress Enter to continue...")
 
 def main():
     """Main entry point for the application"""
-    system = FlightReservationSystem()
+    pricing = PricingEngine(load_rules(FARE_RULES_FILE)) if os.path.exists(FARE_RULES_FILE) else None
+    # Departed flights stay on disk until asked for, so startup loads only the current schedule
+    system = FlightReservationSystem(DurableStore(DATA_DIR, archive_after_days=DEFAULT_ARCHIVE_AFTER_DAYS),
+                                     pricing)
     
     print("\n" + "="*50)
     print("   CloudFare Airlines Flight Reservation System")
     print("="*50)
     
-    if system.staff_login():
-        system.main_menu()
+    try:
+        if system.staff_login():
+            system.main_menu()
+    finally:
+        system.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,238 @@
+"""Fleet-wide inventory and revenue analytics on NumPy column arrays
+
+    analytics = FleetAnalytics(service)
+    analytics.load_factor(by="destination", date_from="2026-11-01", date_to="2026-11-07")
+    analytics.revenue(by="class")
+
+Requires NumPy; nothing else in the reservation system imports this module.
+"""
+import datetime
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from validation import DESTINATIONS, TRAVEL_CLASSES, departure_minutes
+
+MINUTES_PER_DAY = 1440
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Per-flight columns and their dtypes
+COLUMNS = {
+    'economy_seats': np.int32,
+    'business_seats': np.int32,
+    'economy_booked': np.int32,
+    'business_booked': np.int32,
+    'economy_fare_cents': np.int64,
+    'business_fare_cents': np.int64,
+    'economy_revenue_cents': np.int64,
+    'business_revenue_cents': np.int64,
+    'departs_at': np.int64,
+    'destination': np.int16,
+}
+
+
+class FleetAnalytics:
+    """Columnar mirror of flight inventory and booking revenue
+
+    Each flight is one row across the COLUMNS arrays, which grow by
+    doubling. The mirror subscribes to the service's flight, booking and
+    cancellation listeners, so every flight stored and every booking
+    committed or cancelled, from book_flight, the API or log replay,
+    updates its row in O(1). Flights the service evicts once archived
+    lose their rows, so the mirror covers the loaded flights. Queries
+    are then a mask and a bincount over whole arrays instead of a Python
+    loop over every flight.
+
+    Revenue is the sum of the fares actually paid, per class. Held seats
+    are not counted as booked.
+    """
+
+    def __init__(self, service=None, capacity: int = 1024):
+        self._size = 0
+        self._columns = {name: np.zeros(capacity, dtype) for name, dtype in COLUMNS.items()}
+        self._rows: Dict[str, int] = {}
+        self._destinations: Dict[str, int] = {name: code for code, name in enumerate(DESTINATIONS)}
+        self._lock = threading.Lock()
+        if service is not None:
+            self.attach(service)
+
+    def __len__(self):
+        return self._size
+
+    def attach(self, service):
+        """Load the service's current flights and bookings and follow its changes"""
+        service.subscribe(self.add_flight, self.add_booking, self.remove_booking, self.remove_flights,
+                          load=self._load)
+
+    def _load(self, flights, bookings):
+        for flight in flights:
+            self.add_flight(flight)
+        # Their seats are already in each flight's booked columns
+        for booking in bookings:
+            self._add_revenue(booking)
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a read-only view of one column, trimmed to the stored flights"""
+        view = self._columns[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    # Updates
+
+    def add_flight(self, flight):
+        """Append a flight's row, including any seats it already has booked"""
+        with self._lock:
+            if flight.flight_no in self._rows:
+                return
+            if self._size == len(self._columns['departs_at']):
+                for name, values in self._columns.items():
+                    grown = np.zeros(max(1, 2 * len(values)), values.dtype)
+                    grown[:self._size] = values[:self._size]
+                    self._columns[name] = grown
+            row = self._size
+            destination = self._destinations.setdefault(flight.arrival_to, len(self._destinations))
+            for name, value in (('economy_seats', flight.economy_seats),
+                                ('business_seats', flight.business_seats),
+                                ('economy_booked', flight.economy_booked),
+                                ('business_booked', flight.business_booked),
+                                ('economy_fare_cents', flight.economy_fare_cents),
+                                ('business_fare_cents', flight.business_fare_cents),
+                                ('departs_at', flight.departs_at),
+                                ('destination', destination)):
+                self._columns[name][row] = value
+            self._rows[flight.flight_no] = row
+            self._size += 1
+
+    def add_booking(self, booking):
+        """Count a committed booking against its flight's row"""
+        row = self._rows[booking.flight.flight_no]
+        with self._lock:
+            self._columns[f"{booking.travel_class}_booked"][row] += 1
+            self._columns[f"{booking.travel_class}_revenue_cents"][row] += booking.fare_cents
+
+    def remove_booking(self, booking):
+        """Take a cancelled booking off its flight's row"""
+        row = self._rows[booking.flight.flight_no]
+        with self._lock:
+            self._columns[f"{booking.travel_class}_booked"][row] -= 1
+            self._columns[f"{booking.travel_class}_revenue_cents"][row] -= booking.fare_cents
+
+    def remove_flights(self, flights):
+        """Drop the rows of flights, closing the gaps so the columns stay dense"""
+        with self._lock:
+            rows = [self._rows.pop(flight.flight_no) for flight in flights if flight.flight_no in self._rows]
+            if not rows:
+                return
+            keep = np.ones(self._size, dtype=bool)
+            keep[rows] = False
+            size = self._size - len(rows)
+            for values in self._columns.values():
+                values[:size] = values[:self._size][keep]
+                # New rows rely on their revenue starting at zero
+                values[size:self._size] = 0
+            new_rows = np.cumsum(keep) - 1
+            for flight_no, row in self._rows.items():
+                self._rows[flight_no] = int(new_rows[row])
+            self._size = size
+
+    def _add_revenue(self, booking):
+        """Add the fare of a booking already counted in its flight's booked column"""
+        row = self._rows[booking.flight.flight_no]
+        with self._lock:
+            self._columns[f"{booking.travel_class}_revenue_cents"][row] += booking.fare_cents
+
+    # Queries
+
+    def _mask(self, date_from: str = "", date_to: str = "", destination: str = "") -> np.ndarray:
+        """Boolean row selection for a departure date range and destination"""
+        mask = np.ones(self._size, dtype=bool)
+        departs_at = self._columns['departs_at'][:self._size]
+        if date_from:
+            mask &= departs_at >= departure_minutes(date_from, "00:00")
+        if date_to:
+            mask &= departs_at < departure_minutes(date_to, "00:00") + MINUTES_PER_DAY
+        if destination:
+            code = self._destinations.get(destination)
+            if code is None:
+                mask[:] = False
+            else:
+                mask &= self._columns['destination'][:self._size] == code
+        return mask
+
+    def _sum(self, travel_class: Optional[str], suffix: str, mask) -> np.ndarray:
+        """Per-row values of one class, or both classes added, for the selected rows"""
+        classes = (travel_class,) if travel_class else TRAVEL_CLASSES
+        total = np.zeros(int(mask.sum()), dtype=np.int64)
+        for cls in classes:
+            total += self._columns[f"{cls}_{suffix}"][:self._size][mask]
+        return total
+
+    def _grouped(self, values: np.ndarray, by: str, mask) -> Dict[str, float]:
+        """Sum values per destination or departure date"""
+        if by == "destination":
+            codes = self._columns['destination'][:self._size][mask]
+            sums = np.bincount(codes, weights=values, minlength=len(self._destinations))
+            names = sorted(self._destinations, key=self._destinations.get)
+            return {name: sums[code] for code, name in enumerate(names) if np.any(codes == code)}
+        if by == "date":
+            days = self._columns['departs_at'][:self._size][mask] // MINUTES_PER_DAY
+            if not len(days):
+                return {}
+            first = int(days.min())
+            sums = np.bincount(days - first, weights=values)
+            present = np.unique(days - first)
+            return {datetime.date.fromordinal(_EPOCH_ORDINAL + first + int(day)).isoformat(): sums[day]
+                    for day in present}
+        raise ValueError(f"Cannot group by {by!r}")
+
+    def load_factor(self, by: str = "", travel_class: Optional[str] = None, date_from: str = "",
+                    date_to: str = "", destination: str = ""):
+        """Booked seats over total seats, overall or per destination/date
+
+        Returns a float, or a dict when by is "destination" or "date".
+        Groups with no seats have a load factor of 0.
+        """
+        mask = self._mask(date_from, date_to, destination)
+        booked = self._sum(travel_class, "booked", mask)
+        seats = self._sum(travel_class, "seats", mask)
+        if not by:
+            total = int(seats.sum())
+            return int(booked.sum()) / total if total else 0.0
+        booked_by, seats_by = self._grouped(booked, by, mask), self._grouped(seats, by, mask)
+        return {key: float(booked_by[key] / seats_by[key]) if seats_by[key] else 0.0 for key in seats_by}
+
+    def remaining_capacity(self, by: str = "", travel_class: Optional[str] = None, date_from: str = "",
+                           date_to: str = "", destination: str = ""):
+        """Unbooked seats, overall or per destination/date"""
+        mask = self._mask(date_from, date_to, destination)
+        remaining = (self._sum(travel_class, "seats", mask)
+                     - self._sum(travel_class, "booked", mask))
+        if not by:
+            return int(remaining.sum())
+        return {key: int(value) for key, value in self._grouped(remaining, by, mask).items()}
+
+    def revenue(self, by: str = "", date_from: str = "", date_to: str = "",
+                destination: str = ""):
+        """Booking revenue in cents, overall or per class/destination/date"""
+        mask = self._mask(date_from, date_to, destination)
+        if by == "class":
+            return {cls: int(self._columns[f"{cls}_revenue_cents"][:self._size][mask].sum())
+                    for cls in TRAVEL_CLASSES}
+        revenue = self._sum(None, "revenue_cents", mask)
+        if not by:
+            return int(revenue.sum())
+        return {key: int(value) for key, value in self._grouped(revenue, by, mask).items()}
+
+    def load_histogram(self, bins: int = 10, travel_class: Optional[str] = None, date_from: str = "",
+                       date_to: str = "", destination: str = "") -> Tuple[np.ndarray, np.ndarray]:
+        """Histogram of per-flight load factor (booked vs capacity) over [0, 1]
+
+        Returns (counts, bin_edges) as from numpy.histogram; flights with
+        no seats in the class are left out.
+        """
+        mask = self._mask(date_from, date_to, destination)
+        booked = self._sum(travel_class, "booked", mask)
+        seats = self._sum(travel_class, "seats", mask)
+        has_seats = seats > 0
+        return np.histogram(booked[has_seats] / seats[has_seats], bins=bins, range=(0.0, 1.0))
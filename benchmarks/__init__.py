@@ -0,0 +1 @@
+"""Benchmarks for the reservation system, run with ``python -m benchmarks.<name>``"""
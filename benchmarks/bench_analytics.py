@@ -0,0 +1,101 @@
+"""Compare the NumPy analytics mirror with pure-Python loops over the flights
+
+    python -m benchmarks.bench_analytics --flights 100000 --bookings 500000
+"""
+import argparse
+import time
+
+from analytics import FleetAnalytics
+from benchmarks.datasets import booking_requests, populate
+from reservation_service import ReservationService, SeatUnavailableError
+from validation import TRAVEL_CLASSES
+
+DATE_FROM, DATE_TO = "2026-11-01", "2026-11-07"
+
+
+def python_load_factor(service):
+    """Load factor per destination for the week, the way a loop over flights computes it"""
+    booked, seats = {}, {}
+    for flight in service.iter_flights():
+        if DATE_FROM <= flight.departure_date <= DATE_TO:
+            for cls in TRAVEL_CLASSES:
+                booked[flight.arrival_to] = booked.get(flight.arrival_to, 0) + flight.booked(cls)
+                seats[flight.arrival_to] = seats.get(flight.arrival_to, 0) + flight.seats(cls)
+    return {destination: booked[destination] / seats[destination] if seats[destination] else 0.0
+            for destination in seats}
+
+
+def python_remaining(service):
+    return sum(flight.seats(cls) - flight.booked(cls)
+               for flight in service.iter_flights() for cls in TRAVEL_CLASSES)
+
+
+def python_revenue_by_class(service):
+    """Fares actually paid, which move with load under dynamic pricing"""
+    revenue = dict.fromkeys(TRAVEL_CLASSES, 0)
+    for booking in service.iter_bookings():
+        revenue[booking.travel_class] += booking.fare_cents
+    return revenue
+
+
+def python_histogram(service, bins=10):
+    counts = [0] * bins
+    for flight in service.iter_flights():
+        seats = flight.economy_seats + flight.business_seats
+        if seats:
+            load = (flight.economy_booked + flight.business_booked) / seats
+            counts[min(int(load * bins), bins - 1)] += 1
+    return counts
+
+
+def best_of(repeat, func, *args):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flights", type=int, default=50_000)
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--bookings", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    service = ReservationService()
+    analytics = FleetAnalytics(service)
+    populate(service, args.flights, args.customers)
+    for flight_no, passport_no, travel_class in booking_requests(args.bookings, args.flights,
+                                                                 args.customers, seed=args.seed):
+        try:
+            service.book(flight_no, passport_no, travel_class)
+        except SeatUnavailableError:
+            pass
+
+    queries = [
+        ("load factor by destination", python_load_factor,
+         lambda: analytics.load_factor(by="destination", date_from=DATE_FROM, date_to=DATE_TO)),
+        ("remaining capacity", python_remaining, analytics.remaining_capacity),
+        ("revenue by class", python_revenue_by_class, lambda: analytics.revenue(by="class")),
+        ("load histogram", python_histogram, lambda: list(analytics.load_histogram()[0])),
+    ]
+    print(f"{args.flights} flights, {service.booking_count()} bookings")
+    print(f"{'Query':<28}{'Python ms':>12}{'NumPy ms':>12}{'Speed-up':>10}  Match")
+    for name, python_query, numpy_query in queries:
+        python_seconds, expected = best_of(args.repeat, python_query, service)
+        numpy_seconds, actual = best_of(args.repeat, numpy_query)
+        if isinstance(expected, dict):
+            match = expected.keys() == actual.keys() and all(
+                abs(expected[key] - actual[key]) < 1e-9 for key in expected)
+        else:
+            match = expected == actual
+        print(f"{name:<28}{python_seconds * 1000:>12.2f}{numpy_seconds * 1000:>12.2f}"
+              f"{python_seconds / numpy_seconds:>9.1f}x  {'yes' if match else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Run the same reservation workload against the in-memory and SQLite backends
+
+    python -m benchmarks.bench_backends --flights 5000 --customers 50000 --bookings 50000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.datasets import booking_requests, populate
+from memory_backend import InMemoryBackend
+from reservation_service import ReservationService, SeatUnavailableError
+from sqlite_backend import SQLiteBackend
+from validation import DESTINATIONS
+
+
+def run_workload(service, args):
+    """Time each phase of a fixed, seeded workload and return {phase: seconds}"""
+    timings = {}
+
+    start = time.perf_counter()
+    populate(service, args.flights, args.customers)
+    timings['load'] = time.perf_counter() - start
+
+    requests = booking_requests(args.bookings, args.flights, args.customers, seed=args.seed)
+    start = time.perf_counter()
+    for flight_no, passport_no, travel_class in requests:
+        try:
+            service.book(flight_no, passport_no, travel_class)
+        except SeatUnavailableError:
+            pass
+    timings['book'] = time.perf_counter() - start
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    for _ in range(args.searches):
+        service.search(departure_date=f"2026-11-{rng.randint(1, 28):02d}",
+                       destination=rng.choice(DESTINATIONS), travel_class="business")
+    timings['search'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    service.bookings_by_date()
+    timings['bookings_by_date'] = time.perf_counter() - start
+    return timings, service.booking_count()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flights", type=int, default=2000)
+    parser.add_argument("--customers", type=int, default=20000)
+    parser.add_argument("--bookings", type=int, default=20000)
+    parser.add_argument("--searches", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, backend in (("memory", InMemoryBackend()),
+                              ("sqlite", SQLiteBackend(os.path.join(tmp, "bench.db")))):
+            service = ReservationService(backend=backend)
+            results[name] = run_workload(service, args)
+            service.close()
+
+    print(f"{'Phase':<20}" + "".join(f"{name:>12}" for name in results))
+    for phase in results['memory'][0]:
+        print(f"{phase:<20}" + "".join(f"{results[name][0][phase]:>11.3f}s" for name in results))
+    for name, (_, booked) in results.items():
+        print(f"{name}: {booked} bookings confirmed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Multi-threaded booking stress test: checks for overselling and measures scaling
+
+    python -m benchmarks.bench_concurrent_booking --threads 1 2 4 8 --durable
+
+Each run hammers a small number of flights with far more requests than
+there are seats, then verifies that no class was oversold, that seat
+counters match the stored bookings and that every booking number is
+unique. With --durable every booking is fsynced through the write-ahead
+log, which shows how group commit lets throughput grow with threads.
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from benchmarks.datasets import booking_requests, populate
+from reservation_service import ReservationService, SeatUnavailableError
+from storage import DurableStore
+
+
+def run(threads, args):
+    """Book concurrently with `threads` workers and return (seconds, confirmed, problems)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DurableStore(tmp, snapshot_every=0) if args.durable else None
+        service = ReservationService(store=store)
+        populate(service, args.flights, args.customers, seats=(args.economy, args.business))
+        requests = booking_requests(args.requests, args.flights, args.customers, seed=args.seed,
+                                    business_share=0.3)
+        chunks = [requests[i::threads] for i in range(threads)]
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(chunk):
+            barrier.wait()
+            for flight_no, passport_no, travel_class in chunk:
+                try:
+                    service.book(flight_no, passport_no, travel_class)
+                except SeatUnavailableError:
+                    pass
+
+        workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+        for thread in workers:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        problems = verify(service)
+        confirmed = service.booking_count()
+        service.close()
+    return elapsed, confirmed, problems
+
+
+def verify(service):
+    """Return a list of invariant violations (empty when the run was correct)"""
+    problems = []
+    per_class = Counter((booking.flight.flight_no, booking.travel_class)
+                        for booking in service.iter_bookings())
+    for flight in service.iter_flights():
+        for travel_class in ("economy", "business"):
+            booked = flight.booked(travel_class)
+            if booked > flight.seats(travel_class):
+                problems.append(f"{flight.flight_no} {travel_class} oversold: "
+                                f"{booked}/{flight.seats(travel_class)}")
+            if booked != per_class[flight.flight_no, travel_class]:
+                problems.append(f"{flight.flight_no} {travel_class} counter {booked} != "
+                                f"{per_class[flight.flight_no, travel_class]} bookings")
+    numbers = [booking.booking_no for booking in service.iter_bookings()]
+    if len(numbers) != len(set(numbers)):
+        problems.append("duplicate booking numbers")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--flights", type=int, default=50)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--economy", type=int, default=150)
+    parser.add_argument("--business", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--durable", action="store_true", help="fsync every booking through the log")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    capacity = args.flights * (args.economy + args.business)
+    print(f"{'Threads':>8}{'Confirmed':>11}{'Seconds':>10}{'Bookings/s':>12}  Result")
+    failed = False
+    for threads in args.threads:
+        elapsed, confirmed, problems = run(threads, args)
+        failed = failed or bool(problems) or confirmed > capacity
+        status = "OK" if not problems else "; ".join(problems[:3])
+        print(f"{threads:>8}{confirmed:>11}{elapsed:>10.3f}{confirmed / elapsed:>12.0f}  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Check that export memory stays flat as the number of bookings grows
+
+    python -m benchmarks.bench_export --bookings 100000 400000
+
+For each size a fresh service is filled with bookings, then the bookings
+extract is written (gzip CSV) while tracemalloc records the peak memory
+allocated during the export alone.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.datasets import booking_requests, populate
+from export import export_bookings
+from reservation_service import ReservationService
+
+
+def run(bookings, args, directory):
+    service = ReservationService()
+    flights = max(1, bookings // 400)
+    populate(service, flights, args.customers, seats=(300, 100))
+    service.book_many(booking_requests(bookings, flights, args.customers, seed=args.seed),
+                      all_or_nothing=False)
+
+    path = os.path.join(directory, f"bookings-{bookings}.csv.gz")
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = export_bookings(service, path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, elapsed, peak, os.path.getsize(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, nargs="+", default=[50_000, 200_000])
+    parser.add_argument("--customers", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{'Rows':>10}{'Seconds':>10}{'Rows/s':>10}{'Peak MiB':>10}{'File MiB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for bookings in args.bookings:
+            rows, elapsed, peak, size = run(bookings, args, tmp)
+            print(f"{rows:>10}{elapsed:>10.2f}{rows / elapsed:>10.0f}"
+                  f"{peak / 2 ** 20:>10.1f}{size / 2 ** 20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Group bookings: one book() call per passenger versus a single book_many() batch
+
+    python -m benchmarks.bench_group_booking --group-size 200 --groups 100 --durable
+
+Each group books group_size passengers on one flight. Throughput is
+reported in bookings per second for both paths on identical data.
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.datasets import populate
+from reservation_service import ReservationService
+from storage import DurableStore
+
+
+def group_requests(groups, group_size, customers):
+    """One group per flight, each passenger travelling economy"""
+    return [[(f"JFK{group:03d}", f"P{(group * group_size + i) % customers:08d}", "economy")
+             for i in range(group_size)]
+            for group in range(groups)]
+
+
+def run(batched, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DurableStore(tmp, snapshot_every=0) if args.durable else None
+        service = ReservationService(store=store)
+        populate(service, args.groups, args.customers, seats=(args.group_size, 0))
+        groups = group_requests(args.groups, args.group_size, args.customers)
+
+        start = time.perf_counter()
+        for requests in groups:
+            if batched:
+                service.book_many(requests)
+            else:
+                for request in requests:
+                    service.book(*request)
+        elapsed = time.perf_counter() - start
+        booked = service.booking_count()
+        service.close()
+    return elapsed, booked
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--group-size", type=int, default=200)
+    parser.add_argument("--customers", type=int, default=20_000)
+    parser.add_argument("--durable", action="store_true", help="fsync bookings through the log")
+    args = parser.parse_args(argv)
+
+    print(f"{'Path':<22}{'Bookings':>10}{'Seconds':>10}{'Bookings/s':>12}")
+    for name, batched in (("book() per passenger", False), ("book_many() per group", True)):
+        elapsed, booked = run(batched, args)
+        print(f"{name:<22}{booked:>10}{elapsed:>10.3f}{booked / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
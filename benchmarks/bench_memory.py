@@ -0,0 +1,112 @@
+"""Compare the memory cost of dict bookings with the slotted record layout
+
+    python -m benchmarks.bench_memory --bookings 1000000
+"""
+import argparse
+import datetime
+import gc
+import tracemalloc
+
+from records import Booking, Customer, Flight, epoch_minutes
+
+DESTINATIONS = ("Orlando", "Miami", "Los Angeles")
+
+
+def make_dict_data(flight_count, customer_count):
+    """Build flights and customers in the original dict layout"""
+    flights = [{
+        'flight_no': f"JFK{i:03d}",
+        'departure_from': "JFK",
+        'arrival_to': DESTINATIONS[i % 3],
+        'departure_date': f"2026-11-{i % 28 + 1:02d}",
+        'departure_time': f"{i % 24:02d}:30",
+        'economy_seats': 70,
+        'business_seats': 30,
+        'economy_fare': 500.0,
+        'business_fare': 1000.0,
+        'economy_booked': 0,
+        'business_booked': 0
+    } for i in range(flight_count)]
+    customers = [{
+        'customer_id': f"C{i:03d}",
+        'name': f"Passenger {i}",
+        'passport_no': f"P{i:08d}",
+        'address': f"{i} Main St",
+        'telephone': f"{5550000 + i}"
+    } for i in range(customer_count)]
+    return flights, customers
+
+
+def build_dict_bookings(count, flights, customers):
+    """Create bookings exactly as book_flight did before the record types"""
+    bookings = []
+    for i in range(count):
+        flight = flights[i % len(flights)]
+        customer = customers[i % len(customers)]
+        travel_class = "economy" if i % 4 else "business"
+        bookings.append({
+            'booking_id': f"B{i + 1:03d}",
+            'flight_no': flight['flight_no'],
+            'customer_id': customer['customer_id'],
+            'passport_no': customer['passport_no'],
+            'customer_name': customer['name'],
+            'departure_date': flight['departure_date'],
+            'departure_time': flight['departure_time'],
+            'destination': flight['arrival_to'],
+            'travel_class': travel_class,
+            'fare': flight[f'{travel_class}_fare'],
+            'booking_date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+        })
+    return bookings
+
+
+def to_records(flights, customers):
+    """Convert the dict flights and customers to record types"""
+    flights = [Flight(f['flight_no'], f['departure_from'], f['arrival_to'], f['departure_date'],
+                      f['departure_time'], f['economy_seats'], f['business_seats'], 50000, 100000)
+               for f in flights]
+    return flights, [Customer(**c) for c in customers]
+
+
+def build_record_bookings(count, flights, customers):
+    """Create the same bookings with the slotted record types"""
+    bookings = []
+    for i in range(count):
+        flight = flights[i % len(flights)]
+        travel_class = "economy" if i % 4 else "business"
+        bookings.append(Booking(i + 1, flight, customers[i % len(customers)], travel_class,
+                                flight.fare_cents(travel_class), epoch_minutes()))
+    return bookings
+
+
+def measure(builder, count, flights, customers):
+    """Return the bytes still allocated after building the bookings"""
+    gc.collect()
+    tracemalloc.start()
+    bookings = builder(count, flights, customers)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del bookings
+    gc.collect()
+    return current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=1_000_000)
+    parser.add_argument("--flights", type=int, default=1000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    flights, customers = make_dict_data(args.flights, args.customers)
+    dict_bytes = measure(build_dict_bookings, args.bookings, flights, customers)
+    record_bytes = measure(build_record_bookings, args.bookings, *to_records(flights, customers))
+
+    print(f"{'Layout':<10}{'Total MiB':>12}{'Bytes/booking':>16}")
+    for name, size in (("dict", dict_bytes), ("records", record_bytes)):
+        print(f"{name:<10}{size / 2 ** 20:>12.1f}{size / args.bookings:>16.1f}")
+    print(f"Saving: {1 - record_bytes / dict_bytes:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare the cached fixed-format date/time parsers with the strptime path
+
+    python -m benchmarks.bench_parsing --checks 1000000
+"""
+import argparse
+import datetime
+import random
+import time
+
+from validation import parse_date, parse_time, validate_date, validate_time
+
+
+def strptime_validate_date(date_str):
+    """The original validate_date"""
+    try:
+        datetime.datetime.strptime(date_str, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+def strptime_validate_time(time_str):
+    """The original validate_time"""
+    try:
+        datetime.datetime.strptime(time_str, "%H:%M")
+        return True
+    except ValueError:
+        return False
+
+
+def workload(count, seed):
+    """Dates and times drawn from a one-year schedule, as a bulk load or search sees them"""
+    rng = random.Random(seed)
+    start = datetime.date(2026, 11, 1)
+    dates = [(start + datetime.timedelta(days=rng.randrange(365))).isoformat() for _ in range(count)]
+    times = [f"{rng.randrange(24):02d}:{rng.randrange(0, 60, 5):02d}" for _ in range(count)]
+    return dates, times
+
+
+def timed(check_date, check_time, dates, times):
+    start = time.perf_counter()
+    for date_str, time_str in zip(dates, times):
+        check_date(date_str)
+        check_time(time_str)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checks", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    dates, times = workload(args.checks, args.seed)
+    results = [("strptime", timed(strptime_validate_date, strptime_validate_time, dates, times))]
+
+    # Fixed-format parsing alone, with the cache bypassed
+    uncached_date, uncached_time = parse_date.__wrapped__, parse_time.__wrapped__
+    results.append(("fixed-format", timed(uncached_date, uncached_time, dates, times)))
+
+    parse_date.cache_clear()
+    parse_time.cache_clear()
+    results.append(("fixed-format + LRU", timed(validate_date, validate_time, dates, times)))
+
+    baseline = results[0][1]
+    print(f"{'Parser':<20}{'Seconds':>10}{'Checks/s':>14}{'Speed-up':>10}")
+    for name, seconds in results:
+        print(f"{name:<20}{seconds:>10.3f}{args.checks / seconds:>14.0f}{baseline / seconds:>9.1f}x")
+    print(f"Date cache: {parse_date.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
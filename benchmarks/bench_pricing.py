@@ -0,0 +1,111 @@
+"""Measure what dynamic fare quotes cost over reading a flight's static fare
+
+    python -m benchmarks.bench_pricing --flights 100000 --quotes 1000000
+
+Flights get random load factors and departure dates over the next
+--days days. Quotes are timed on two workloads: repeated quotes for
+--popular flights, as busy searches see them, and quotes spread over
+the whole schedule. Each is timed five ways: the static fare,
+a rule scan without precomputed tables, the table lookup alone, and
+full quotes from the engine with and without its quote cache. The
+table path is checked against the rule scan on every flight, and a
+full reprice of the schedule is timed.
+"""
+import argparse
+import random
+import time
+
+from pricing import FareRules, PricingEngine, today
+from records import Flight
+from validation import DESTINATIONS, TRAVEL_CLASSES, format_minutes
+
+
+def schedule(count, days, seed):
+    rng = random.Random(seed)
+    first_day = today()
+    flights = []
+    for i in range(count):
+        departs_at = (first_day + rng.randrange(days)) * 1440 + rng.randrange(0, 1440, 15)
+        date, time_of_day = format_minutes(departs_at).split()
+        flight = Flight(f"X{i:06d}", "JFK", DESTINATIONS[i % len(DESTINATIONS)], date, time_of_day,
+                        rng.choice((70, 120, 180)), rng.choice((12, 20, 30)),
+                        rng.randrange(5000, 60000), rng.randrange(60000, 200000))
+        flight.economy_booked = rng.randrange(flight.economy_seats + 1)
+        flight.business_booked = rng.randrange(flight.business_seats + 1)
+        flights.append(flight)
+    return flights
+
+
+def scan_price(rules, flight, travel_class, day):
+    """Price a seat by walking the bucket and booking-curve rules each time"""
+    seats = flight.seats(travel_class)
+    taken = flight.booked(travel_class) + flight.held(travel_class)
+    bucket_multiplier = rules.buckets[-1][2]
+    for _, limit, multiplier in rules.buckets:
+        if taken < limit * seats:
+            bucket_multiplier = multiplier
+            break
+    days_out = flight.departs_at // 1440 - day
+    band_multiplier = rules.advance[-1][1]
+    for days, multiplier in rules.advance:
+        if days_out >= days:
+            band_multiplier = multiplier
+            break
+    cents = flight.fare_cents(travel_class) * round(bucket_multiplier * band_multiplier * 10000) // 10000
+    step = rules.round_cents
+    return (cents + step // 2) // step * step
+
+
+def ns_per_quote(func, workload):
+    start = time.perf_counter()
+    for flight, travel_class in workload:
+        func(flight, travel_class)
+    return (time.perf_counter() - start) / len(workload) * 1e9
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flights", type=int, default=100_000)
+    parser.add_argument("--quotes", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--popular", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    flights = schedule(args.flights, args.days, args.seed)
+    rng = random.Random(args.seed + 1)
+    popular = flights[:args.popular]
+    workloads = [[(rng.choice(choices), rng.choice(TRAVEL_CLASSES)) for _ in range(args.quotes)]
+                 for choices in (popular, flights)]
+
+    rules = FareRules()
+    day = today()
+    mismatches = sum(scan_price(rules, flight, travel_class, day)
+                     != rules.price(flight.fare_cents(travel_class), flight.seats(travel_class),
+                                    flight.booked(travel_class), flight.departs_at // 1440 - day)[0]
+                     for flight in flights for travel_class in TRAVEL_CLASSES)
+    print(f"Checked {2 * len(flights)} table prices against the rule scan: {mismatches} mismatches")
+
+    price = rules.price
+    lookups = [
+        ("static fare", lambda: Flight.fare_cents),
+        ("rule scan", lambda: lambda flight, travel_class: scan_price(rules, flight, travel_class, today())),
+        ("precomputed tables", lambda: lambda flight, travel_class: price(
+            flight.fare_cents(travel_class), flight.seats(travel_class), flight.booked(travel_class),
+            flight.departs_at // 1440 - today())),
+        ("quote, no cache", lambda: PricingEngine(rules, cache_size=0).quote),
+        ("quote, cached", lambda: PricingEngine(rules).quote),
+    ]
+    print(f"\n{'ns per fare':<24}{f'{args.popular} flights':>16}{f'{args.flights} flights':>16}")
+    for name, make in lookups:
+        print(f"{name:<24}" + "".join(f"{ns_per_quote(make(), workload):>16.0f}" for workload in workloads))
+    print("(the first three return the fare alone; quotes also carry the bucket and load factor)")
+
+    start = time.perf_counter()
+    sheet = PricingEngine(rules).reprice(flights)
+    seconds = time.perf_counter() - start
+    print(f"\nRepriced {len(sheet)} flights ({2 * len(sheet)} classes) in {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
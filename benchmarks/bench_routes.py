@@ -0,0 +1,146 @@
+"""Time itinerary queries on a large synthetic network and check them against an exhaustive search
+
+    python -m benchmarks.bench_routes --airports 40 --legs 100000 --queries 2000
+
+Legs are spread over --days days between random airport pairs, with a
+share of them sold out in economy. Each earliest-arrival query, leaving
+on the same day, is checked against a search that expands every
+itinerary leg by leg under the planner's default minimum connection,
+maximum layover and leg limits.
+"""
+import argparse
+import random
+import time
+from bisect import bisect_left
+
+from records import Flight
+from route_planner import DEFAULT_MAX_LAYOVER, DEFAULT_MAX_LEGS, DEFAULT_MIN_CONNECTION, RoutePlanner
+from validation import departure_minutes, format_minutes
+
+START = "2026-11-01"
+
+
+def synthetic_network(airports, legs, days, seed, full_share=0.1):
+    rng = random.Random(seed)
+    names = [f"A{i:02d}" for i in range(airports)]
+    first_day = departure_minutes(START, "00:00")
+    flights = []
+    for i in range(legs):
+        departure, arrival = rng.sample(names, 2)
+        minute = rng.randrange(days * 1440)
+        day, time_of_day = divmod(minute, 1440)
+        flight = Flight(f"X{i:06d}", departure, arrival, format_minutes(first_day + day * 1440)[:10],
+                        f"{time_of_day // 60:02d}:{time_of_day % 60:02d}",
+                        70, 30, rng.randrange(5000, 50000), rng.randrange(50000, 150000),
+                        duration_minutes=rng.randrange(45, 420))
+        if rng.random() < full_share:
+            flight.economy_booked = flight.economy_seats
+        flights.append(flight)
+    return names, flights
+
+
+def by_airport(flights):
+    """Departure times and flights leaving each airport, sorted by departure"""
+    departures = {}
+    for flight in sorted(flights, key=lambda flight: flight.departs_at):
+        times, leaving = departures.setdefault(flight.departure_from, ([], []))
+        times.append(flight.departs_at)
+        leaving.append(flight)
+    return departures
+
+
+def exhaustive_search(departures, origin, destination, depart_after, depart_before, travel_class,
+                      min_connection=DEFAULT_MIN_CONNECTION, max_layover=DEFAULT_MAX_LAYOVER,
+                      max_legs=DEFAULT_MAX_LEGS):
+    """Earliest arrival over every itinerary within the limits, expanding all of them a leg at a time"""
+    times, leaving = departures.get(origin, ([], []))
+    frontier = leaving[bisect_left(times, depart_after):bisect_left(times, depart_before)]
+    best = None
+    for legs in range(1, max_legs + 1):
+        onward = {}
+        for flight in frontier:
+            if flight.arrival_to == origin or (travel_class and flight.available(travel_class) <= 0):
+                continue
+            if flight.arrival_to == destination:
+                if best is None or flight.arrives_at < best:
+                    best = flight.arrives_at
+                continue
+            if legs < max_legs and flight.arrival_to in departures:
+                times, leaving = departures[flight.arrival_to]
+                for following in leaving[bisect_left(times, flight.arrives_at + min_connection):
+                                         bisect_left(times, flight.arrives_at + max_layover + 1)]:
+                    onward[following.flight_no] = following
+        frontier = onward.values()
+    return best
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return (latencies[len(latencies) // 2] * 1e6, latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1e6)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--airports", type=int, default=40)
+    parser.add_argument("--legs", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    names, flights = synthetic_network(args.airports, args.legs, args.days, args.seed)
+    rng = random.Random(args.seed + 1)
+    first_day = departure_minutes(START, "00:00")
+    queries = [(*rng.sample(names, 2), first_day + rng.randrange((args.days - 2) * 1440),
+                rng.choice(("", "economy")))
+               for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    planner = RoutePlanner()
+    planner.add_many(flights)
+    planner.airports()
+    print(f"Indexed {len(flights)} legs between {args.airports} airports in "
+          f"{time.perf_counter() - start:.2f}s")
+
+    departures = by_airport(flights)
+    search_latencies, mismatches = [], 0
+    for origin, destination, depart_after, travel_class in queries:
+        depart_before = depart_after - depart_after % 1440 + 1440
+        t = time.perf_counter()
+        expected = exhaustive_search(departures, origin, destination, depart_after, depart_before, travel_class)
+        search_latencies.append(time.perf_counter() - t)
+        itinerary = planner.earliest_arrival(origin, destination, depart_after, depart_before, travel_class)
+        if (itinerary.arrives_at if itinerary else None) != expected:
+            mismatches += 1
+    print(f"Checked {len(queries)} earliest-arrival queries against an exhaustive search: "
+          f"{mismatches} mismatches")
+
+    results = [("exhaustive search (same day)", search_latencies)]
+    for name, query in (("earliest_arrival (same day)",
+                         lambda o, d, t, c: planner.earliest_arrival(o, d, t, t - t % 1440 + 1440, c)),
+                        ("cheapest (same day)",
+                         lambda o, d, t, c: planner.cheapest(o, d, t, t - t % 1440 + 1440, c or "economy"))):
+        latencies, found = [], 0
+        for origin, destination, depart_after, travel_class in queries:
+            t = time.perf_counter()
+            itinerary = query(origin, destination, depart_after, travel_class)
+            latencies.append(time.perf_counter() - t)
+            found += itinerary is not None
+        results.append((f"{name} ({found} found)", latencies))
+
+    print(f"\n{'Query':<40}{'p50 us':>10}{'p99 us':>10}")
+    for name, latencies in results:
+        p50, p99 = percentiles(latencies)
+        print(f"{name:<40}{p50:>10.1f}{p99:>10.1f}")
+
+    origin, destination, depart_after, _ = queries[0]
+    itinerary = planner.earliest_arrival(origin, destination, depart_after)
+    if itinerary:
+        print(f"\nExample {origin} -> {destination} after {format_minutes(depart_after)}:")
+        for leg in itinerary.legs:
+            print(f"  {leg.flight_no} {leg.departure_from}->{leg.arrival_to} "
+                  f"{format_minutes(leg.departs_at)} - {format_minutes(leg.arrives_at)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Seat map queries on bitsets versus a scan of one byte per seat
+
+    python -m benchmarks.bench_seatmap --seats 30 180 600 --fill 0.5 0.9
+
+For each cabin size and load, --maps seeded economy cabins are filled at
+random to that share of their seats. Each cabin is kept both as a
+seat_map.CabinSeats and as a bytearray with one byte per seat, and three
+queries are timed on both: the free seat count, the first free seat,
+and the first run of --group adjacent free seats in a row (within one
+aisle block if possible, as book_many() seats a group). The answers of
+the two are checked against each other.
+"""
+import argparse
+import random
+import time
+
+from seat_map import ECONOMY_LAYOUT, CabinSeats, cabin_for
+
+
+def fill(seats, share, rng):
+    """A cabin and the matching byte-per-seat array, with share of the seats booked"""
+    cabin = CabinSeats(cabin_for(seats, ECONOMY_LAYOUT))
+    taken = bytearray(seats)
+    for seat in rng.sample(range(seats), int(seats * share)):
+        cabin.book(seat)
+        taken[seat] = 1
+    return cabin, taken
+
+
+def scan_available(taken):
+    return len(taken) - sum(taken)
+
+
+def scan_first_free(taken):
+    seat = taken.find(0)
+    return seat if seat >= 0 else None
+
+
+def scan_together(taken, count, layout=ECONOMY_LAYOUT):
+    """The same search as CabinSeats.find_together(), seat by seat"""
+    width = len(layout.replace("-", ""))
+    blocks, start = [], 0
+    for block in layout.split("-"):
+        blocks.append((start, start + len(block)))
+        start += len(block)
+    spans = [blocks, [(0, width)]]
+    for allowed in spans:
+        for row_start in range(0, len(taken), width):
+            for lo, hi in allowed:
+                for first in range(row_start + lo, row_start + hi - count + 1):
+                    if first + count <= len(taken) and not any(taken[first:first + count]):
+                        return list(range(first, first + count))
+    return None
+
+
+def timed(query, items):
+    start = time.perf_counter()
+    answers = [query(item) for item in items]
+    return (time.perf_counter() - start) / len(items) * 1e6, answers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seats", type=int, nargs="+", default=[30, 180, 600])
+    parser.add_argument("--fill", type=float, nargs="+", default=[0.5, 0.9])
+    parser.add_argument("--group", type=int, default=3)
+    parser.add_argument("--maps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{'Seats':>6}{'Fill':>6}  {'Query':<16}{'Bitset us':>11}{'Scan us':>10}{'Speed-up':>10}")
+    for seats in args.seats:
+        for share in args.fill:
+            rng = random.Random(args.seed)
+            maps = [fill(seats, share, rng) for _ in range(args.maps)]
+            cabins = [cabin for cabin, _ in maps]
+            arrays = [taken for _, taken in maps]
+            for name, bitset, scan in (
+                    ("available", CabinSeats.available, scan_available),
+                    ("first free", CabinSeats.first_free, scan_first_free),
+                    (f"{args.group} together", lambda cabin: cabin.find_together(args.group),
+                     lambda taken: scan_together(taken, args.group))):
+                bitset_us, expected = timed(bitset, cabins)
+                scan_us, answers = timed(scan, arrays)
+                assert answers == expected, f"{name} answers differ"
+                print(f"{seats:>6}{share:>6.0%}  {name:<16}{bitset_us:>11.2f}{scan_us:>10.2f}"
+                      f"{scan_us / bitset_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Load generator for the JSON/TCP server: requests/sec and latency percentiles
+
+    python -m benchmarks.bench_server --connections 1000 --requests 20
+
+Without --host/--port an in-process server is started on a free port and
+seeded with synthetic flights and customers. Every connection logs in and
+then sends its requests one after another, a mix of searches and
+bookings; latency is measured per request from send to reply.
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import sys
+import threading
+import time
+
+from benchmarks.datasets import booking_requests, populate
+from reservation_service import ReservationService
+from server import ReservationServer
+from validation import DESTINATIONS
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def client(host, port, requests, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        requests = [('login', {'username': "Staff", 'password': "Cloud123"})] + requests
+        for request_id, (op, args) in enumerate(requests):
+            start = time.perf_counter()
+            writer.write(json.dumps({'id': request_id, 'op': op, 'args': args}).encode() + b"\n")
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            if op != 'login':
+                latencies.append(time.perf_counter() - start)
+            if not response['ok'] and response['error'] != "SeatUnavailableError":
+                errors.append(response['message'])
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def make_requests(args, rng):
+    """Return one connection's request mix"""
+    bookings = booking_requests(args.requests, args.flights, args.customers, seed=rng.random())
+    requests = []
+    for flight_no, passport_no, travel_class in bookings:
+        if rng.random() < args.search_share:
+            requests.append(('search', {'departure_date': f"2026-11-{rng.randint(1, 28):02d}",
+                                        'destination': rng.choice(DESTINATIONS)}))
+        else:
+            requests.append(('book', {'flight_no': flight_no, 'passport_no': passport_no,
+                                      'travel_class': travel_class}))
+    return requests
+
+
+async def run(host, port, args):
+    rng = random.Random(args.seed)
+    latencies, errors = [], []
+    workloads = [make_requests(args, rng) for _ in range(args.connections)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(client(host, port, requests, latencies, errors)
+                                     for requests in workloads), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    failed = [result for result in results if isinstance(result, Exception)]
+    return elapsed, sorted(latencies), errors, failed
+
+
+def start_local_server(args):
+    """Run a seeded server on its own event loop thread and return it"""
+    service = ReservationService()
+    populate(service, args.flights, args.customers)
+    server = ReservationServer(service, port=0, workers=args.workers, queue_size=args.queue_size)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    async def serve():
+        await server.start()
+        started.set()
+
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(serve(), loop)
+    started.wait()
+    return server, loop
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="connect to a running server instead of starting one")
+    parser.add_argument("--connections", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20, help="requests per connection")
+    parser.add_argument("--search-share", type=float, default=0.5)
+    parser.add_argument("--flights", type=int, default=500)
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    # Each connection needs a descriptor at both ends when the server is local
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    server = loop = None
+    port = args.port
+    if port is None:
+        server, loop = start_local_server(args)
+        port = server.port
+
+    elapsed, latencies, errors, failed = asyncio.run(run(args.host, port, args))
+
+    if server is not None:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    print(f"Connections: {args.connections}  Requests: {len(latencies)}  Seconds: {elapsed:.3f}")
+    print(f"Requests/s:  {len(latencies) / elapsed:.0f}")
+    print(f"Latency ms:  p50 {percentile(latencies, 0.5) * 1000:.2f}  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f}  max {latencies[-1] * 1000 if latencies else 0:.2f}")
+    if errors or failed:
+        print(f"Errors: {len(errors)} request errors, {len(failed)} failed connections")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
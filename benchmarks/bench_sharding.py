@@ -0,0 +1,102 @@
+"""Measure how booking throughput scales with the number of shard processes
+
+    python -m benchmarks.bench_sharding --shards 1 2 4 8 --bookings 20000
+
+For each shard count a cluster is started and loaded with the same
+seeded flights and customers. Client processes (--clients-per-shard per
+shard, each with its own router) then book through the cluster
+as fast as they can, with a share of fan-out searches mixed in by
+--search-share. Throughput is total operations over the wall time from
+the moment every client has connected until the last one finishes. Scaling
+needs a core per shard and per client; on a box with fewer cores the
+extra processes only time-share.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+from benchmarks.datasets import booking_requests, synthetic_customer, synthetic_flight
+from sharding import ShardCluster, ShardRouter
+from validation import DESTINATIONS
+
+
+def client(addresses, authkey, requests, search_share, seed, start, results):
+    """Run one client's share of the workload through its own router"""
+    router = ShardRouter(addresses, authkey)
+    rng = random.Random(seed)
+    # Open every connection before the clock starts
+    router.flight_count()
+    operations = []
+    for request in requests:
+        if rng.random() < search_share:
+            operations.append(("search", {'destination': rng.choice(DESTINATIONS)}))
+        operations.append(("book", request))
+    start.wait()
+    began = time.perf_counter()
+    for op, args in operations:
+        if op == "book":
+            router.book(*args)
+        else:
+            router.search(**args)
+    results.put((len(operations), began, time.perf_counter()))
+    router.close()
+
+
+def run(shards, clients, flights, customers, bookings, search_share, seed):
+    context = multiprocessing.get_context("spawn")
+    cluster = ShardCluster(shards)
+    router = cluster.start()
+    try:
+        # Enough seats that no booking fails
+        seats = (bookings, bookings)
+        router.import_flights([synthetic_flight(i, seats) for i in range(flights)])
+        router.import_customers([synthetic_customer(i) for i in range(customers)])
+        requests = booking_requests(bookings, flights, customers, seed)
+
+        start = context.Barrier(clients + 1)
+        results = context.Queue()
+        workers = [context.Process(target=client, args=(cluster.addresses, cluster.authkey, requests[i::clients],
+                                                        search_share, seed + i, start, results))
+                   for i in range(clients)]
+        for worker in workers:
+            worker.start()
+        start.wait()
+        finished = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        assert router.booking_count() == bookings
+    finally:
+        cluster.stop()
+    operations = sum(count for count, _, _ in finished)
+    wall = max(end for _, _, end in finished) - min(began for _, began, _ in finished)
+    return operations, wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients-per-shard", type=int, default=2)
+    parser.add_argument("--flights", type=int, default=2000)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=20000)
+    parser.add_argument("--search-share", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{os.cpu_count()} CPUs; {args.bookings} bookings over {args.flights} flights")
+    print(f"{'Shards':>6}{'Clients':>9}{'Ops':>9}{'Seconds':>10}{'Ops/s':>11}{'Speed-up':>10}")
+    baseline = None
+    for shards in args.shards:
+        clients = shards * args.clients_per_shard
+        operations, seconds = run(shards, clients, args.flights, args.customers, args.bookings,
+                                  args.search_share, args.seed)
+        throughput = operations / seconds
+        baseline = baseline or throughput
+        print(f"{shards:>6}{clients:>9}{operations:>9}{seconds:>10.2f}{throughput:>11.0f}"
+              f"{throughput / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Measure startup time against the amount of booking history, eager and lazy
+
+    python -m benchmarks.bench_startup --history-days 0 30 180 360
+
+For each history length a store is filled with --flights-per-day flights
+a day, from that many days ago to --future-days ahead, each with
+--bookings-per-flight bookings, and snapshotted. The eager store keeps
+everything in its snapshot. A copy is then opened with
+archive_after_days set, which archives the departed flights on its
+first snapshot, as an existing store would be migrated. Startup is the
+best of --repeats constructions of the service on each. History lookups
+through the archive are then timed cold (every record read from the
+mapped files) and warm (served from its LRU caches).
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.datasets import synthetic_customer
+from history import DEFAULT_ARCHIVE_AFTER_DAYS
+from records import Flight
+from reservation_service import ReservationService
+from storage import DurableStore
+from validation import DESTINATIONS, TRAVEL_CLASSES
+
+BATCH = 5000
+
+
+def store(directory, lazy):
+    return DurableStore(directory, snapshot_every=0, synchronous=False, fsync=False,
+                        archive_after_days=DEFAULT_ARCHIVE_AFTER_DAYS if lazy else None)
+
+
+def build(directory, history_days, future_days, flights_per_day, bookings_per_flight, customers, seed):
+    """Fill an eager store and return the numbers of the flights and bookings now in the past"""
+    rng = random.Random(seed)
+    service = ReservationService(store(directory, lazy=False))
+    service.import_customers([synthetic_customer(i) for i in range(customers)])
+    today = datetime.date.today()
+    flights = []
+    for day in range(-history_days, future_days):
+        date = (today + datetime.timedelta(days=day)).isoformat()
+        for i in range(flights_per_day):
+            flights.append(Flight(f"JFK{len(flights):06d}", "JFK", DESTINATIONS[i % len(DESTINATIONS)],
+                                  date, f"{i * 7 % 24:02d}:{i % 4 * 15:02d}",
+                                  bookings_per_flight, bookings_per_flight, 50000, 100000))
+    service.import_flights(flights)
+    requests = [(flight.flight_no, f"P{rng.randrange(customers):08d}", rng.choice(TRAVEL_CLASSES))
+                for flight in flights for _ in range(bookings_per_flight)]
+    for start in range(0, len(requests), BATCH):
+        service.book_many(requests[start:start + BATCH])
+    service.checkpoint()
+    service.close()
+    return len(flights), len(requests)
+
+
+def startup_seconds(directory, lazy, repeats):
+    """Best construction time over repeats, and the last service built (left open)"""
+    timings = []
+    for attempt in range(repeats):
+        if attempt:
+            service.close()
+        start = time.perf_counter()
+        service = ReservationService(store(directory, lazy))
+        timings.append(time.perf_counter() - start)
+    return min(timings), service
+
+
+def lookup_us(service, booking_nos):
+    start = time.perf_counter()
+    for booking_no in booking_nos:
+        service.get_booking(booking_no)
+    return (time.perf_counter() - start) / len(booking_nos) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history-days", type=int, nargs="+", default=[0, 30, 180])
+    parser.add_argument("--future-days", type=int, default=30)
+    parser.add_argument("--flights-per-day", type=int, default=20)
+    parser.add_argument("--bookings-per-flight", type=int, default=50)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{'History days':>12}{'Bookings':>10}{'Eager s':>10}{'Lazy s':>10}{'Loaded':>9}"
+          f"{'Archived':>10}{'Cold us':>9}{'Warm us':>9}")
+    for history_days in args.history_days:
+        root = tempfile.mkdtemp(prefix="bench_startup")
+        try:
+            eager_dir, lazy_dir = os.path.join(root, "eager"), os.path.join(root, "lazy")
+            _, bookings = build(eager_dir, history_days, args.future_days, args.flights_per_day,
+                                args.bookings_per_flight, args.customers, args.seed)
+            eager, service = startup_seconds(eager_dir, lazy=False, repeats=args.repeats)
+            service.close()
+
+            shutil.copytree(eager_dir, lazy_dir)
+            service = ReservationService(store(lazy_dir, lazy=True))
+            service.checkpoint()
+            service.close()
+            lazy, service = startup_seconds(lazy_dir, lazy=True, repeats=args.repeats)
+
+            cold = warm = 0.0
+            archived = service.history.booking_count()
+            if archived:
+                rng = random.Random(args.seed)
+                # Booking numbers follow flight order, so the first ones are all archived
+                sample = [rng.randrange(1, archived + 1) for _ in range(args.lookups)]
+                cold = lookup_us(service, sample)
+                cached = sample[:service.history.cache_size // 2]
+                lookup_us(service, cached)
+                warm = lookup_us(service, cached)
+            print(f"{history_days:>12}{bookings:>10}{eager:>10.3f}{lazy:>10.3f}{service.booking_count():>9}"
+                  f"{archived:>10}{cold:>9.1f}{warm:>9.1f}")
+            service.close()
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
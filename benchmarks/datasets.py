@@ -0,0 +1,41 @@
+"""Seeded synthetic flights, customers and booking requests for benchmarks
+
+The JFKxxx and Cxxx formats allow only 1000 flights and customers through
+the validated service API, so larger datasets are inserted with the
+storage-level store_flight/store_customer calls using wider IDs.
+"""
+import random
+
+from records import Customer, Flight
+from validation import DESTINATIONS, TRAVEL_CLASSES
+
+
+def synthetic_flight(i, seats=(70, 30), start_day=0, days=28):
+    """Return flight number i of a schedule spread over `days` days"""
+    day = start_day + i % days
+    return Flight(f"JFK{i:03d}", "JFK", DESTINATIONS[i % len(DESTINATIONS)],
+                  f"2026-{11 + day // 30:02d}-{day % 30 + 1:02d}",
+                  f"{i * 7 % 24:02d}:{i % 4 * 15:02d}",
+                  seats[0], seats[1], 50000, 100000)
+
+
+def synthetic_customer(i):
+    """Return customer number i"""
+    return Customer(f"C{i:03d}", f"Passenger {i}", f"P{i:08d}", f"{i} Main St", f"{5550000 + i}")
+
+
+def populate(service, flights, customers, seats=(70, 30)):
+    """Insert synthetic flights and customers into a service"""
+    for i in range(flights):
+        service.store_flight(synthetic_flight(i, seats))
+    for i in range(customers):
+        service.store_customer(synthetic_customer(i))
+
+
+def booking_requests(count, flights, customers, seed=1, business_share=0.2):
+    """Return a list of (flight_no, passport_no, travel_class) booking requests"""
+    rng = random.Random(seed)
+    economy, business = TRAVEL_CLASSES
+    return [(f"JFK{rng.randrange(flights):03d}", f"P{rng.randrange(customers):08d}",
+             business if rng.random() < business_share else economy)
+            for _ in range(count)]
@@ -0,0 +1,246 @@
+"""Benchmark suite for the core reservation workflows
+
+    python -m benchmarks.suite --flights 5000 --customers 50000 --bookings 100000 --json run.json
+    python -m benchmarks.suite --json new.json --compare run.json
+
+A seeded synthetic dataset of N flights, M customers and K booking
+requests is pushed through flight creation, customer registration,
+searches, single and concurrent bookings, and booking listings. Every
+operation is timed individually, and each phase reports ops/sec and
+p50/p99 latency. With --memory each phase also reports its tracemalloc
+peak (this slows the run down). --json writes the results, with the git
+commit and parameters, so runs can be compared across commits.
+"""
+import argparse
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+from benchmarks.datasets import booking_requests, synthetic_customer, synthetic_flight
+from reservation_service import ReservationError, ReservationService
+from sqlite_backend import SQLiteBackend
+from validation import DESTINATIONS
+
+# The JFKxxx and Cxxx formats allow this many validated IDs
+VALIDATED_IDS = 1000
+
+
+class Phase:
+    """Per-operation latencies and optional peak memory of one benchmark phase"""
+
+    def __init__(self, name, trace_memory=False):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.latencies = []
+        self.seconds = 0.0
+        self.peak_bytes = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._start
+        if self.trace_memory:
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def time(self, func, *args, **kwargs):
+        """Call func, recording its latency; ReservationErrors count as completed operations"""
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except ReservationError:
+            return None
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    def extend(self, latencies):
+        with self._lock:
+            self.latencies.extend(latencies)
+
+    def result(self):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+
+        def percentile(fraction):
+            return latencies[min(count - 1, int(fraction * count))] * 1e6 if count else 0.0
+
+        return {
+            'ops': count,
+            'seconds': round(self.seconds, 6),
+            'ops_per_sec': round(count / self.seconds, 1) if self.seconds else 0.0,
+            'p50_us': round(percentile(0.50), 2),
+            'p99_us': round(percentile(0.99), 2),
+            'peak_kib': round(self.peak_bytes / 1024, 1) if self.peak_bytes is not None else None,
+        }
+
+
+def run_suite(args):
+    """Run every phase on a fresh service and return {phase: result}"""
+    rng = random.Random(args.seed)
+    service = ReservationService(backend=SQLiteBackend() if args.backend == "sqlite" else None)
+    results = {}
+
+    def phase(name):
+        return Phase(name, args.memory)
+
+    # Flight creation: validated creates with a duplicate attempt every tenth call,
+    # then the remaining flights through the storage-level duplicate check
+    with phase("create_flight") as p:
+        for i in range(min(args.flights, VALIDATED_IDS)):
+            flight = synthetic_flight(i)
+            p.time(service.create_flight, flight.flight_no, flight.arrival_to, flight.departure_date,
+                   flight.departure_time, flight.economy_seats, flight.business_seats)
+            if i % 10 == 9:
+                p.time(service.create_flight, f"JFK{rng.randrange(i):03d}", flight.arrival_to,
+                       flight.departure_date, flight.departure_time)
+    results[p.name] = p.result()
+
+    with phase("store_flight") as p:
+        for i in range(VALIDATED_IDS, args.flights):
+            p.time(service.store_flight, synthetic_flight(i))
+    results[p.name] = p.result()
+
+    with phase("register") as p:
+        for i in range(min(args.customers, VALIDATED_IDS)):
+            customer = synthetic_customer(i)
+            p.time(service.register, customer.customer_id, customer.name, customer.passport_no,
+                   customer.address, customer.telephone)
+    results[p.name] = p.result()
+
+    with phase("store_customer") as p:
+        for i in range(VALIDATED_IDS, args.customers):
+            p.time(service.store_customer, synthetic_customer(i))
+    results[p.name] = p.result()
+
+    days = [synthetic_flight(i).departure_date for i in range(28)]
+    searches = {
+        'search_date': lambda: dict(departure_date=rng.choice(days)),
+        'search_date_destination': lambda: dict(departure_date=rng.choice(days),
+                                                destination=rng.choice(DESTINATIONS)),
+        'search_date_time': lambda: dict(departure_date=rng.choice(days),
+                                         departure_time=synthetic_flight(rng.randrange(28)).departure_time),
+        'search_destination_class': lambda: dict(destination=rng.choice(DESTINATIONS),
+                                                 travel_class="business"),
+        'search_week_range': lambda: dict(date_from=days[0], date_to=days[6], travel_class="economy"),
+    }
+    for name, criteria in searches.items():
+        with phase(name) as p:
+            for _ in range(args.searches):
+                p.time(service.search, **criteria())
+        results[p.name] = p.result()
+
+    requests = booking_requests(args.bookings, args.flights, args.customers, seed=args.seed)
+    half = len(requests) // 2
+    with phase("book") as p:
+        for request in requests[:half]:
+            p.time(service.book, *request)
+    results[p.name] = p.result()
+
+    with phase(f"book_{args.threads}_threads") as p:
+        chunks = [requests[half:][i::args.threads] for i in range(args.threads)]
+
+        def worker(chunk):
+            local = Phase(p.name)
+            for request in chunk:
+                local.time(service.book, *request)
+            p.extend(local.latencies)
+
+        threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    results[p.name] = p.result()
+
+    with phase("list_bookings_date") as p:
+        for _ in range(args.listings):
+            p.time(service.list_bookings, departure_date=rng.choice(days))
+    results[p.name] = p.result()
+
+    with phase("page_bookings_date") as p:
+        for _ in range(args.listings):
+            p.time(service.page_bookings, departure_date=rng.choice(days), limit=50)
+    results[p.name] = p.result()
+
+    with phase("bookings_by_date") as p:
+        for _ in range(max(1, args.listings // 100)):
+            p.time(service.bookings_by_date)
+    results[p.name] = p.result()
+
+    with phase("report_by_date") as p:
+        for _ in range(args.listings):
+            p.time(service.reports.by_date)
+    results[p.name] = p.result()
+
+    service.close()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flights", type=int, default=2000)
+    parser.add_argument("--customers", type=int, default=20_000)
+    parser.add_argument("--bookings", type=int, default=40_000)
+    parser.add_argument("--searches", type=int, default=2000)
+    parser.add_argument("--listings", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--memory", action="store_true", help="trace peak memory per phase (slower)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as previous:
+            baseline = json.load(previous)['results']
+
+    print(f"{'Phase':<28}{'Ops':>8}{'Ops/s':>12}{'p50 us':>10}{'p99 us':>10}{'Peak KiB':>10}"
+          + (f"{'vs base':>9}" if baseline else ""))
+    for name, result in results.items():
+        peak = f"{result['peak_kib']:.0f}" if result['peak_kib'] is not None else "-"
+        line = (f"{name:<28}{result['ops']:>8}{result['ops_per_sec']:>12.0f}"
+                f"{result['p50_us']:>10.1f}{result['p99_us']:>10.1f}{peak:>10}")
+        if name in baseline and baseline[name]['ops_per_sec']:
+            line += f"{result['ops_per_sec'] / baseline[name]['ops_per_sec']:>8.2f}x"
+        print(line)
+    max_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"Peak RSS: {max_rss_kib / 1024:.1f} MiB")
+
+    if args.json:
+        report = {
+            'commit': git_commit(),
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'parameters': {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+            'peak_rss_kib': max_rss_kib,
+            'results': results,
+        }
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
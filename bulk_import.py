@@ -0,0 +1,195 @@
+"""Streaming bulk import of flight schedules and customer rosters
+
+    python bulk_import.py flights schedule.csv
+    python bulk_import.py customers roster.jsonl
+
+CSV files need a header row; JSON Lines files hold one object per line.
+Both use the field names of the original dict layout (flight_no,
+arrival_to, departure_date, ... and customer_id, name, passport_no, ...).
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+from typing import Dict, Iterator, List, Tuple
+
+from history import DEFAULT_ARCHIVE_AFTER_DAYS
+from reservation_service import ReservationService, ValidationError
+from storage import DurableStore
+from validation import ORIGIN, airport_name
+
+# Rows validated and inserted together
+DEFAULT_BATCH_SIZE = 5000
+
+# Row errors kept in a report; any beyond this are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportReport:
+    """Outcome of an import: how many rows were read and added, and why others were not"""
+
+    def __init__(self, max_errors: int = MAX_REPORTED_ERRORS):
+        self.rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.max_errors = max_errors
+
+    def add_error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, message))
+
+    def __repr__(self):
+        return f"ImportReport(rows={self.rows}, imported={self.imported}, errors={self.error_count})"
+
+
+def read_rows(source, file_format: str = "") -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield (line number, row dict) from a CSV or JSON Lines file, one row at a time
+
+    source is a path or an open text file; the format is taken from the
+    file extension unless given. A JSON line that does not parse is
+    yielded as (line, None) so the caller can report it and carry on.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if not file_format:
+            file_format = "csv" if os.fspath(source).lower().endswith(".csv") else "jsonl"
+        with open(source, newline="", encoding="utf-8") as stream:
+            yield from read_rows(stream, file_format)
+        return
+
+    if file_format == "csv":
+        reader = csv.DictReader(source)
+        for row in reader:
+            # The header is line 1, so data rows start at line 2
+            yield reader.line_num, row
+    elif file_format in ("jsonl", "ndjson", "json"):
+        for line_no, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_no, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"Unknown import format {file_format!r}")
+
+
+def _text(row, field, default=""):
+    value = row.get(field)
+    return default if value is None else str(value).strip()
+
+
+def _number(row, field, convert, default):
+    value = _text(row, field)
+    if not value:
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValidationError(f"Invalid number for {field}: {value!r}")
+
+
+def _airport(row, field, default=""):
+    """Airport name in its canonical spelling; unknown names are left for validation to reject"""
+    value = _text(row, field, default)
+    return airport_name(value) or value
+
+
+def flight_from_row(service: ReservationService, row):
+    """Validate one flight row with the add_flight rules and return its record"""
+    return service.validate_flight(_text(row, "flight_no").upper(),
+                                   _airport(row, "arrival_to"),
+                                   _text(row, "departure_date"),
+                                   _text(row, "departure_time"),
+                                   _number(row, "economy_seats", int, 70),
+                                   _number(row, "business_seats", int, 30),
+                                   _number(row, "economy_fare", float, 500.0),
+                                   _number(row, "business_fare", float, 1000.0),
+                                   _airport(row, "departure_from", ORIGIN),
+                                   _number(row, "duration_minutes", int, None))
+
+
+def customer_from_row(service: ReservationService, row):
+    """Validate one customer row with the register_customer rules and return its record"""
+    return service.validate_customer(_text(row, "customer_id").upper(),
+                                     _text(row, "name"),
+                                     _text(row, "passport_no"),
+                                     _text(row, "address"),
+                                     _text(row, "telephone"))
+
+
+def _import(service, rows, build, insert, batch_size, report):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return report
+
+        records, lines = [], {}
+        for line, row in batch:
+            report.rows += 1
+            if row is None:
+                report.add_error(line, "Row is not a JSON object")
+                continue
+            try:
+                record = build(service, row)
+            except ValidationError as e:
+                report.add_error(line, str(e))
+                continue
+            records.append(record)
+            lines[id(record)] = line
+
+        rejected = insert(records)
+        for record, reason in rejected:
+            report.add_error(lines[id(record)], reason)
+        report.imported += len(records) - len(rejected)
+
+
+def import_flights(service: ReservationService, source, file_format: str = "",
+                   batch_size: int = DEFAULT_BATCH_SIZE) -> ImportReport:
+    """Stream flights from a CSV or JSON Lines source into the service
+
+    Rows are validated one by one and inserted batch_size at a time, so
+    memory stays bounded however long the file is. Invalid or duplicate
+    rows are recorded in the report and skipped; the import never aborts
+    on a bad row.
+    """
+    return _import(service, read_rows(source, file_format), flight_from_row,
+                   service.import_flights, batch_size, ImportReport())
+
+
+def import_customers(service: ReservationService, source, file_format: str = "",
+                     batch_size: int = DEFAULT_BATCH_SIZE) -> ImportReport:
+    """Stream customers from a CSV or JSON Lines source into the service"""
+    return _import(service, read_rows(source, file_format), customer_from_row,
+                   service.import_customers, batch_size, ImportReport())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import flights or customers")
+    parser.add_argument("kind", choices=("flights", "customers"))
+    parser.add_argument("path")
+    parser.add_argument("--format", default="", choices=("", "csv", "jsonl"))
+    parser.add_argument("--data", default="reservation_data", help="directory for the log and snapshots")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    service = ReservationService(DurableStore(args.data, archive_after_days=DEFAULT_ARCHIVE_AFTER_DAYS))
+    try:
+        importer = import_flights if args.kind == "flights" else import_customers
+        report = importer(service, args.path, args.format, args.batch_size)
+    finally:
+        service.close()
+
+    print(f"Read {report.rows} rows, imported {report.imported}, rejected {report.error_count}")
+    for line, message in sorted(report.errors):
+        print(f"  line {line}: {message}")
+    if report.error_count > len(report.errors):
+        print(f"  ... and {report.error_count - len(report.errors)} more")
+
+
+if __name__ == "__main__":
+    main()
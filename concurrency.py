@@ -0,0 +1,120 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+
+class FlightLocks:
+    """One lock per flight, created on first use
+
+    Bookings on different flights never contend; only bookings for the
+    same flight serialise, which is what keeps its seat check and
+    increment atomic.
+
+    When wait_observer is set (see metrics.instrument) it is called with
+    the seconds spent waiting for the locks on every hold().
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self.wait_observer: Optional[Callable[[float], None]] = None
+
+    def get(self, flight_no: str) -> threading.Lock:
+        lock = self._locks.get(flight_no)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault(flight_no, threading.Lock())
+        return lock
+
+    @contextmanager
+    def hold(self, *flight_nos: str):
+        """Hold the locks of several flights, always acquired in sorted order"""
+        locks = [self.get(flight_no) for flight_no in sorted(set(flight_nos))]
+        observer = self.wait_observer
+        if observer is None:
+            for lock in locks:
+                lock.acquire()
+        else:
+            start = time.perf_counter()
+            for lock in locks:
+                lock.acquire()
+            observer(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+
+class SharedExclusiveLock:
+    """Many shared holders or one exclusive holder
+
+    Mutations hold it shared so they run in parallel; a snapshot holds it
+    exclusively so it sees no half-applied mutation. Waiting exclusive
+    holders block new shared holders so snapshots are not starved.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._shared = 0
+        self._exclusive = False
+        self._exclusive_waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._exclusive or self._exclusive_waiting:
+                self._cond.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                if not self._shared:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._exclusive_waiting += 1
+            while self._exclusive or self._shared:
+                self._cond.wait()
+            self._exclusive_waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+
+class SequenceGenerator:
+    """Thread-safe, strictly increasing integer sequence
+
+    With a step, values go up by step at a time and stay congruent to
+    last modulo step, so several generators (one per shard, see
+    sharding.py) can hand out values that never collide.
+    """
+
+    def __init__(self, last: int = 0, step: int = 1):
+        self._last = last
+        self._step = step
+        self._lock = threading.Lock()
+
+    @property
+    def last(self) -> int:
+        return self._last
+
+    def next(self) -> int:
+        with self._lock:
+            self._last += self._step
+            return self._last
+
+    def observe(self, value: int):
+        """Make sure future values are greater than one already in use"""
+        with self._lock:
+            if value > self._last:
+                self._last += -(-(value - self._last) // self._step) * self._step
@@ -0,0 +1,230 @@
+"""Streaming export of bookings, passenger manifests and flight inventory
+
+    python export.py bookings bookings-2026-11.csv.gz --from 2026-11-01 --to 2026-11-30
+    python export.py manifests manifest.jsonl --flight JFK001
+    python export.py flights inventory.csv
+
+The format comes from the file extension (.csv or .jsonl, with an
+optional .gz suffix for gzip). Rows are generated one at a time, bookings
+are read a page at a time, and output is written in chunks, so memory
+stays flat however large the export is.
+"""
+import argparse
+import csv
+import gzip
+import heapq
+import io
+import json
+from typing import Dict, Iterator, List
+
+from history import DEFAULT_ARCHIVE_AFTER_DAYS
+from reservation_service import ReservationService
+from storage import DurableStore
+
+# Rows formatted before each write to the output file
+DEFAULT_CHUNK_ROWS = 10000
+
+# Bookings fetched from the backend per page
+PAGE_SIZE = 1000
+
+BOOKING_FIELDS = ("booking_id", "flight_no", "customer_id", "passport_no", "customer_name",
+                  "departure_date", "departure_time", "destination", "travel_class", "seat", "fare",
+                  "booking_date")
+MANIFEST_FIELDS = ("flight_no", "departure_date", "departure_time", "destination", "booking_id",
+                   "customer_name", "passport_no", "travel_class", "seat")
+FLIGHT_FIELDS = ("flight_no", "departure_from", "arrival_to", "departure_date", "departure_time",
+                 "economy_seats", "business_seats", "economy_fare", "business_fare",
+                 "duration_minutes", "economy_booked", "business_booked", "economy_available",
+                 "business_available")
+
+
+def _flights(service: ReservationService, date_from: str = "", date_to: str = "", flight_no: str = ""):
+    """Flights in departure order, narrowed to a date range and/or one flight"""
+    if flight_no:
+        flight = service.get_flight(flight_no)
+        if (flight is None or (date_from and flight.departure_date < date_from)
+                or (date_to and flight.departure_date > date_to)):
+            return []
+        return [flight]
+    flights = service.search(date_from=date_from, date_to=date_to)
+    archived = service.archived_flights(date_from, date_to)
+    if archived:
+        return list(heapq.merge(archived, flights, key=lambda flight: (flight.departs_at, flight.flight_no)))
+    return flights
+
+
+def _flight_bookings(service: ReservationService, flight_no: str) -> Iterator:
+    """Yield one flight's bookings, fetched a page at a time"""
+    cursor = None
+    while True:
+        page = service.page_bookings(flight_no=flight_no, cursor=cursor, limit=PAGE_SIZE)
+        yield from page.bookings
+        cursor = page.next_cursor
+        if cursor is None:
+            return
+
+
+def booking_rows(service: ReservationService, date_from: str = "", date_to: str = "",
+                 flight_no: str = "") -> Iterator[Dict]:
+    """Yield bookings as dicts, flight by flight in departure order"""
+    for flight in _flights(service, date_from, date_to, flight_no):
+        for booking in _flight_bookings(service, flight.flight_no):
+            yield booking.as_dict()
+
+
+def manifest_rows(service: ReservationService, date_from: str = "", date_to: str = "",
+                  flight_no: str = "") -> Iterator[Dict]:
+    """Yield one row per passenger, grouped by flight in departure order"""
+    for flight in _flights(service, date_from, date_to, flight_no):
+        for booking in _flight_bookings(service, flight.flight_no):
+            yield {
+                'flight_no': flight.flight_no,
+                'departure_date': flight.departure_date,
+                'departure_time': flight.departure_time,
+                'destination': flight.arrival_to,
+                'booking_id': booking.booking_id,
+                'customer_name': booking.customer_name,
+                'passport_no': booking.passport_no,
+                'travel_class': booking.travel_class,
+                'seat': booking.seat_label
+            }
+
+
+def manifests(service: ReservationService, date_from: str = "", date_to: str = "",
+              flight_no: str = "") -> Iterator[Dict]:
+    """Yield one manifest per flight with its passenger list
+
+    A manifest holds at most one aircraft's passengers, so only one
+    flight's worth of bookings is in memory at a time.
+    """
+    for flight in _flights(service, date_from, date_to, flight_no):
+        yield {
+            'flight_no': flight.flight_no,
+            'departure_date': flight.departure_date,
+            'departure_time': flight.departure_time,
+            'destination': flight.arrival_to,
+            'passengers': [{'booking_id': booking.booking_id,
+                            'customer_name': booking.customer_name,
+                            'passport_no': booking.passport_no,
+                            'travel_class': booking.travel_class,
+                            'seat': booking.seat_label}
+                           for booking in _flight_bookings(service, flight.flight_no)]
+        }
+
+
+def flight_rows(service: ReservationService, date_from: str = "", date_to: str = "",
+                flight_no: str = "") -> Iterator[Dict]:
+    """Yield flight inventory rows with booked and available seats per class"""
+    for flight in _flights(service, date_from, date_to, flight_no):
+        row = flight.as_dict()
+        row['economy_available'] = flight.available("economy")
+        row['business_available'] = flight.available("business")
+        yield row
+
+
+def _format_of(path: str):
+    """Return (format, gzip?) from a file name such as bookings.csv.gz"""
+    name = path.lower()
+    compress = name.endswith(".gz")
+    if compress:
+        name = name[:-3]
+    return ("csv" if name.endswith(".csv") else "jsonl"), compress
+
+
+def write_rows(rows, path: str, fields=None, file_format: str = "", compress=None,
+               chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+    """Write rows to CSV or JSON Lines in chunks, returning how many were written
+
+    fields sets the CSV columns (default: the first row's keys); JSON
+    Lines writes each row as it is. Every chunk_rows rows are formatted
+    into one string and written with a single call through the file's
+    buffer (and gzip stream when compressing).
+    """
+    detected_format, detected_compress = _format_of(path)
+    file_format = file_format or detected_format
+    compress = detected_compress if compress is None else compress
+    if file_format not in ("csv", "jsonl"):
+        raise ValueError(f"Unknown export format {file_format!r}")
+
+    if compress:
+        out = io.TextIOWrapper(gzip.open(path, "wb"), encoding="utf-8", newline="")
+    else:
+        out = open(path, "w", encoding="utf-8", newline="", buffering=1024 * 1024)
+
+    count = 0
+    with out:
+        chunk = io.StringIO()
+        writer = None
+        for row in rows:
+            if file_format == "csv":
+                if writer is None:
+                    writer = csv.DictWriter(chunk, fieldnames=fields or list(row), extrasaction="ignore")
+                    writer.writeheader()
+                writer.writerow(row)
+            else:
+                chunk.write(json.dumps(row, separators=(',', ':')))
+                chunk.write("\n")
+            count += 1
+            if count % chunk_rows == 0:
+                out.write(chunk.getvalue())
+                chunk.seek(0)
+                chunk.truncate()
+        if file_format == "csv" and writer is None and fields:
+            csv.DictWriter(chunk, fieldnames=fields).writeheader()
+        out.write(chunk.getvalue())
+    return count
+
+
+def export_bookings(service: ReservationService, path: str, date_from: str = "", date_to: str = "",
+                    flight_no: str = "", **options) -> int:
+    """Export bookings departing in a date range and/or on one flight"""
+    return write_rows(booking_rows(service, date_from, date_to, flight_no), path, BOOKING_FIELDS,
+                      **options)
+
+
+def export_manifests(service: ReservationService, path: str, date_from: str = "", date_to: str = "",
+                     flight_no: str = "", **options) -> int:
+    """Export passenger manifests: flat passenger rows for CSV, one object per flight for JSON Lines"""
+    file_format = options.get('file_format') or _format_of(path)[0]
+    if file_format == "csv":
+        rows = manifest_rows(service, date_from, date_to, flight_no)
+    else:
+        rows = manifests(service, date_from, date_to, flight_no)
+    return write_rows(rows, path, MANIFEST_FIELDS, **options)
+
+
+def export_flights(service: ReservationService, path: str, date_from: str = "", date_to: str = "",
+                   flight_no: str = "", **options) -> int:
+    """Export flight inventory"""
+    return write_rows(flight_rows(service, date_from, date_to, flight_no), path, FLIGHT_FIELDS,
+                      **options)
+
+
+EXPORTERS = {
+    'bookings': export_bookings,
+    'manifests': export_manifests,
+    'flights': export_flights,
+}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Export bookings, manifests or flight inventory")
+    parser.add_argument("kind", choices=sorted(EXPORTERS))
+    parser.add_argument("path", help="output file: .csv or .jsonl, optionally ending in .gz")
+    parser.add_argument("--from", dest="date_from", default="", help="first departure date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", default="", help="last departure date (YYYY-MM-DD)")
+    parser.add_argument("--flight", default="", help="only this flight number")
+    parser.add_argument("--data", default="reservation_data", help="directory for the log and snapshots")
+    args = parser.parse_args(argv)
+
+    service = ReservationService(DurableStore(args.data, archive_after_days=DEFAULT_ARCHIVE_AFTER_DAYS))
+    try:
+        count = EXPORTERS[args.kind](service, args.path, args.date_from, args.date_to,
+                                     args.flight.upper())
+    finally:
+        service.close()
+    print(f"Exported {count} rows to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
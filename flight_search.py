@@ -0,0 +1,133 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Set, Tuple
+
+from records import Flight
+from validation import TRAVEL_CLASSES, departure_minutes
+
+MINUTES_PER_DAY = 1440
+
+
+class FlightSearchIndex:
+    """Composite indexes over the flight schedule for search queries
+
+    Every index holds (departs_at, flight_no) keys in sorted order, so a
+    date or date/time range is two bisects over integers instead of a scan,
+    and no date or time string is parsed or compared per flight.
+    Destination and departure time each get their own sorted key list, and
+    the class filter is answered from per-class sets of flights that still
+    have free seats.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self._schedule: List[Tuple[int, str]] = []
+        self._by_destination: Dict[str, List[Tuple[int, str]]] = {}
+        self._by_time: Dict[str, List[Tuple[int, str]]] = {}
+        self._available: Dict[str, Set[str]] = {cls: set() for cls in TRAVEL_CLASSES}
+
+    def __len__(self):
+        return len(self._flights)
+
+    def add(self, flight):
+        """Index a newly added flight"""
+        key = (flight.departs_at, flight.flight_no)
+        self._flights[flight.flight_no] = flight
+        insort(self._schedule, key)
+        insort(self._by_destination.setdefault(flight.arrival_to, []), key)
+        insort(self._by_time.setdefault(flight.departure_time, []), key)
+        self.update_availability(flight)
+
+    def add_many(self, flights):
+        """Index a batch of flights, sorting each key list once instead of per insert"""
+        touched = [self._schedule]
+        for flight in flights:
+            key = (flight.departs_at, flight.flight_no)
+            self._flights[flight.flight_no] = flight
+            self._schedule.append(key)
+            by_destination = self._by_destination.setdefault(flight.arrival_to, [])
+            by_time = self._by_time.setdefault(flight.departure_time, [])
+            by_destination.append(key)
+            by_time.append(key)
+            touched.extend((by_destination, by_time))
+            self.update_availability(flight)
+        for keys in {id(keys): keys for keys in touched}.values():
+            keys.sort()
+
+    def remove_many(self, flights):
+        """Drop a batch of flights from every index"""
+        keys = {(flight.departs_at, flight.flight_no) for flight in flights}
+        for flight in flights:
+            self._flights.pop(flight.flight_no, None)
+            for available in self._available.values():
+                available.discard(flight.flight_no)
+        self._schedule = [key for key in self._schedule if key not in keys]
+        for index, values in ((self._by_destination, {flight.arrival_to for flight in flights}),
+                              (self._by_time, {flight.departure_time for flight in flights})):
+            for value in values:
+                index[value] = [key for key in index[value] if key not in keys]
+
+    def update_availability(self, flight):
+        """Refresh the per-class availability sets after seat counts change"""
+        for cls in TRAVEL_CLASSES:
+            if flight.available(cls) > 0:
+                self._available[cls].add(flight.flight_no)
+            else:
+                self._available[cls].discard(flight.flight_no)
+
+    def has_availability(self, flight_no, travel_class):
+        """Return True if the flight has a free seat in the given class"""
+        return flight_no in self._available[travel_class]
+
+    def available_flight_numbers(self, travel_class):
+        """Return the flight numbers that still have seats in a class"""
+        return frozenset(self._available[travel_class])
+
+    def query(self, departure_date: str = "", departure_time: str = "",
+              destination: str = "", travel_class: str = "",
+              date_from: str = "", date_to: str = "") -> List[Flight]:
+        """Return matching flights ordered by departure
+
+        Empty criteria are skipped, exactly like the interactive search.
+        departure_date narrows the date_from/date_to range to a single day.
+        When travel_class is given only flights with a free seat in that
+        class are returned.
+        """
+        if departure_date:
+            date_from = max(date_from, departure_date) if date_from else departure_date
+            date_to = min(date_to, departure_date) if date_to else departure_date
+            if date_from > date_to:
+                return []
+
+        # Start from the smallest sorted key list the criteria allow
+        candidates = [self._schedule]
+        if destination:
+            candidates.append(self._by_destination.get(destination, []))
+        if departure_time:
+            candidates.append(self._by_time.get(departure_time, []))
+        keys = min(candidates, key=len)
+
+        if date_from and date_from == date_to and departure_time:
+            start = departure_minutes(date_from, departure_time)
+            lo = bisect_left(keys, (start,))
+            hi = bisect_left(keys, (start + 1,))
+        else:
+            lo = bisect_left(keys, (departure_minutes(date_from, "00:00"),)) if date_from else 0
+            hi = (bisect_left(keys, (departure_minutes(date_to, "00:00") + MINUTES_PER_DAY,))
+                  if date_to else len(keys))
+
+        available = self._available[travel_class] if travel_class else None
+        results = []
+        for _, flight_no in keys[lo:hi]:
+            if available is not None and flight_no not in available:
+                continue
+            flight = self._flights[flight_no]
+            if departure_time and flight.departure_time != departure_time:
+                continue
+            if destination and flight.arrival_to != destination:
+                continue
+            results.append(flight)
+        return results
+
+    def between(self, date_from: str, date_to: str, **criteria) -> List[Flight]:
+        """Return flights departing between two dates, inclusive"""
+        return self.query(date_from=date_from, date_to=date_to, **criteria)
@@ -0,0 +1,371 @@
+import heapq
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from records import BUSINESS, ECONOMY, Flight
+
+# Flights that departed more than this many days before today are archived
+DEFAULT_ARCHIVE_AFTER_DAYS = 1
+
+# Most archived flights and bookings kept decoded in memory
+HISTORY_CACHE_SIZE = 4096
+
+FLIGHTS_FILE = "flights.dat"
+BOOKINGS_FILE = "bookings.dat"
+INDEX_PREFIX = "index-"
+INDEX_SUFFIX = ".dat"
+INDEX_MAGIC = b"FRH2"
+
+# Fixed-width records, little-endian; strings are UTF-8 padded with NULs.
+# A flight: number, from, to, date, time, seats, base fares, duration,
+# final booked counts, and the position and count of its bookings
+FLIGHT_RECORD = struct.Struct("<16s24s24s10s5sIIqqIIIQI")
+# A booking: number, flight number, customer ID, business class?, fare, booked_at, seat
+BOOKING_RECORD = struct.Struct("<Q16s16s?qqI")
+
+# Index entries, each array sorted by its key
+FLIGHT_KEY = struct.Struct("<16sQ")     # flight number, flight position
+DATE_KEY = struct.Struct("<10sQ")       # departure date, flight position
+BOOKING_KEY = struct.Struct("<QQ")      # booking number, booking position
+INDEX_HEADER = struct.Struct("<4sQQ")   # magic, flights, bookings
+
+
+def _text(value: bytes) -> str:
+    return value.rstrip(b"\0").decode()
+
+
+def _field(value: str, width: int) -> bytes:
+    """Encode a string for a fixed-width field, refusing values that would be cut short"""
+    encoded = value.encode()
+    if len(encoded) > width:
+        raise ValueError(f"{value!r} does not fit a {width}-byte history field")
+    return encoded
+
+
+class _SortedKeys:
+    """A sorted array of fixed-width keys in a buffer, read as tuples so bisect can search it"""
+
+    def __init__(self, buffer, offset: int, count: int, layout: struct.Struct):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+        self.layout = layout
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return self.layout.unpack_from(self.buffer, self.offset + i * self.layout.size)
+
+    def bytes(self) -> bytes:
+        return bytes(self.buffer[self.offset:self.offset + self.count * self.layout.size])
+
+
+class _View:
+    """The mapped files of one archive state; replaced whole, never changed"""
+
+    __slots__ = ('seq', 'flights', 'bookings', 'flight_data', 'booking_data',
+                 'by_flight_no', 'by_date', 'by_booking_no', '_maps')
+
+    def __init__(self, directory: str, seq: int = 0, flights: int = 0, bookings: int = 0):
+        self.seq = seq
+        self.flights = flights
+        self.bookings = bookings
+        self._maps = []
+        self.flight_data = self._map(os.path.join(directory, FLIGHTS_FILE), flights * FLIGHT_RECORD.size)
+        self.booking_data = self._map(os.path.join(directory, BOOKINGS_FILE), bookings * BOOKING_RECORD.size)
+        index = b""
+        if flights or bookings:
+            index = self._map(index_path(directory, seq), INDEX_HEADER.size
+                              + flights * (FLIGHT_KEY.size + DATE_KEY.size) + bookings * BOOKING_KEY.size)
+            magic, indexed_flights, indexed_bookings = INDEX_HEADER.unpack_from(index)
+            if magic != INDEX_MAGIC or (indexed_flights, indexed_bookings) != (flights, bookings):
+                raise ValueError(f"history index {index_path(directory, seq)} does not match the snapshot")
+        offset = INDEX_HEADER.size
+        self.by_flight_no = _SortedKeys(index, offset, flights, FLIGHT_KEY)
+        offset += flights * FLIGHT_KEY.size
+        self.by_date = _SortedKeys(index, offset, flights, DATE_KEY)
+        offset += flights * DATE_KEY.size
+        self.by_booking_no = _SortedKeys(index, offset, bookings, BOOKING_KEY)
+
+    def _map(self, path: str, length: int):
+        """Map the first length bytes of a file read-only; bytes past them were never committed"""
+        if not length:
+            return b""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return mapped
+
+
+def index_path(directory: str, seq: int) -> str:
+    return os.path.join(directory, f"{INDEX_PREFIX}{seq:012d}{INDEX_SUFFIX}")
+
+
+class HistoryArchive:
+    """Departed flights and their bookings, read on demand from memory-mapped files
+
+    flights.dat and bookings.dat are append-only arrays of fixed-width
+    records: each archived flight with its final seat counts, and its
+    bookings next to one another. Record i sits at i times the record
+    size, so nothing is parsed until it is asked for, and a flight's
+    bookings are one contiguous run.
+
+    An index file holds the flight numbers, departure dates and booking
+    numbers as sorted arrays of (key, position). It is rewritten each
+    time flights are archived, under the number of the snapshot that
+    archives them, and a lookup is a binary search over the mapped array
+    followed by one record read.
+
+    The snapshot header records which index and how many records are
+    current (see state()), so a crash while archiving leaves the
+    previous archive in force and the half-written records are
+    overwritten next time. Opening the archive only maps the files, so
+    it costs the same however much history there is.
+
+    Flights and booking rows looked up by number are kept in LRU caches
+    of cache_size entries each, so repeated lookups of recent history
+    skip both the search and the read, and the bookings of a cached
+    flight share one Flight object. Archived records never change; the
+    caches are emptied only when more flights are archived, since a
+    number looked up and missed before may be archived now.
+    """
+
+    def __init__(self, directory: str, cache_size: int = HISTORY_CACHE_SIZE):
+        self.directory = directory
+        self.cache_size = cache_size
+        os.makedirs(directory, exist_ok=True)
+        self._view = _View(directory)
+        self._write_lock = threading.Lock()
+        self._flights = lru_cache(maxsize=cache_size)(self._find_flight)
+        self._bookings = lru_cache(maxsize=cache_size)(self._find_booking)
+
+    def __len__(self):
+        """Number of archived flights"""
+        return self._view.flights
+
+    def booking_count(self) -> int:
+        return self._view.bookings
+
+    def state(self) -> Dict[str, int]:
+        """What a snapshot records to reopen the archive as it is now"""
+        view = self._view
+        return {'seq': view.seq, 'flights': view.flights, 'bookings': view.bookings}
+
+    def open(self, state: Optional[Dict[str, int]]):
+        """Map the archive as recorded by state(); None (no snapshot yet) opens it empty"""
+        state = state or {}
+        self._view = _View(self.directory, state.get('seq', 0), state.get('flights', 0),
+                           state.get('bookings', 0))
+        self._clear_caches()
+
+    def _clear_caches(self):
+        # Misses are cached too, and may be archived since
+        self._flights.cache_clear()
+        self._bookings.cache_clear()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def _read_flight(self, position: int) -> Flight:
+        (flight_no, departure_from, arrival_to, departure_date, departure_time,
+         economy_seats, business_seats, economy_fare_cents, business_fare_cents,
+         duration_minutes, economy_booked, business_booked, _, _) = \
+            FLIGHT_RECORD.unpack_from(self._view.flight_data, position * FLIGHT_RECORD.size)
+        return Flight(_text(flight_no), _text(departure_from), _text(arrival_to), _text(departure_date),
+                      _text(departure_time), economy_seats, business_seats, economy_fare_cents,
+                      business_fare_cents, economy_booked, business_booked, duration_minutes=duration_minutes)
+
+    def _read_booking(self, position: int) -> tuple:
+        booking_no, flight_no, customer_id, business, fare_cents, booked_at, seat = \
+            BOOKING_RECORD.unpack_from(self._view.booking_data, position * BOOKING_RECORD.size)
+        return (booking_no, _text(flight_no), _text(customer_id), BUSINESS if business else ECONOMY,
+                fare_cents, booked_at, seat)
+
+    def _read_booking_run(self, flight_position: int) -> List[tuple]:
+        first, count = FLIGHT_RECORD.unpack_from(self._view.flight_data,
+                                                 flight_position * FLIGHT_RECORD.size)[-2:]
+        return [self._read_booking(i) for i in range(first, first + count)]
+
+    def _iter_booking_run(self, flight_position: int, after: int) -> Iterator[tuple]:
+        """A flight's bookings numbered above after, found by bisecting its run"""
+        view = self._view
+        first, count = FLIGHT_RECORD.unpack_from(view.flight_data, flight_position * FLIGHT_RECORD.size)[-2:]
+        lo, hi = first, first + count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if BOOKING_RECORD.unpack_from(view.booking_data, mid * BOOKING_RECORD.size)[0] <= after:
+                lo = mid + 1
+            else:
+                hi = mid
+        for position in range(lo, first + count):
+            yield self._read_booking(position)
+
+    def _flight_position(self, flight_no: str) -> Optional[int]:
+        key = flight_no.encode()
+        if len(key) > 16:
+            return None
+        key = key.ljust(16, b"\0")
+        keys = self._view.by_flight_no
+        i = bisect_left(keys, (key,))
+        if i < len(keys) and keys[i][0] == key:
+            return keys[i][1]
+        return None
+
+    def _find_flight(self, flight_no: str) -> Optional[Flight]:
+        position = self._flight_position(flight_no)
+        return self._read_flight(position) if position is not None else None
+
+    def _find_booking(self, booking_no: int) -> Optional[tuple]:
+        keys = self._view.by_booking_no
+        i = bisect_left(keys, (booking_no,))
+        if i < len(keys) and keys[i][0] == booking_no:
+            return self._read_booking(keys[i][1])
+        return None
+
+    def get_flight(self, flight_no: str) -> Optional[Flight]:
+        """Return the archived flight with this number, or None"""
+        return self._flights(flight_no)
+
+    def booking_row(self, booking_no: int) -> Optional[tuple]:
+        """Return an archived booking in the Booking.to_row() layout, or None"""
+        return self._bookings(booking_no)
+
+    def booking_rows(self, flight_no: str) -> List[tuple]:
+        """Bookings of an archived flight, in booking number order"""
+        position = self._flight_position(flight_no)
+        return self._read_booking_run(position) if position is not None else []
+
+    def flights_between(self, date_from: str = "", date_to: str = "") -> List[Flight]:
+        """Archived flights departing in a date range (either end open), ordered by departure"""
+        keys = self._view.by_date
+        i = bisect_left(keys, (date_from.encode(),)) if date_from else 0
+        end = date_to.encode()
+        flights = []
+        while i < len(keys) and (not date_to or keys[i][0] <= end):
+            flights.append(self._read_flight(keys[i][1]))
+            i += 1
+        return sorted(flights, key=lambda flight: (flight.departs_at, flight.flight_no))
+
+    def booking_rows_on(self, departure_date: str) -> List[tuple]:
+        """Bookings on archived flights departing on a date"""
+        key = departure_date.encode()
+        if len(key) != 10:
+            return []
+        keys = self._view.by_date
+        i = bisect_left(keys, (key,))
+        rows = []
+        while i < len(keys) and keys[i][0] == key:
+            rows.extend(self._read_booking_run(keys[i][1]))
+            i += 1
+        return rows
+
+    def iter_booking_rows(self, departure_date: str = "", flight_no: str = "", after: int = 0) -> Iterator[tuple]:
+        """Bookings on archived flights matching the filters and numbered above after
+
+        Rows are read lazily in booking number order, merging the runs of
+        the flights on a date, so a page reads little more than itself.
+        """
+        if flight_no:
+            position = self._flight_position(flight_no)
+            if position is None:
+                return iter(())
+            positions = [position]
+        else:
+            key = departure_date.encode()
+            if len(key) != 10:
+                return iter(())
+            keys = self._view.by_date
+            i = bisect_left(keys, (key,))
+            positions = []
+            while i < len(keys) and keys[i][0] == key:
+                positions.append(keys[i][1])
+                i += 1
+        runs = [self._iter_booking_run(position, after) for position in positions]
+        return runs[0] if len(runs) == 1 else heapq.merge(*runs)
+
+    # ------------------------------------------------------------------
+    # Archiving
+    # ------------------------------------------------------------------
+
+    def append(self, seq: int, departed: List[Tuple[Flight, list]], fsync: bool = True):
+        """Archive flights with their bookings under snapshot number seq
+
+        departed lists (flight, bookings) pairs; the flights must not be
+        archived already. The records are appended after the committed
+        ones and a new index is written next to the old, which stays
+        until prune(); the archive reads the new state from then on.
+        """
+        with self._write_lock:
+            view = self._view
+            flight_keys = list(FLIGHT_KEY.iter_unpack(view.by_flight_no.bytes()))
+            date_keys = list(DATE_KEY.iter_unpack(view.by_date.bytes()))
+            booking_keys = list(BOOKING_KEY.iter_unpack(view.by_booking_no.bytes()))
+
+            flight_records, booking_records = [], []
+            position, booking_position = view.flights, view.bookings
+            for flight, bookings in departed:
+                bookings = sorted(bookings, key=lambda booking: booking.booking_no)
+                flight_no = _field(flight.flight_no, 16)
+                flight_records.append(FLIGHT_RECORD.pack(
+                    flight_no, _field(flight.departure_from, 24), _field(flight.arrival_to, 24),
+                    _field(flight.departure_date, 10), _field(flight.departure_time, 5),
+                    flight.economy_seats, flight.business_seats, flight.economy_fare_cents,
+                    flight.business_fare_cents, flight.duration_minutes, flight.economy_booked,
+                    flight.business_booked, booking_position, len(bookings)))
+                flight_keys.append((flight_no.ljust(16, b"\0"), position))
+                date_keys.append((flight.departure_date.encode(), position))
+                for booking in bookings:
+                    booking_records.append(BOOKING_RECORD.pack(
+                        booking.booking_no, flight_no, _field(booking.customer.customer_id, 16),
+                        booking.travel_class == BUSINESS, booking.fare_cents, booking.booked_at,
+                        booking.seat))
+                    booking_keys.append((booking.booking_no, booking_position))
+                    booking_position += 1
+                position += 1
+
+            # Earlier runs are already sorted, so each sort is a merge of two runs
+            flight_keys.sort()
+            date_keys.sort()
+            booking_keys.sort()
+
+            self._write_at(FLIGHTS_FILE, view.flights * FLIGHT_RECORD.size, flight_records, fsync)
+            self._write_at(BOOKINGS_FILE, view.bookings * BOOKING_RECORD.size, booking_records, fsync)
+            with open(index_path(self.directory, seq), "wb") as index:
+                index.write(INDEX_HEADER.pack(INDEX_MAGIC, position, booking_position))
+                index.write(b"".join(FLIGHT_KEY.pack(*key) for key in flight_keys))
+                index.write(b"".join(DATE_KEY.pack(*key) for key in date_keys))
+                index.write(b"".join(BOOKING_KEY.pack(*key) for key in booking_keys))
+                index.flush()
+                if fsync:
+                    os.fsync(index.fileno())
+            # Readers holding the old view keep reading it until they finish
+            self._view = _View(self.directory, seq, position, booking_position)
+            self._clear_caches()
+
+    def _write_at(self, name: str, offset: int, records: List[bytes], fsync: bool):
+        """Write records at offset, cutting off anything a crash left past it"""
+        path = os.path.join(self.directory, name)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(b"".join(records))
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+    def prune(self):
+        """Delete index files other than the current one"""
+        current = index_path(self.directory, self._view.seq)
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(INDEX_PREFIX) and name.endswith(INDEX_SUFFIX) and path != current:
+                os.remove(path)
@@ -0,0 +1,170 @@
+import heapq
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+
+from concurrency import FlightLocks, SequenceGenerator, SharedExclusiveLock
+
+# How long a seat stays held while the agent confirms, in seconds
+DEFAULT_HOLD_SECONDS = 300
+
+
+class Hold:
+    """A seat taken out of availability until it is confirmed, released or expires"""
+
+    __slots__ = ('hold_id', 'flight', 'customer', 'travel_class', 'fare_cents', 'expires_at', 'seat')
+
+    def __init__(self, hold_id, flight, customer, travel_class, fare_cents, expires_at, seat):
+        self.hold_id = hold_id
+        self.flight = flight
+        self.customer = customer
+        self.travel_class = travel_class
+        self.fare_cents = fare_cents
+        # Deadline on the manager's monotonic clock
+        self.expires_at = expires_at
+        # Bit number in the class's seat map, booked as is on confirmation
+        self.seat = seat
+
+    @property
+    def seat_label(self):
+        return self.flight.seat_label(self.travel_class, self.seat)
+
+    def __repr__(self):
+        return f"Hold({self.hold_id!r}, {self.flight.flight_no!r}, {self.travel_class!r})"
+
+
+class HoldManager:
+    """Seat holds with TTL expiry driven by a min-heap of deadlines
+
+    A hold moves one seat of a class, the one asked for or else the first
+    free one, from available to held on its flight. Expired holds are
+    found by popping the heap while its earliest deadline has passed, so
+    cleanup costs O(log n) per expired hold and nothing when none are
+    due; live holds are never scanned. Released or confirmed holds leave
+    stale heap entries that are skipped when they surface.
+
+    The service calls expire_due() before every availability check, so an
+    expired seat is back on sale before anyone can observe it.
+
+    Seat maps are only changed while holding the flight's lock, the same
+    lock book() uses, so holds and bookings can never oversell.
+
+    on_release, if given, is called with (flight, travel_class) once a
+    released or expired seat is back on sale, still under the flight's
+    lock, so the service can offer it to the waitlist before any booking
+    sees it. state_lock, if given, is held shared around the release too,
+    taken before the flight's lock as the service takes it, so the
+    callback may log.
+
+    fare, if given, is called with (flight, travel_class) to price a seat
+    as it is held; by default the flight's base fare is used. The hold
+    keeps that fare until it is confirmed.
+
+    Hold IDs come from ids, 1, 2, 3... by default; a shard passes a
+    strided generator so its IDs name the shard, like its booking numbers.
+    """
+
+    def __init__(self, flight_locks: FlightLocks, on_change: Callable, ttl: float = DEFAULT_HOLD_SECONDS,
+                 clock: Callable[[], float] = time.monotonic, on_release: Optional[Callable] = None,
+                 fare: Optional[Callable] = None, state_lock: Optional[SharedExclusiveLock] = None,
+                 ids: Optional[SequenceGenerator] = None):
+        self.flight_locks = flight_locks
+        self.state_lock = state_lock
+        self.on_change = on_change
+        self.on_release = on_release
+        self.fare = fare
+        self.ttl = ttl
+        self.clock = clock
+        self._holds: Dict[int, Hold] = {}
+        self._deadlines: List[Tuple[float, int]] = []
+        self._ids = ids if ids is not None else SequenceGenerator()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._holds)
+
+    def get(self, hold_id: int) -> Optional[Hold]:
+        """Return a live hold, or None if it expired or was released"""
+        hold = self._holds.get(hold_id)
+        if hold is not None and hold.expires_at <= self.clock():
+            return None
+        return hold
+
+    def place(self, flight, customer, travel_class, ttl: Optional[float] = None,
+              seat: Optional[int] = None) -> Optional[Hold]:
+        """Hold one seat, returning None when the class has no seat available or seat is taken"""
+        with self.flight_locks.hold(flight.flight_no):
+            cabin = flight.cabin(travel_class)
+            if seat is None:
+                seat = cabin.first_free()
+                if seat is None:
+                    return None
+            elif not cabin.is_free(seat):
+                return None
+            # Priced before the seat is taken, like a booking would be
+            fare_cents = (self.fare(flight, travel_class) if self.fare is not None
+                          else flight.fare_cents(travel_class))
+            flight.hold_seat(travel_class, seat)
+            self.on_change(flight)
+            with self._lock:
+                hold = Hold(self._ids.next(), flight, customer, travel_class,
+                            fare_cents, self.clock() + (ttl or self.ttl), seat)
+                self._holds[hold.hold_id] = hold
+                heapq.heappush(self._deadlines, (hold.expires_at, hold.hold_id))
+        return hold
+
+    def take(self, hold_id: int) -> Optional[Hold]:
+        """Remove a live hold and return its seat to the flight
+
+        The caller must hold the flight's lock and book the seat straight
+        away, so it cannot be taken by anyone else in between.
+        """
+        with self._lock:
+            hold = self._holds.get(hold_id)
+            if hold is None or hold.expires_at <= self.clock():
+                return None
+            del self._holds[hold_id]
+        hold.flight.release_seat(hold.travel_class, hold.seat)
+        self.on_change(hold.flight)
+        return hold
+
+    def release(self, hold_id: int) -> bool:
+        """Give a held seat back before its TTL runs out"""
+        hold = self._holds.get(hold_id)
+        if hold is None:
+            return False
+        shared = self.state_lock.shared() if self.state_lock is not None else nullcontext()
+        with shared, self.flight_locks.hold(hold.flight.flight_no):
+            with self._lock:
+                if self._holds.pop(hold_id, None) is None:
+                    return False
+            hold.flight.release_seat(hold.travel_class, hold.seat)
+            self.on_change(hold.flight)
+            if self.on_release is not None:
+                self.on_release(hold.flight, hold.travel_class)
+        return True
+
+    def drop_flights(self, flights) -> int:
+        """Forget every hold on flights the service no longer keeps, e.g. once archived
+
+        The flights have departed, so their seats are not offered back to
+        anyone. Returns how many holds were dropped.
+        """
+        flight_nos = {flight.flight_no for flight in flights}
+        with self._lock:
+            dropped = [hold_id for hold_id, hold in self._holds.items() if hold.flight.flight_no in flight_nos]
+            for hold_id in dropped:
+                del self._holds[hold_id]
+        return len(dropped)
+
+    def expire_due(self) -> int:
+        """Release every hold whose deadline has passed and return how many"""
+        now = self.clock()
+        due = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, hold_id = heapq.heappop(self._deadlines)
+                if hold_id in self._holds:
+                    due.append(hold_id)
+        return sum(self.release(hold_id) for hold_id in due)
@@ -0,0 +1,266 @@
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional
+
+from flight_search import FlightSearchIndex
+from records import Booking, Customer, Flight
+from reporting import BookingPage
+
+
+class BookingGroup:
+    """Bookings keyed by booking number, listed and paged in number order
+
+    Lookups and cancellations are O(1) dict operations. The numbers are
+    also kept in a sorted list, so a page starts with a bisect at its
+    cursor, the last booking number already returned, and a booking
+    cancelled between pages cannot shift the next page. Bookings almost
+    always arrive in number order, so an insert is usually an append.
+    A cancelled number stays in the list, skipped when read, until the
+    cancelled outnumber the live and the list is compacted.
+
+    The dict is kept in number order too, so a full listing is a copy of
+    its values. The odd booking that commits after a higher number marks
+    it out of order, and the next listing rebuilds it once.
+
+    Not thread-safe; the backend reads and writes groups under its lock.
+    """
+
+    __slots__ = ('_bookings', '_numbers', '_in_order')
+
+    def __init__(self):
+        self._bookings: Dict[int, Booking] = {}
+        self._numbers: List[int] = []
+        self._in_order = True
+
+    def __len__(self):
+        return len(self._bookings)
+
+    def get(self, booking_no: int) -> Optional[Booking]:
+        return self._bookings.get(booking_no)
+
+    def add(self, booking: Booking):
+        booking_no = booking.booking_no
+        numbers = self._numbers
+        if not numbers or booking_no > numbers[-1]:
+            numbers.append(booking_no)
+        elif booking_no not in self._bookings:
+            i = bisect_left(numbers, booking_no)
+            if i == len(numbers) or numbers[i] != booking_no:
+                numbers.insert(i, booking_no)
+            self._in_order = False
+        self._bookings[booking_no] = booking
+
+    def pop(self, booking_no: int) -> Booking:
+        booking = self._bookings.pop(booking_no)
+        if len(self._numbers) > 2 * len(self._bookings) + 64:
+            self._numbers = [number for number in self._numbers if number in self._bookings]
+        return booking
+
+    def values(self) -> List[Booking]:
+        """Every booking, in number order"""
+        if not self._in_order:
+            self._bookings = {booking.booking_no: booking
+                              for booking in filter(None, map(self._bookings.get, self._numbers))}
+            self._in_order = True
+        return list(self._bookings.values())
+
+    def page(self, cursor: Optional[int], limit: int) -> BookingPage:
+        """Up to limit bookings numbered above cursor, as SQLiteBackend pages them"""
+        numbers, get = self._numbers, self._bookings.get
+        start = bisect_right(numbers, cursor) if cursor else 0
+        # One extra booking tells us whether another page follows
+        bookings: List[Booking] = []
+        while len(bookings) <= limit and start < len(numbers):
+            chunk = numbers[start:start + limit + 1 - len(bookings)]
+            start += len(chunk)
+            bookings.extend(filter(None, map(get, chunk)))
+        if len(bookings) > limit:
+            return BookingPage(bookings[:limit], bookings[limit - 1].booking_no)
+        return BookingPage(bookings, None)
+
+    def last(self) -> int:
+        """Highest booking number, or 0"""
+        for booking_no in reversed(self._numbers):
+            if booking_no in self._bookings:
+                return booking_no
+        return 0
+
+
+class InMemoryBackend:
+    """Storage backend holding every record in Python lists and dict indexes"""
+
+    def __init__(self):
+        self.flights: List[Flight] = []
+        self.customers: List[Customer] = []
+        self.bookings = BookingGroup()
+
+        # Hash indexes kept in step with the lists above on every insert
+        self.flights_by_no: Dict[str, Flight] = {}
+        self.customers_by_id: Dict[str, Customer] = {}
+        self.customers_by_passport: Dict[str, Customer] = {}
+        self.search_index = FlightSearchIndex()
+
+        # Bookings grouped as they are confirmed, so listings never regroup.
+        # Every group is a BookingGroup in booking number order, so a
+        # cancellation removes a booking in O(1) and pages resume by number
+        self.bookings_on_date: Dict[str, BookingGroup] = {}
+        self.bookings_on_flight: Dict[str, BookingGroup] = {}
+        # Guards the booking groups; bookings on different flights commit
+        # concurrently
+        self._bookings_lock = threading.Lock()
+
+    # Flights
+
+    def add_flight(self, flight: Flight):
+        self.flights.append(flight)
+        self.flights_by_no[flight.flight_no] = flight
+        self.search_index.add(flight)
+
+    def add_flights(self, flights: List[Flight]):
+        self.flights.extend(flights)
+        for flight in flights:
+            self.flights_by_no[flight.flight_no] = flight
+        self.search_index.add_many(flights)
+
+    def get_flight(self, flight_no: str) -> Optional[Flight]:
+        return self.flights_by_no.get(flight_no)
+
+    def iter_flights(self) -> Iterator[Flight]:
+        return iter(self.flights)
+
+    def flight_count(self) -> int:
+        return len(self.flights)
+
+    def search(self, **criteria) -> List[Flight]:
+        return self.search_index.query(**criteria)
+
+    def remove_flights(self, flights: List[Flight]) -> List[Booking]:
+        """Drop flights and their bookings, returning the bookings removed"""
+        flight_nos = {flight.flight_no for flight in flights}
+        self.flights = [flight for flight in self.flights if flight.flight_no not in flight_nos]
+        removed = []
+        with self._bookings_lock:
+            for flight in flights:
+                del self.flights_by_no[flight.flight_no]
+                bookings = self.bookings_on_flight.pop(flight.flight_no, BookingGroup()).values()
+                on_date = self.bookings_on_date.get(flight.departure_date)
+                for booking in bookings:
+                    self.bookings.pop(booking.booking_no)
+                    on_date.pop(booking.booking_no)
+                removed.extend(bookings)
+            for departure_date in {flight.departure_date for flight in flights}:
+                if not self.bookings_on_date.get(departure_date, True):
+                    del self.bookings_on_date[departure_date]
+        self.search_index.remove_many(flights)
+        return removed
+
+    def update_availability(self, flight: Flight):
+        """Refresh search availability after a flight's seat counts change"""
+        self.search_index.update_availability(flight)
+
+    # Customers
+
+    def add_customer(self, customer: Customer):
+        self.customers.append(customer)
+        self.customers_by_id[customer.customer_id] = customer
+        self.customers_by_passport[customer.passport_no] = customer
+
+    def add_customers(self, customers: List[Customer]):
+        self.customers.extend(customers)
+        for customer in customers:
+            self.customers_by_id[customer.customer_id] = customer
+            self.customers_by_passport[customer.passport_no] = customer
+
+    def get_customer(self, customer_id: str) -> Optional[Customer]:
+        return self.customers_by_id.get(customer_id)
+
+    def find_customer(self, passport_no: str) -> Optional[Customer]:
+        return self.customers_by_passport.get(passport_no)
+
+    def iter_customers(self) -> Iterator[Customer]:
+        return iter(self.customers)
+
+    def customer_count(self) -> int:
+        return len(self.customers)
+
+    # Bookings
+
+    def add_booking(self, booking: Booking):
+        """Store a confirmed booking and mark its seat booked on the flight"""
+        booking.seat = booking.flight.book_seat(booking.travel_class, booking.seat)
+        self.search_index.update_availability(booking.flight)
+        with self._bookings_lock:
+            self.bookings.add(booking)
+            self.bookings_on_date.setdefault(booking.flight.departure_date, BookingGroup()).add(booking)
+            self.bookings_on_flight.setdefault(booking.flight.flight_no, BookingGroup()).add(booking)
+
+    def add_bookings(self, bookings: List[Booking]):
+        for booking in bookings:
+            self.add_booking(booking)
+
+    def get_booking(self, booking_no: int) -> Optional[Booking]:
+        return self.bookings.get(booking_no)
+
+    def remove_booking(self, booking: Booking):
+        """Drop a cancelled booking and give its seat back to the flight"""
+        with self._bookings_lock:
+            self.bookings.pop(booking.booking_no)
+            self.bookings_on_date[booking.flight.departure_date].pop(booking.booking_no)
+            self.bookings_on_flight[booking.flight.flight_no].pop(booking.booking_no)
+        booking.flight.free_seat(booking.travel_class, booking.seat)
+        self.search_index.update_availability(booking.flight)
+
+    def iter_bookings(self) -> Iterator[Booking]:
+        with self._bookings_lock:
+            return iter(self.bookings.values())
+
+    def booking_count(self) -> int:
+        return len(self.bookings)
+
+    def max_booking_no(self) -> int:
+        with self._bookings_lock:
+            return self.bookings.last()
+
+    def _bookings_for(self, departure_date: str, flight_no: str) -> BookingGroup:
+        """Return the live group matching the filters, without copying it"""
+        if flight_no:
+            flight = self.flights_by_no.get(flight_no)
+            if flight is None or (departure_date and flight.departure_date != departure_date):
+                return BookingGroup()
+            return self.bookings_on_flight.get(flight_no, BookingGroup())
+        if departure_date:
+            return self.bookings_on_date.get(departure_date, BookingGroup())
+        return self.bookings
+
+    def list_bookings(self, departure_date: str = "", flight_no: str = "") -> List[Booking]:
+        with self._bookings_lock:
+            return self._bookings_for(departure_date, flight_no).values()
+
+    def page_bookings(self, departure_date: str = "", flight_no: str = "",
+                      cursor: Optional[int] = None, limit: int = 50) -> BookingPage:
+        """Return one page of bookings; the cursor is the last booking number already returned"""
+        with self._bookings_lock:
+            return self._bookings_for(departure_date, flight_no).page(cursor, limit)
+
+    def bookings_by_date(self) -> Dict[str, List[Booking]]:
+        with self._bookings_lock:
+            return {date: self.bookings_on_date[date].values()
+                    for date in sorted(self.bookings_on_date) if self.bookings_on_date[date]}
+
+    # Waitlist entries are kept by the service and saved through its store
+
+    def add_waitlist_entry(self, entry):
+        pass
+
+    def remove_waitlist_entry(self, entry_id: int):
+        pass
+
+    def promote_waitlist_entry(self, entry_id: int, booking: Booking):
+        """Book the seat of a promoted waitlist entry"""
+        self.add_booking(booking)
+
+    def iter_waitlist_rows(self) -> Iterator[list]:
+        return iter(())
+
+    def close(self):
+        pass
@@ -0,0 +1,276 @@
+"""Hot-path instrumentation: operation counters, latency histograms and lock waits
+
+    metrics = instrument(service)          # turn on at runtime
+    metrics.snapshot()                     # in-process view
+    metrics.write_prometheus("reservation.prom")
+    server = metrics.serve(9108)           # http://127.0.0.1:9108/metrics
+    uninstrument(service)                  # back to zero overhead
+
+server.py turns these on with --metrics-file, --metrics-port and --profile,
+and its "profile" operation starts and stops the SamplingProfiler live.
+
+Nothing is measured until instrument() is called: it wraps the service's
+operations on that one instance, and uninstrument() removes the wrappers
+again, so an uninstrumented service runs exactly the original code. The
+only permanent hook is a None check when a flight lock is taken.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds, 10us to 10s
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Service methods timed as operations
+OPERATIONS = ("create_flight", "register", "search", "quote", "hold_seat", "confirm_hold", "book",
+              "book_many", "cancel", "join_waitlist", "leave_waitlist", "plan_trip", "set_fare_rules",
+              "reprice_all", "list_bookings", "page_bookings", "bookings_by_date")
+
+# Lookup methods counted as index hits or misses, by index name
+LOOKUPS = {"get_flight": "flight_no", "get_customer": "customer_id", "find_customer": "passport_no"}
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, cumulative only when exported"""
+
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given quantile"""
+        if not self.count:
+            return 0.0
+        rank, seen = fraction * self.count, 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Thread-safe counters and histograms keyed by metric name and labels"""
+
+    def __init__(self):
+        self.counters: Counter = Counter()
+        self.histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, amount: int = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += amount
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self) -> Dict:
+        """Return counters and histogram summaries as plain dicts"""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = [{'name': name, 'labels': dict(labels), 'count': histogram.count,
+                           'sum': histogram.total, 'p50': histogram.quantile(0.5),
+                           'p99': histogram.quantile(0.99)}
+                          for (name, labels), histogram in sorted(self.histograms.items())]
+        return {'counters': counters, 'histograms': histograms}
+
+    def prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.total}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write the Prometheus text to a file atomically, e.g. for node_exporter's textfile collector"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as out:
+            out.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+    def write_every(self, path: str, interval: float = 15.0) -> threading.Event:
+        """Rewrite the Prometheus file every interval seconds from a daemon thread; set the returned event to stop"""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.write_prometheus(path)
+
+        threading.Thread(target=run, name="metrics-file", daemon=True).start()
+        return stop
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve /metrics on a local port from a daemon thread; call shutdown() to stop"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _timed_operation(metrics, op, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            return method(*args, **kwargs)
+        except Exception as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            metrics.observe("reservation_operation_seconds", time.perf_counter() - start, op=op)
+            metrics.count("reservation_operations_total", op=op, outcome=outcome)
+    return wrapper
+
+
+def _counted_lookup(metrics, index, method):
+    @functools.wraps(method)
+    def wrapper(key):
+        result = method(key)
+        metrics.count("reservation_index_lookups_total", index=index,
+                      result="miss" if result is None else "hit")
+        return result
+    return wrapper
+
+
+def instrument(service, metrics: Optional[Metrics] = None) -> Metrics:
+    """Start measuring a service's operations, lookups and flight lock waits"""
+    metrics = metrics or Metrics()
+    uninstrument(service)
+    for op in OPERATIONS:
+        setattr(service, op, _timed_operation(metrics, op, getattr(service, op)))
+    for lookup, index in LOOKUPS.items():
+        setattr(service, lookup, _counted_lookup(metrics, index, getattr(service, lookup)))
+    service.flight_locks.wait_observer = functools.partial(metrics.observe,
+                                                           "reservation_lock_wait_seconds", lock="flight")
+    service.metrics = metrics
+    return metrics
+
+
+def uninstrument(service):
+    """Remove the wrappers so the service runs its original methods again"""
+    for name in OPERATIONS + tuple(LOOKUPS):
+        service.__dict__.pop(name, None)
+    service.flight_locks.wait_observer = None
+    service.__dict__.pop("metrics", None)
+
+
+class SamplingProfiler:
+    """Statistical profiler sampling every thread's stack from a background thread
+
+    Start and stop it at runtime; while stopped it costs nothing. Samples
+    are aggregated as collapsed stacks ("outer;inner;leaf count"), the
+    input format of flamegraph tools.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """Functions seen at the top of the stack most often"""
+        leaves = Counter()
+        # A copy, as the sampling thread may be adding stacks
+        for stack, count in list(self.stacks.items()):
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+    def write_collapsed(self, path: str):
+        with open(path, "w") as out:
+            for stack, count in Counter(dict(self.stacks)).most_common():
+                out.write(f"{stack} {count}\n")
@@ -0,0 +1,238 @@
+import datetime
+import json
+import time
+from collections import namedtuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from records import ECONOMY, Flight
+from seat_map import popcount
+
+# Fare buckets from cheapest to dearest, as (code, load factor up to which
+# the bucket stays open, multiplier of the flight's base fare). The last
+# bucket stays open until the class is full.
+DEFAULT_BUCKETS = (("Q", 0.40, 0.80), ("M", 0.65, 1.00), ("B", 0.85, 1.25), ("Y", 1.00, 1.60))
+
+# Booking curve as (days to departure at least, multiplier), furthest out first
+DEFAULT_ADVANCE = ((21, 0.90), (7, 1.00), (3, 1.15), (0, 1.30))
+
+# Quoted fares are rounded to this many cents
+DEFAULT_ROUND_CENTS = 100
+
+# Most (flight, class) quotes kept between changes to the flight's load or date
+QUOTE_CACHE_SIZE = 4096
+
+# A fare for one seat in a class: the price, the fare bucket it was sold
+# in, the load factor and the days to departure it was priced at
+FareQuote = namedtuple("FareQuote", ["fare_cents", "bucket", "load_factor", "days_out"])
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Today's day number and the time.time() at which the day ends
+_today = (0, 0.0)
+
+
+def today() -> int:
+    """Return today's local date as days since 1970-01-01, the day number of departs_at // 1440
+
+    The answer is kept until local midnight, so a quote pays for one
+    time.time() call rather than building a date.
+    """
+    global _today
+    now = time.time()
+    if now >= _today[1]:
+        date = datetime.date.fromtimestamp(now)
+        midnight = datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time())
+        _today = (date.toordinal() - _EPOCH_ORDINAL, midnight.timestamp())
+    return _today[0]
+
+
+class FareRules:
+    """Configurable revenue-management rules, compiled into lookup tables
+
+    The fare for a seat is the flight's base fare (economy_fare or
+    business_fare) times the multiplier of the open bucket, times the
+    multiplier for the days left to departure, rounded to round_cents.
+    A class's load factor is its booked and held seats over its size;
+    the open bucket is the first one whose load factor limit is above it.
+
+    Every combination of bucket and booking-curve band is multiplied out
+    into integer basis points up front, the band for each day out is
+    listed up to the furthest band, and the bucket for every possible
+    seat count of a cabin size is built the first time that size is
+    priced. A quote is then three indexings and one integer multiply.
+
+    Rules are immutable once built; to change pricing, build new rules
+    and hand them to PricingEngine.set_rules().
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, advance=DEFAULT_ADVANCE,
+                 round_cents: int = DEFAULT_ROUND_CENTS):
+        buckets = tuple((str(code), float(limit), float(multiplier)) for code, limit, multiplier in buckets)
+        advance = tuple(sorted(((int(days), float(multiplier)) for days, multiplier in advance), reverse=True))
+        if not buckets:
+            raise ValueError("At least one fare bucket is required")
+        limits = [limit for _, limit, _ in buckets]
+        if limits != sorted(limits) or len(set(limits)) != len(limits) or not 0 < limits[0] or limits[-1] != 1:
+            raise ValueError("Bucket load factors must rise strictly and end at 1.0")
+        if not advance or advance[-1][0] != 0:
+            raise ValueError("The booking curve must include a band starting at 0 days")
+        if any(multiplier < 0 for _, _, multiplier in buckets) or any(m < 0 for _, m in advance):
+            raise ValueError("Fare multipliers cannot be negative")
+        if round_cents < 1:
+            raise ValueError("Fares must be rounded to at least 1 cent")
+
+        self.buckets = buckets
+        self.advance = advance
+        self.round_cents = round_cents
+        self.codes = tuple(code for code, _, _ in buckets)
+        # basis_points[bucket][band]: combined multiplier in 1/10000ths
+        self.basis_points = tuple(tuple(round(bucket_multiplier * band_multiplier * 10000)
+                                        for _, band_multiplier in advance)
+                                  for _, _, bucket_multiplier in buckets)
+        # band_by_day[d]: booking curve band for d days out, up to the furthest band
+        self.band_by_day = bytes(next(band for band, (days, _) in enumerate(advance) if day >= days)
+                                 for day in range(advance[0][0] + 1))
+        self._horizon = len(self.band_by_day)
+        self._last_band = len(advance) - 1
+        self._bucket_tables: Dict[int, bytes] = {}
+
+    def __repr__(self):
+        return f"FareRules(buckets={self.buckets!r}, advance={self.advance!r}, round_cents={self.round_cents})"
+
+    def bucket_table(self, seats: int) -> bytes:
+        """Open bucket for every count of taken seats, 0..seats, in a cabin of this size"""
+        table = self._bucket_tables.get(seats)
+        if table is None:
+            limits = [limit for _, limit, _ in self.buckets]
+            last = len(limits) - 1
+            table = bytes(next((i for i, limit in enumerate(limits) if taken < limit * seats), last)
+                          for taken in range(seats + 1))
+            self._bucket_tables[seats] = table
+        return table
+
+    def band(self, days_out: int) -> int:
+        """Booking curve band for a number of days to departure; past departures use the last band"""
+        if days_out < 0:
+            return self._last_band
+        return self.band_by_day[days_out] if days_out < self._horizon else 0
+
+    def price(self, base_cents: int, seats: int, taken: int, days_out: int) -> Tuple[int, int]:
+        """Return (fare_cents, bucket index) for one more seat after taken of seats"""
+        table = self._bucket_tables.get(seats)
+        if table is None:
+            table = self.bucket_table(seats)
+        bucket = table[taken] if taken <= seats else table[seats]
+        # band(), inlined
+        if days_out < 0:
+            band = self._last_band
+        else:
+            band = self.band_by_day[days_out] if days_out < self._horizon else 0
+        cents = base_cents * self.basis_points[bucket][band] // 10000
+        step = self.round_cents
+        if step > 1:
+            cents = (cents + step // 2) // step * step
+        return cents, bucket
+
+    def to_dict(self) -> dict:
+        return {'buckets': [list(bucket) for bucket in self.buckets],
+                'advance': [list(band) for band in self.advance],
+                'round_cents': self.round_cents}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FareRules":
+        """Build rules from to_dict() output; missing keys take the defaults"""
+        return cls(data.get('buckets', DEFAULT_BUCKETS), data.get('advance', DEFAULT_ADVANCE),
+                   data.get('round_cents', DEFAULT_ROUND_CENTS))
+
+
+def load_rules(path) -> FareRules:
+    """Read fare rules from a JSON file in the to_dict() layout"""
+    with open(path, encoding="utf-8") as f:
+        return FareRules.from_dict(json.load(f))
+
+
+class PricingEngine:
+    """Quotes fares for flights from the current FareRules
+
+    Quotes for each (flight, class) are cached with the seat count, day
+    and rules they were priced at, so repeated searches and the booking
+    that follows them reuse the quote until a seat is taken or given
+    back, the date rolls over or the rules change. The cache holds up to
+    cache_size quotes; when it fills up it is emptied and refills with
+    whatever is quoted next, so the hot flights are back in it after one
+    quote each. Every cache operation is a single dict call, so quoting
+    threads need no lock. cache_size=0 turns the cache off.
+
+    Swapping the rules with set_rules() takes effect for the next quote;
+    reprice() then prices a whole schedule in one pass.
+    """
+
+    def __init__(self, rules: Optional[FareRules] = None, clock: Callable[[], int] = today,
+                 cache_size: int = QUOTE_CACHE_SIZE):
+        self.rules = rules if rules is not None else FareRules()
+        self.clock = clock
+        self.cache_size = cache_size
+        # (flight_no, class) -> (taken, days_out, rules, quote)
+        self._cache: Dict[Tuple[str, str], tuple] = {}
+
+    def set_rules(self, rules: FareRules):
+        """Price every later quote with new rules; cached quotes carry their rules and go stale"""
+        self.rules = rules
+        self._cache.clear()
+
+    def quote(self, flight: Flight, travel_class: str, extra: int = 0) -> FareQuote:
+        """Quote one seat in a class
+
+        extra counts seats about to be taken in the same operation (the
+        earlier passengers of a group booking), which are priced as if
+        already sold; such quotes are not cached.
+        """
+        rules = self.rules
+        # The per-class accessors, inlined: this runs for every flight a search shows
+        if travel_class == ECONOMY:
+            seats, cabin = flight.economy_seats, flight.economy_cabin
+        else:
+            seats, cabin = flight.business_seats, flight.business_cabin
+        taken = popcount(cabin.booked | cabin.held) + extra
+        days_out = flight.departs_at // 1440 - self.clock()
+        key = (flight.flight_no, travel_class)
+        cache = not extra and self.cache_size > 0
+        if cache:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == taken and cached[1] == days_out and cached[2] is rules:
+                return cached[3]
+
+        fare_cents, bucket = rules.price(flight.fare_cents(travel_class), seats, taken, days_out)
+        quote = FareQuote(fare_cents, rules.codes[bucket], taken / seats if seats else 1.0, days_out)
+        if cache:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[key] = (taken, days_out, rules, quote)
+        return quote
+
+    def fare_cents(self, flight: Flight, travel_class: str) -> int:
+        """Current fare for one seat in a class, in cents"""
+        return self.quote(flight, travel_class).fare_cents
+
+    def reprice(self, flights: Iterable[Flight], classes=("economy", "business")) \
+            -> List[Tuple[Flight, Tuple[FareQuote, ...]]]:
+        """Quote every class of every flight with the current rules, bypassing the cache
+
+        Returns (flight, quotes in the order of classes) for each flight.
+        The rules, clock and lookup tables are read once for the whole
+        pass.
+        """
+        rules = self.rules
+        day = self.clock()
+        price, codes = rules.price, rules.codes
+        sheet = []
+        for flight in flights:
+            days_out = flight.departs_at // 1440 - day
+            quotes = []
+            for travel_class in classes:
+                seats = flight.seats(travel_class)
+                taken = flight.booked(travel_class) + flight.held(travel_class)
+                fare_cents, bucket = price(flight.fare_cents(travel_class), seats, taken, days_out)
+                quotes.append(FareQuote(fare_cents, codes[bucket], taken / seats if seats else 1.0, days_out))
+            sheet.append((flight, tuple(quotes)))
+        return sheet
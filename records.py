@@ -0,0 +1,330 @@
+import datetime
+import sys
+
+from seat_map import BUSINESS_LAYOUT, ECONOMY_LAYOUT, CabinSeats, cabin_for, popcount
+from validation import TRAVEL_CLASSES, block_minutes, departure_minutes
+
+# Interned travel class names shared by every flight and booking
+ECONOMY, BUSINESS = (sys.intern(cls) for cls in TRAVEL_CLASSES)
+
+
+def intern_class(travel_class):
+    """Return the shared string object for a travel class name"""
+    return ECONOMY if travel_class == ECONOMY else BUSINESS
+
+
+def to_cents(amount):
+    """Convert a fare in dollars to integer cents"""
+    return int(round(float(amount) * 100))
+
+
+def format_fare(cents):
+    """Format integer cents as a dollar amount, e.g. 50000 -> '500.00'"""
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+class Flight:
+    """A scheduled flight with its per-seat inventory
+
+    Each class is a cabin of numbered seats (see seat_map.py): business
+    rows first, economy rows behind them. Seats are either booked, held
+    (reserved while an agent confirms, see holds.py) or available, and
+    the counts are popcounts of the cabin's bitsets. The departure date
+    and time are parsed once, into departs_at, so sorting and range
+    checks compare integers. duration_minutes defaults to the route's
+    scheduled block time.
+    """
+
+    __slots__ = ('flight_no', 'departure_from', 'arrival_to', 'departure_date', 'departure_time',
+                 'departs_at', 'economy_seats', 'business_seats', 'economy_fare_cents', 'business_fare_cents',
+                 'economy_cabin', 'business_cabin', 'duration_minutes')
+
+    def __init__(self, flight_no, departure_from, arrival_to, departure_date, departure_time,
+                 economy_seats, business_seats, economy_fare_cents, business_fare_cents,
+                 economy_booked=0, business_booked=0, economy_held=0, business_held=0,
+                 duration_minutes=None):
+        self.flight_no = flight_no
+        # Airports, destinations, dates and times repeat across thousands of flights
+        self.departure_from = sys.intern(departure_from)
+        self.arrival_to = sys.intern(arrival_to)
+        self.departure_date = sys.intern(departure_date)
+        self.departure_time = sys.intern(departure_time)
+        # Minutes since 1970-01-01 00:00 in the airport's local time
+        self.departs_at = departure_minutes(departure_date, departure_time)
+        self.economy_seats = economy_seats
+        self.business_seats = business_seats
+        self.economy_fare_cents = economy_fare_cents
+        self.business_fare_cents = business_fare_cents
+        self.business_cabin = CabinSeats(cabin_for(business_seats, BUSINESS_LAYOUT))
+        self.economy_cabin = CabinSeats(cabin_for(economy_seats, ECONOMY_LAYOUT,
+                                                  self.business_cabin.cabin.last_row + 1))
+        # Counts alone, as from an archive or a benchmark, take the first free seats
+        if economy_booked:
+            self.economy_booked = economy_booked
+        if business_booked:
+            self.business_booked = business_booked
+        if economy_held:
+            self.economy_held = economy_held
+        if business_held:
+            self.business_held = business_held
+        self.duration_minutes = duration_minutes or block_minutes(departure_from, arrival_to)
+
+    def __repr__(self):
+        return f"Flight({self.flight_no!r}, {self.arrival_to!r}, {self.departure_date} {self.departure_time})"
+
+    @property
+    def arrives_at(self):
+        """Arrival as minutes since the epoch, on the same clock as departs_at"""
+        return self.departs_at + self.duration_minutes
+
+    @property
+    def economy_booked(self):
+        return popcount(self.economy_cabin.booked)
+
+    @economy_booked.setter
+    def economy_booked(self, count):
+        self.economy_cabin.set_count('booked', count)
+
+    @property
+    def business_booked(self):
+        return popcount(self.business_cabin.booked)
+
+    @business_booked.setter
+    def business_booked(self, count):
+        self.business_cabin.set_count('booked', count)
+
+    @property
+    def economy_held(self):
+        return popcount(self.economy_cabin.held)
+
+    @economy_held.setter
+    def economy_held(self, count):
+        self.economy_cabin.set_count('held', count)
+
+    @property
+    def business_held(self):
+        return popcount(self.business_cabin.held)
+
+    @business_held.setter
+    def business_held(self, count):
+        self.business_cabin.set_count('held', count)
+
+    def cabin(self, travel_class):
+        """Seat map of a class"""
+        return self.economy_cabin if travel_class == ECONOMY else self.business_cabin
+
+    def seats(self, travel_class):
+        """Total seats in a class"""
+        return self.economy_seats if travel_class == ECONOMY else self.business_seats
+
+    def booked(self, travel_class):
+        """Seats already booked in a class"""
+        return popcount(self.cabin(travel_class).booked)
+
+    def held(self, travel_class):
+        """Seats held for unconfirmed bookings in a class"""
+        return popcount(self.cabin(travel_class).held)
+
+    def available(self, travel_class):
+        """Seats neither booked nor held in a class"""
+        return self.cabin(travel_class).available()
+
+    def fare_cents(self, travel_class):
+        """Fare for one seat in a class, in cents"""
+        return self.economy_fare_cents if travel_class == ECONOMY else self.business_fare_cents
+
+    def seat_label(self, travel_class, seat):
+        """Label of a seat number in a class, such as '12C'"""
+        return self.cabin(travel_class).cabin.label(seat)
+
+    def book_seat(self, travel_class, seat=None):
+        """Mark a seat booked, the first free one if seat is None, and return its number
+
+        Raises ValueError when the seat is taken or the class is full.
+        """
+        cabin = self.cabin(travel_class)
+        if seat is None:
+            seat = cabin.first_free()
+            if seat is None:
+                raise ValueError(f"No {travel_class} seats left on flight {self.flight_no}")
+        cabin.book(seat)
+        return seat
+
+    def free_seat(self, travel_class, seat):
+        """Give a booked seat back"""
+        self.cabin(travel_class).unbook(seat)
+
+    def hold_seat(self, travel_class, seat=None):
+        """Mark a seat held, the first free one if seat is None, and return its number"""
+        cabin = self.cabin(travel_class)
+        if seat is None:
+            seat = cabin.first_free()
+            if seat is None:
+                raise ValueError(f"No {travel_class} seats left on flight {self.flight_no}")
+        cabin.hold(seat)
+        return seat
+
+    def release_seat(self, travel_class, seat):
+        """Give a held seat back"""
+        self.cabin(travel_class).unhold(seat)
+
+    def to_row(self):
+        """Return the flight's fixed fields as a list for the journal and snapshots"""
+        return [self.flight_no, self.departure_from, self.arrival_to, self.departure_date,
+                self.departure_time, self.economy_seats, self.business_seats,
+                self.economy_fare_cents, self.business_fare_cents, self.duration_minutes]
+
+    @classmethod
+    def from_row(cls, row):
+        """Rebuild a flight from to_row() output, with nothing booked yet
+
+        Rows logged before flights had a duration get the route's block time.
+        """
+        return cls(*row[:9], duration_minutes=row[9] if len(row) > 9 else None)
+
+    def as_dict(self):
+        """Return the flight in the original dict layout"""
+        return {
+            'flight_no': self.flight_no,
+            'departure_from': self.departure_from,
+            'arrival_to': self.arrival_to,
+            'departure_date': self.departure_date,
+            'departure_time': self.departure_time,
+            'economy_seats': self.economy_seats,
+            'business_seats': self.business_seats,
+            'economy_fare': format_fare(self.economy_fare_cents),
+            'business_fare': format_fare(self.business_fare_cents),
+            'economy_booked': self.economy_booked,
+            'business_booked': self.business_booked,
+            'duration_minutes': self.duration_minutes
+        }
+
+
+class Customer:
+    """A registered passenger"""
+
+    __slots__ = ('customer_id', 'name', 'passport_no', 'address', 'telephone')
+
+    def __init__(self, customer_id, name, passport_no, address, telephone):
+        self.customer_id = customer_id
+        self.name = name
+        self.passport_no = passport_no
+        self.address = address
+        self.telephone = telephone
+
+    def __repr__(self):
+        return f"Customer({self.customer_id!r}, {self.name!r})"
+
+    def to_row(self):
+        """Return the customer as a list for the journal and snapshots"""
+        return [self.customer_id, self.name, self.passport_no, self.address, self.telephone]
+
+    @classmethod
+    def from_row(cls, row):
+        """Rebuild a customer from to_row() output"""
+        return cls(*row)
+
+    def as_dict(self):
+        """Return the customer in the original dict layout"""
+        return {
+            'customer_id': self.customer_id,
+            'name': self.name,
+            'passport_no': self.passport_no,
+            'address': self.address,
+            'telephone': self.telephone
+        }
+
+
+class Booking:
+    """A confirmed seat, referencing its flight and customer instead of copying them
+
+    Only the booking number, class, fare, booking time and seat number
+    are stored per booking; everything else is read through the flight
+    and customer references, so a booking costs a fixed handful of
+    pointers. A booking made with seat None gets the first free seat of
+    its class when the backend stores it.
+    """
+
+    __slots__ = ('booking_no', 'flight', 'customer', 'travel_class', 'fare_cents', 'booked_at', 'seat')
+
+    def __init__(self, booking_no, flight, customer, travel_class, fare_cents, booked_at, seat=None):
+        self.booking_no = booking_no
+        self.flight = flight
+        self.customer = customer
+        self.travel_class = intern_class(travel_class)
+        self.fare_cents = fare_cents
+        # Minutes since the Unix epoch
+        self.booked_at = booked_at
+        # Bit number in the class's seat map (see seat_map.py)
+        self.seat = seat
+
+    def __repr__(self):
+        return f"Booking({self.booking_id!r}, {self.flight.flight_no!r}, {self.customer.customer_id!r})"
+
+    @property
+    def booking_id(self):
+        return f"B{self.booking_no:03d}"
+
+    @property
+    def flight_no(self):
+        return self.flight.flight_no
+
+    @property
+    def customer_id(self):
+        return self.customer.customer_id
+
+    @property
+    def passport_no(self):
+        return self.customer.passport_no
+
+    @property
+    def customer_name(self):
+        return self.customer.name
+
+    @property
+    def departure_date(self):
+        return self.flight.departure_date
+
+    @property
+    def departure_time(self):
+        return self.flight.departure_time
+
+    @property
+    def destination(self):
+        return self.flight.arrival_to
+
+    @property
+    def booking_date(self):
+        return datetime.datetime.fromtimestamp(self.booked_at * 60).strftime("%Y-%m-%d %H:%M")
+
+    @property
+    def seat_label(self):
+        return self.flight.seat_label(self.travel_class, self.seat) if self.seat is not None else ""
+
+    def to_row(self):
+        """Return the booking as a list, referencing its flight and customer by ID"""
+        return [self.booking_no, self.flight.flight_no, self.customer.customer_id,
+                self.travel_class, self.fare_cents, self.booked_at, self.seat]
+
+    def as_dict(self):
+        """Return the booking in the original dict layout"""
+        return {
+            'booking_id': self.booking_id,
+            'flight_no': self.flight_no,
+            'customer_id': self.customer_id,
+            'passport_no': self.passport_no,
+            'customer_name': self.customer_name,
+            'departure_date': self.departure_date,
+            'departure_time': self.departure_time,
+            'destination': self.destination,
+            'travel_class': self.travel_class,
+            'fare': format_fare(self.fare_cents),
+            'booking_date': self.booking_date,
+            'seat': self.seat_label
+        }
+
+
+def epoch_minutes(moment=None):
+    """Return a datetime (default now) as whole minutes since the Unix epoch"""
+    moment = moment or datetime.datetime.now()
+    return int(moment.timestamp()) // 60
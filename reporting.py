@@ -0,0 +1,82 @@
+import threading
+from collections import Counter, namedtuple
+from typing import Dict
+
+from records import Booking
+
+# One page of a booking listing; pass next_cursor back to get the next page,
+# it is None on the last page
+BookingPage = namedtuple("BookingPage", ["bookings", "next_cursor"])
+
+# Totals for one departure date or flight
+Totals = namedtuple("Totals", ["bookings", "revenue_cents"])
+
+
+class BookingAggregates:
+    """Booking counts and revenue kept up to date as bookings are confirmed and cancelled
+
+    Counts are kept per departure date, per flight and per class, and
+    revenue (the sum of booking fares, in cents) per flight and per date.
+    Each confirmed booking adds to its counters in O(1), and each
+    cancellation subtracts, so reports never regroup the booking history.
+    """
+
+    def __init__(self):
+        self.bookings_per_date: Counter = Counter()
+        self.bookings_per_flight: Counter = Counter()
+        self.bookings_per_class: Counter = Counter()
+        self.revenue_per_date: Counter = Counter()
+        self.revenue_per_flight: Counter = Counter()
+        self.total_bookings = 0
+        self._lock = threading.Lock()
+
+    def add(self, booking: Booking):
+        """Count a newly confirmed booking"""
+        flight = booking.flight
+        with self._lock:
+            self.bookings_per_date[flight.departure_date] += 1
+            self.bookings_per_flight[flight.flight_no] += 1
+            self.bookings_per_class[booking.travel_class] += 1
+            self.revenue_per_date[flight.departure_date] += booking.fare_cents
+            self.revenue_per_flight[flight.flight_no] += booking.fare_cents
+            self.total_bookings += 1
+
+    def remove(self, booking: Booking):
+        """Take a cancelled booking back out of the counts"""
+        flight = booking.flight
+        with self._lock:
+            self.bookings_per_date[flight.departure_date] -= 1
+            self.bookings_per_flight[flight.flight_no] -= 1
+            self.bookings_per_class[booking.travel_class] -= 1
+            self.revenue_per_date[flight.departure_date] -= booking.fare_cents
+            self.revenue_per_flight[flight.flight_no] -= booking.fare_cents
+            self.total_bookings -= 1
+
+    def rebuild(self, bookings):
+        """Recount from scratch, used once at startup when bookings were not replayed"""
+        with self._lock:
+            for counter in (self.bookings_per_date, self.bookings_per_flight, self.bookings_per_class,
+                            self.revenue_per_date, self.revenue_per_flight):
+                counter.clear()
+            self.total_bookings = 0
+        for booking in bookings:
+            self.add(booking)
+
+    def date_totals(self, departure_date: str) -> Totals:
+        return Totals(self.bookings_per_date[departure_date], self.revenue_per_date[departure_date])
+
+    def flight_totals(self, flight_no: str) -> Totals:
+        return Totals(self.bookings_per_flight[flight_no], self.revenue_per_flight[flight_no])
+
+    def by_date(self) -> Dict[str, Totals]:
+        """Totals for every departure date with bookings, in date order"""
+        with self._lock:
+            return {date: Totals(count, self.revenue_per_date[date])
+                    for date, count in sorted(self.bookings_per_date.items()) if count}
+
+    def by_flight(self) -> Dict[str, Totals]:
+        """Totals for every flight with bookings, by flight number"""
+        with self._lock:
+            return {flight_no: Totals(count, self.revenue_per_flight[flight_no])
+                    for flight_no, count in sorted(self.bookings_per_flight.items()) if count}
+
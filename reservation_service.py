@@ -0,0 +1,955 @@
+import datetime
+import heapq
+import hmac
+import threading
+from collections import Counter, namedtuple
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from concurrency import FlightLocks, SequenceGenerator, SharedExclusiveLock
+from holds import DEFAULT_HOLD_SECONDS, Hold, HoldManager
+from memory_backend import InMemoryBackend
+from pricing import FareQuote, FareRules, PricingEngine
+from records import Booking, Customer, Flight, epoch_minutes, intern_class, to_cents
+from reporting import BookingAggregates, BookingPage
+from route_planner import DEFAULT_MAX_LEGS, Itinerary, RoutePlanner
+from storage import (BOOKING_CANCELLED, BOOKING_CONFIRMED, CUSTOMER_REGISTERED, FLIGHT_ADDED,
+                     WAITLIST_JOINED, WAITLIST_LEFT, WAITLIST_PROMOTED)
+from validation import (AIRPORTS, ORIGIN, TRAVEL_CLASSES, departure_minutes, is_valid_customer_id,
+                        is_valid_flight_no, is_valid_telephone, validate_date, validate_time)
+from waitlist import DEFAULT_PRIORITY, Waitlist, WaitlistEntry
+
+
+class ReservationError(Exception):
+    """Base class for errors raised by the reservation service"""
+
+
+class ValidationError(ReservationError, ValueError):
+    """Raised when input data fails a validation rule"""
+
+
+class NotFoundError(ReservationError, LookupError):
+    """Raised when a flight, customer, booking or waitlist entry does not exist"""
+
+
+class SeatUnavailableError(ReservationError):
+    """Raised when the requested class has no seats left"""
+
+
+class BatchBookingError(ReservationError):
+    """Raised when an all-or-nothing batch booking cannot be made in full
+
+    failures lists (index, request, message) for every request that
+    could not be booked; nothing in the batch was booked.
+    """
+
+    def __init__(self, failures):
+        super().__init__(f"{len(failures)} of the requested bookings could not be made; "
+                         f"nothing was booked")
+        self.failures = failures
+
+    def __reduce__(self):
+        # Rebuilt from failures, not the message, when sent between processes
+        return type(self), (self.failures,)
+
+
+# Outcome of book_many(): the bookings made, and (index, request, message)
+# for each request that was not booked
+BatchBookingResult = namedtuple("BatchBookingResult", ["bookings", "failures"])
+
+# Outcome of cancel(): the cancelled booking, and the bookings made for
+# waitlisted passengers with the seat it freed
+Cancellation = namedtuple("Cancellation", ["booking", "promoted"])
+
+
+class ReservationService:
+    """Flights, customers and bookings behind a non-interactive API
+
+    Every method either returns its result or raises a ReservationError;
+    nothing here prompts or prints, so the service can be driven from
+    scripts, batch jobs and benchmarks as well as from the menus.
+
+    Records live in a storage backend: InMemoryBackend (the default) or
+    sqlite_backend.SQLiteBackend. With a store (see storage.DurableStore)
+    the saved state is loaded on construction and every mutation is logged
+    before it is applied; the store is meant for the in-memory backend,
+    since SQLite is durable on its own.
+
+    The service is safe to call from many threads. A booking holds only
+    its flight's lock while it checks and takes a seat, so bookings on
+    different flights run in parallel. Booking numbers come from a
+    monotonic generator. Flight and customer creation serialise on a
+    catalog lock, and every mutation holds the state lock shared so a
+    snapshot can take it exclusively.
+
+    hold_seat() takes a seat out of availability while an agent confirms;
+    unconfirmed holds lapse after hold_ttl seconds.
+
+    When a class is full, passengers can join its waitlist. Whenever a
+    seat frees up (a cancellation, or a hold released or expired) the
+    waiting passengers are promoted into bookings in priority order,
+    under the same flight lock that freed the seat, so a waitlisted class
+    never has a seat on open sale.
+
+    Every booking and hold has a seat (see seat_map.py): the one the
+    passenger picked, or else the first free seat of the class.
+    book_many() seats each group of passengers on the same flight and
+    class together in one row where it can.
+
+    plan_trip() searches itineraries with connections through
+    self.routes (see route_planner.RoutePlanner), which follows every
+    stored flight.
+
+    Fares are quoted by self.pricing (see pricing.PricingEngine) from the
+    class's load factor and the days left to departure; a flight's
+    economy_fare and business_fare are the base fares the rules scale.
+    Every booking path prices its seat under the flight's lock and stores
+    the fare paid in the booking, so replaying the log never reprices.
+
+    Booking counts and revenue per date, flight and class are kept in
+    self.reports (see reporting.BookingAggregates) as bookings commit.
+    Other views, such as analytics.FleetAnalytics, follow it through
+    subscribe(), which adds them to flight_listeners, booking_listeners,
+    cancellation_listeners and eviction_listeners.
+
+    With a lazily loading store (see storage.DurableStore and
+    history.py) departed flights are archived and only active and future
+    flights are loaded. get_flight(), get_booking() and listings filtered
+    by date or flight then also read the archive; archived flights can no
+    longer be booked, and bookings on them can no longer be cancelled.
+    Unfiltered listings, iter_flights(), iter_bookings(), the counts and
+    self.reports cover the loaded flights only.
+
+    shard=(index, count) makes this service one of count shards (see
+    sharding.py): its booking numbers, waitlist entry IDs and hold IDs
+    are then index + 1 modulo count, so they are unique across the
+    shards and name the shard that issued them.
+    """
+
+    def __init__(self, store=None, backend=None, hold_ttl: float = DEFAULT_HOLD_SECONDS,
+                 pricing: Optional[PricingEngine] = None, shard: Optional[Tuple[int, int]] = None):
+        self.backend = backend if backend is not None else InMemoryBackend()
+        self.pricing = pricing if pricing is not None else PricingEngine()
+        self.flight_locks = FlightLocks()
+        self._state_lock = SharedExclusiveLock()
+        index, count = shard if shard is not None else (0, 1)
+        # A released or expired hold's seat goes to the waitlist under the
+        # same locks, before a concurrent book() can see it
+        self.holds = HoldManager(self.flight_locks, self.backend.update_availability, ttl=hold_ttl,
+                                 on_release=self._promote, fare=self.pricing.fare_cents,
+                                 state_lock=self._state_lock, ids=SequenceGenerator(index + 1 - count, count))
+        self.booking_numbers = SequenceGenerator(index + 1 - count, count)
+        self.waitlist = Waitlist(SequenceGenerator(index + 1 - count, count))
+        self._catalog_lock = threading.Lock()
+
+        # Default credentials
+        self.username = "Staff"
+        self.password = "Cloud123"
+
+        self.reports = BookingAggregates()
+
+        # Callables told about every stored flight and committed booking
+        self.flight_listeners: List[Callable[[Flight], None]] = []
+        self.booking_listeners: List[Callable[[Booking], None]] = []
+        self.cancellation_listeners: List[Callable[[Booking], None]] = []
+        # Callables told about flights dropped from memory once archived
+        self.eviction_listeners: List[Callable[[List[Flight]], None]] = []
+
+        self.routes = RoutePlanner(fare=self.pricing.fare_cents)
+        self.flight_listeners.append(self.routes.add)
+        self.eviction_listeners.append(self.routes.remove_many)
+        self.eviction_listeners.append(self.holds.drop_flights)
+
+        # Waitlist entries saved by a durable backend; a store replays its own
+        for row in self.backend.iter_waitlist_rows():
+            self.waitlist.add(self._waitlist_entry_from_row(row))
+
+        self.store = store
+        self.history = store.history if store is not None else None
+        if store is not None:
+            store.load(self)
+        self.booking_numbers.observe(self.backend.max_booking_no())
+        if self.reports.total_bookings != self.backend.booking_count():
+            # Bookings already held by a durable backend were not replayed
+            self.reports.rebuild(self.backend.iter_bookings())
+        if len(self.routes) != self.flight_count():
+            # Likewise for flights already held by a durable backend
+            self.routes.add_many(self.iter_flights())
+
+    def initialize_default_flights(self):
+        """Initialize the three default flights as specified in the coursework"""
+        tomorrow = (datetime.datetime.now() + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+
+        # Default flight schedule
+        for flight_no, arrival_to, departure_time in [("JFK001", "Orlando", "06:30"),
+                                                      ("JFK002", "Miami", "14:00"),
+                                                      ("JFK003", "Los Angeles", "20:30")]:
+            self.create_flight(flight_no, arrival_to, tomorrow, departure_time,
+                               economy_seats=20, business_seats=20,
+                               economy_fare=500, business_fare=1000)
+
+    def authenticate(self, username: str, password: str) -> bool:
+        """Check staff credentials"""
+        return (hmac.compare_digest(username.encode(), self.username.encode())
+                and hmac.compare_digest(password.encode(), self.password.encode()))
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _log(self, op, payload):
+        """Write a mutation to the store ahead of applying it"""
+        if self.store is not None:
+            self.store.append(op, payload)
+
+    def _log_many(self, op, payloads):
+        """Write a batch of mutations of one type to the store with a single commit"""
+        if self.store is not None and payloads:
+            self.store.append_many(op, payloads)
+
+    def _after_mutation(self):
+        """Take a snapshot once the store has logged enough records"""
+        if self.store is not None and self.store.needs_snapshot():
+            with self._state_lock.exclusive():
+                # Another thread may have taken the snapshot while we waited
+                if self.store.needs_snapshot():
+                    self.store.snapshot(self)
+
+    def apply_event(self, op, payload):
+        """Apply one logged mutation while loading saved state"""
+        if op == FLIGHT_ADDED:
+            self.store_flight(Flight.from_row(payload))
+        elif op == CUSTOMER_REGISTERED:
+            self.store_customer(Customer.from_row(payload))
+        elif op == BOOKING_CONFIRMED:
+            self._commit_booking(self._booking_from_row(payload))
+            self.booking_numbers.observe(payload[0])
+        elif op == BOOKING_CANCELLED:
+            self._cancel_booking(self.backend.get_booking(payload[0]))
+        elif op == WAITLIST_JOINED:
+            self._add_waitlist_entry(self._waitlist_entry_from_row(payload))
+        elif op == WAITLIST_LEFT:
+            self._remove_waitlist_entry(payload[0])
+        elif op == WAITLIST_PROMOTED:
+            entry_id, row = payload
+            self._promote_entry(entry_id, self._booking_from_row(row))
+            self.booking_numbers.observe(row[0])
+        else:
+            raise ValueError(f"Unknown event type {op!r}")
+
+    def _booking_from_row(self, row) -> Booking:
+        # Rows logged before bookings had seats have six fields; the backend seats them
+        booking_no, flight_no, customer_id, travel_class, fare_cents, booked_at = row[:6]
+        return Booking(booking_no, self.get_flight(flight_no), self.get_customer(customer_id),
+                       travel_class, fare_cents, booked_at, row[6] if len(row) > 6 else None)
+
+    def _waitlist_entry_from_row(self, row) -> WaitlistEntry:
+        entry_id, flight_no, customer_id, travel_class, priority, requested_at = row
+        return WaitlistEntry(entry_id, self.get_flight(flight_no), self.get_customer(customer_id),
+                             travel_class, priority, requested_at)
+
+    def checkpoint(self):
+        """Snapshot the current state so restarts replay only newer mutations"""
+        if self.store is not None:
+            with self._state_lock.exclusive():
+                self.store.snapshot(self)
+
+    def close(self):
+        """Flush and close the store and the backend"""
+        if self.store is not None:
+            self.store.close()
+        self.backend.close()
+
+    # ------------------------------------------------------------------
+    # Storage and lookups
+    # ------------------------------------------------------------------
+
+    def store_flight(self, flight):
+        """Add a flight to the backend, rejecting duplicate flight numbers"""
+        if self.backend.get_flight(flight.flight_no):
+            raise ValidationError(f"Flight number {flight.flight_no} already exists")
+
+        self.backend.add_flight(flight)
+        for listener in self.flight_listeners:
+            listener(flight)
+
+    def store_customer(self, customer):
+        """Add a customer to the backend, rejecting duplicate IDs and passports"""
+        if self.backend.get_customer(customer.customer_id):
+            raise ValidationError(f"Customer ID {customer.customer_id} already exists")
+
+        existing = self.backend.find_customer(customer.passport_no)
+        if existing:
+            raise ValidationError(f"Passport number {customer.passport_no} is already "
+                                  f"registered to customer {existing.customer_id}")
+
+        self.backend.add_customer(customer)
+
+    def get_flight(self, flight_no: str) -> Optional[Flight]:
+        """Return the flight with this number, or None; archived flights are read-only copies"""
+        flight = self.backend.get_flight(flight_no)
+        if flight is None and self.history is not None:
+            return self.history.get_flight(flight_no)
+        return flight
+
+    def get_customer(self, customer_id: str) -> Optional[Customer]:
+        """Return the customer with this ID, or None"""
+        return self.backend.get_customer(customer_id)
+
+    def find_customer(self, passport_no: str) -> Optional[Customer]:
+        """Return the customer holding this passport, or None"""
+        return self.backend.find_customer(passport_no)
+
+    def iter_flights(self) -> Iterator[Flight]:
+        """Iterate over all flights in the order they were added"""
+        return self.backend.iter_flights()
+
+    def iter_customers(self) -> Iterator[Customer]:
+        """Iterate over all customers in the order they registered"""
+        return self.backend.iter_customers()
+
+    def iter_bookings(self) -> Iterator[Booking]:
+        """Iterate over all bookings in the order they were confirmed"""
+        return self.backend.iter_bookings()
+
+    def subscribe(self, on_flight: Optional[Callable[[Flight], None]] = None,
+                  on_booking: Optional[Callable[[Booking], None]] = None,
+                  on_cancellation: Optional[Callable[[Booking], None]] = None,
+                  on_eviction: Optional[Callable[[List[Flight]], None]] = None,
+                  load: Optional[Callable[[Iterator[Flight], Iterator[Booking]], None]] = None):
+        """Follow the service's changes, starting from its current state
+
+        load, if given, is called with the loaded flights and bookings,
+        then the listeners are added. Both happen while no mutation can
+        run, so a view built this way neither misses nor double counts a
+        change.
+        """
+        with self._state_lock.exclusive():
+            if load is not None:
+                load(self.iter_flights(), self.iter_bookings())
+            for listeners, listener in ((self.flight_listeners, on_flight),
+                                        (self.booking_listeners, on_booking),
+                                        (self.cancellation_listeners, on_cancellation),
+                                        (self.eviction_listeners, on_eviction)):
+                if listener is not None:
+                    listeners.append(listener)
+
+    def flight_count(self) -> int:
+        return self.backend.flight_count()
+
+    def archived_flight_count(self) -> int:
+        return len(self.history) if self.history is not None else 0
+
+    def archived_flights(self, date_from: str = "", date_to: str = "") -> List[Flight]:
+        """Return archived flights departing in a date range, ordered by departure"""
+        if self.history is None:
+            return []
+        return self.history.flights_between(date_from, date_to)
+
+    def customer_count(self) -> int:
+        return self.backend.customer_count()
+
+    def booking_count(self) -> int:
+        return self.backend.booking_count()
+
+    # ------------------------------------------------------------------
+    # Service operations
+    # ------------------------------------------------------------------
+
+    def validate_flight(self, flight_no: str, arrival_to: str, departure_date: str,
+                        departure_time: str, economy_seats: int = 70, business_seats: int = 30,
+                        economy_fare: float = 500.0, business_fare: float = 1000.0,
+                        departure_from: str = ORIGIN, duration_minutes: Optional[int] = None) -> Flight:
+        """Check a flight against the add_flight rules and build its record without storing it
+
+        duration_minutes defaults to the route's scheduled block time.
+        """
+        if not is_valid_flight_no(flight_no):
+            raise ValidationError("Invalid flight number format. Must be JFK followed by 3 digits (e.g., JFK001)")
+        if departure_from not in AIRPORTS:
+            raise ValidationError(f"Invalid departure airport. Must be {', '.join(AIRPORTS)}")
+        if arrival_to not in AIRPORTS:
+            raise ValidationError(f"Invalid destination. Must be {', '.join(AIRPORTS)}")
+        if arrival_to == departure_from:
+            raise ValidationError("Destination must differ from the departure airport")
+        if not validate_date(departure_date):
+            raise ValidationError("Invalid date format. Please use YYYY-MM-DD")
+        if not validate_time(departure_time):
+            raise ValidationError("Invalid time format. Please use HH:MM")
+        if economy_seats < 0 or business_seats < 0 or economy_fare < 0 or business_fare < 0:
+            raise ValidationError("Seats and fares cannot be negative")
+        if duration_minutes is not None and duration_minutes <= 0:
+            raise ValidationError("Flight duration must be positive")
+
+        return Flight(flight_no, departure_from, arrival_to, departure_date, departure_time,
+                      economy_seats, business_seats, to_cents(economy_fare), to_cents(business_fare),
+                      duration_minutes=duration_minutes)
+
+    def validate_customer(self, customer_id: str, name: str, passport_no: str, address: str,
+                          telephone: str) -> Customer:
+        """Check a customer against the register_customer rules and build its record without storing it"""
+        if not is_valid_customer_id(customer_id):
+            raise ValidationError("Invalid format. Must be C followed by 3 digits (e.g., C001)")
+        if not name:
+            raise ValidationError("Name is required!")
+        if not passport_no:
+            raise ValidationError("Passport number is required!")
+        if not address:
+            raise ValidationError("Address is required!")
+        if not is_valid_telephone(telephone):
+            raise ValidationError("Invalid telephone number! Must be at least 7 digits.")
+
+        return Customer(customer_id, name, passport_no, address, telephone)
+
+    def create_flight(self, flight_no: str, arrival_to: str, departure_date: str,
+                      departure_time: str, economy_seats: int = 70, business_seats: int = 30,
+                      economy_fare: float = 500.0, business_fare: float = 1000.0,
+                      departure_from: str = ORIGIN, duration_minutes: Optional[int] = None) -> Flight:
+        """Validate and add a new flight, returning the stored record"""
+        new_flight = self.validate_flight(flight_no, arrival_to, departure_date, departure_time,
+                                          economy_seats, business_seats, economy_fare, business_fare,
+                                          departure_from, duration_minutes)
+        with self._state_lock.shared(), self._catalog_lock:
+            if self.get_flight(flight_no):
+                raise ValidationError("Flight number already exists!")
+            self._log(FLIGHT_ADDED, new_flight.to_row())
+            self.store_flight(new_flight)
+        self._after_mutation()
+        return new_flight
+
+    def register(self, customer_id: str, name: str, passport_no: str, address: str,
+                 telephone: str) -> Customer:
+        """Validate and register a new customer, returning the stored record"""
+        new_customer = self.validate_customer(customer_id, name, passport_no, address, telephone)
+        with self._state_lock.shared(), self._catalog_lock:
+            if self.get_customer(customer_id):
+                raise ValidationError("Customer ID already exists! Please choose another.")
+            existing = self.find_customer(passport_no)
+            if existing:
+                raise ValidationError(f"Passport number {passport_no} is already "
+                                      f"registered to customer {existing.customer_id}")
+            self._log(CUSTOMER_REGISTERED, new_customer.to_row())
+            self.store_customer(new_customer)
+        self._after_mutation()
+        return new_customer
+
+    def import_flights(self, flights: List[Flight]) -> List[Tuple[Flight, str]]:
+        """Add a batch of validated flights in one go, returning (flight, reason) for each rejected
+
+        Flights whose number is already taken, in the store or earlier in
+        the batch, are rejected; the rest are logged together and inserted
+        into the backend and its indexes as one batch.
+        """
+        rejected, accepted, seen = [], [], set()
+        with self._state_lock.shared(), self._catalog_lock:
+            for flight in flights:
+                if flight.flight_no in seen or self.get_flight(flight.flight_no):
+                    rejected.append((flight, "Flight number already exists!"))
+                    continue
+                seen.add(flight.flight_no)
+                accepted.append(flight)
+            self._log_many(FLIGHT_ADDED, [flight.to_row() for flight in accepted])
+            self.backend.add_flights(accepted)
+            for flight in accepted:
+                for listener in self.flight_listeners:
+                    listener(flight)
+        self._after_mutation()
+        return rejected
+
+    def import_customers(self, customers: List[Customer]) -> List[Tuple[Customer, str]]:
+        """Register a batch of validated customers in one go, returning (customer, reason) for each rejected"""
+        rejected, accepted, ids, passports = [], [], {}, {}
+        with self._state_lock.shared(), self._catalog_lock:
+            for customer in customers:
+                if customer.customer_id in ids or self.get_customer(customer.customer_id):
+                    rejected.append((customer, "Customer ID already exists! Please choose another."))
+                    continue
+                existing = passports.get(customer.passport_no) or self.find_customer(customer.passport_no)
+                if existing:
+                    rejected.append((customer, f"Passport number {customer.passport_no} is already "
+                                               f"registered to customer {existing.customer_id}"))
+                    continue
+                ids[customer.customer_id] = passports[customer.passport_no] = customer
+                accepted.append(customer)
+            self._log_many(CUSTOMER_REGISTERED, [customer.to_row() for customer in accepted])
+            self.backend.add_customers(accepted)
+        self._after_mutation()
+        return rejected
+
+    def search(self, departure_date: str = "", departure_time: str = "", destination: str = "",
+               travel_class: str = "", date_from: str = "", date_to: str = "") -> List[Flight]:
+        """Return flights matching the search criteria, ordered by departure"""
+        if departure_date and not validate_date(departure_date):
+            raise ValidationError("Invalid date format. Please use YYYY-MM-DD")
+        if departure_time and not validate_time(departure_time):
+            raise ValidationError("Invalid time format. Please use HH:MM")
+        if (date_from and not validate_date(date_from)) or (date_to and not validate_date(date_to)):
+            raise ValidationError("Invalid date format. Please use YYYY-MM-DD")
+        if travel_class and travel_class not in TRAVEL_CLASSES:
+            raise ValidationError("Invalid class. Must be Economy or Business")
+
+        self.holds.expire_due()
+        return self.backend.search(departure_date=departure_date,
+                                   departure_time=departure_time,
+                                   destination=destination,
+                                   travel_class=travel_class,
+                                   date_from=date_from,
+                                   date_to=date_to)
+
+    def plan_trip(self, origin: str, destination: str, departure_date: str, departure_time: str = "00:00",
+                  travel_class: str = "", optimize: str = "arrival",
+                  max_legs: int = DEFAULT_MAX_LEGS) -> Optional[Itinerary]:
+        """Find an itinerary, with connections if needed, leaving origin on departure_date
+
+        The first flight leaves between departure_time and the end of
+        that day. optimize="arrival" returns the itinerary that lands
+        soonest, optimize="fare" the cheapest one at current fares. With
+        travel_class, only flights with a seat available in that class are
+        used. Returns None when no itinerary exists.
+        """
+        if origin not in AIRPORTS or destination not in AIRPORTS:
+            raise ValidationError(f"Invalid airport. Must be {', '.join(AIRPORTS)}")
+        if origin == destination:
+            raise ValidationError("Destination must differ from the departure airport")
+        if not validate_date(departure_date):
+            raise ValidationError("Invalid date format. Please use YYYY-MM-DD")
+        if not validate_time(departure_time):
+            raise ValidationError("Invalid time format. Please use HH:MM")
+        if travel_class and travel_class not in TRAVEL_CLASSES:
+            raise ValidationError("Invalid class. Must be Economy or Business")
+        if optimize not in ("arrival", "fare"):
+            raise ValidationError("Invalid optimisation. Must be 'arrival' or 'fare'")
+        if max_legs < 1:
+            raise ValidationError("An itinerary needs at least one flight")
+
+        self.holds.expire_due()
+        travel_class = intern_class(travel_class) if travel_class else ""
+        depart_after = departure_minutes(departure_date, departure_time)
+        end_of_day = departure_minutes(departure_date, "00:00") + 1440
+        if optimize == "arrival":
+            return self.routes.earliest_arrival(origin, destination, depart_after, end_of_day,
+                                                travel_class, max_legs)
+        return self.routes.cheapest(origin, destination, depart_after, end_of_day, travel_class, max_legs)
+
+    def _resolve(self, flight_no: str, passport_no: str, travel_class: str):
+        """Look up the flight and customer of a booking request and check its class"""
+        # Through get_flight(), so metrics.instrument() counts the lookup
+        flight = self.get_flight(flight_no)
+        if not flight:
+            raise NotFoundError(f"Flight {flight_no} not found!")
+        if self.history is not None and self.backend.get_flight(flight_no) is not flight:
+            raise ValidationError(f"Flight {flight_no} has already departed!")
+
+        customer = self.find_customer(passport_no)
+        if not customer:
+            raise NotFoundError("Customer not found! Please register first or try another passport number.")
+
+        if travel_class not in TRAVEL_CLASSES:
+            raise ValidationError("Invalid class. Must be 'Economy' or 'Business'")
+
+        return flight, customer, intern_class(travel_class)
+
+    def _seat_number(self, flight: Flight, travel_class: str, seat: str) -> Optional[int]:
+        """Seat number of a label such as '12C' in a class, or None when no seat was asked for"""
+        if not seat:
+            return None
+        cabin = flight.cabin(travel_class).cabin
+        number = cabin.index(seat)
+        if number is None:
+            raise ValidationError(f"Invalid seat {seat}. {travel_class.capitalize()} seats are rows "
+                                  f"{cabin.first_row}-{cabin.last_row}, seats {cabin.layout}")
+        return number
+
+    def quote(self, flight_no: str, passport_no: str, travel_class: str):
+        """Check a booking request and return (flight, customer, fare_cents) without booking
+
+        The seat check here is advisory; book() repeats it atomically.
+        """
+        flight, customer, travel_class = self._resolve(flight_no, passport_no, travel_class)
+        self.holds.expire_due()
+        if flight.available(travel_class) <= 0:
+            raise SeatUnavailableError(f"No {travel_class} seats available on this flight!")
+
+        return flight, customer, self.pricing.fare_cents(flight, travel_class)
+
+    def quote_fare(self, flight: Flight, travel_class: str) -> FareQuote:
+        """Quote the current fare for one seat in a class of a flight, as search results show it"""
+        if travel_class not in TRAVEL_CLASSES:
+            raise ValidationError("Invalid class. Must be 'Economy' or 'Business'")
+        return self.pricing.quote(flight, intern_class(travel_class))
+
+    def set_fare_rules(self, rules: FareRules) -> List[Tuple[Flight, Tuple[FareQuote, ...]]]:
+        """Switch to new fare rules and return the repriced fares of every flight
+
+        Quotes and holds made under the old rules keep their fares; every
+        later quote and booking uses the new ones.
+        """
+        self.pricing.set_rules(rules)
+        return self.reprice_all()
+
+    def reprice_all(self) -> List[Tuple[Flight, Tuple[FareQuote, ...]]]:
+        """Quote economy and business on every flight with the current rules
+
+        Returns (flight, (economy quote, business quote)) per flight, in
+        the order the flights were added.
+        """
+        self.holds.expire_due()
+        return self.pricing.reprice(self.iter_flights(), TRAVEL_CLASSES)
+
+    def hold_seat(self, flight_no: str, passport_no: str, travel_class: str,
+                  ttl: Optional[float] = None, seat: str = "") -> Hold:
+        """Hold one seat for a passenger until confirm_hold(), release_hold() or expiry
+
+        seat picks a seat by label, such as '12C'; by default the first
+        free seat of the class is held.
+        """
+        flight, customer, travel_class = self._resolve(flight_no, passport_no, travel_class)
+        number = self._seat_number(flight, travel_class, seat)
+        self.holds.expire_due()
+        hold = self.holds.place(flight, customer, travel_class, ttl, number)
+        if hold is None:
+            if number is not None and flight.available(travel_class) > 0:
+                raise SeatUnavailableError(f"Seat {seat.upper()} is already taken!")
+            raise SeatUnavailableError(f"No {travel_class} seats available on this flight!")
+        return hold
+
+    def release_hold(self, hold_id: int) -> bool:
+        """Give a held seat back, to the waitlist first; returns False if the hold had already gone"""
+        released = self.holds.release(hold_id)
+        if released:
+            self._after_mutation()
+        return released
+
+    def confirm_hold(self, hold_id: int) -> Booking:
+        """Turn a live hold into a booking at the fare quoted when it was held"""
+        self.holds.expire_due()
+        hold = self.holds.get(hold_id)
+        if hold is None:
+            raise NotFoundError("Seat hold has expired or was released. Please start the booking again.")
+
+        flight = hold.flight
+        with self._state_lock.shared(), self.flight_locks.hold(flight.flight_no):
+            if self.holds.take(hold_id) is None:
+                raise NotFoundError("Seat hold has expired or was released. Please start the booking again.")
+
+            new_booking = Booking(self.booking_numbers.next(), flight, hold.customer, hold.travel_class,
+                                  hold.fare_cents, epoch_minutes(), hold.seat)
+            self._log(BOOKING_CONFIRMED, new_booking.to_row())
+            self._commit_booking(new_booking)
+        self._after_mutation()
+        return new_booking
+
+    def book(self, flight_no: str, passport_no: str, travel_class: str, seat: str = "") -> Booking:
+        """Book one seat for a registered passenger, returning the booking
+
+        seat picks a seat by label, such as '12C'; by default the first
+        free seat of the class is booked. The seat check, the fare quote,
+        the log write and the seat map update happen under the flight's
+        lock, so concurrent callers can never oversell or share a seat,
+        and each pays the fare for the load they saw.
+        """
+        flight, customer, travel_class = self._resolve(flight_no, passport_no, travel_class)
+        number = self._seat_number(flight, travel_class, seat)
+        self.holds.expire_due()
+
+        with self._state_lock.shared(), self.flight_locks.hold(flight.flight_no):
+            cabin = flight.cabin(travel_class)
+            if number is None:
+                number = cabin.first_free()
+                if number is None:
+                    raise SeatUnavailableError(f"No {travel_class} seats available on this flight!")
+            elif not cabin.is_free(number):
+                if cabin.available() <= 0:
+                    raise SeatUnavailableError(f"No {travel_class} seats available on this flight!")
+                raise SeatUnavailableError(f"Seat {seat.upper()} is already taken!")
+
+            new_booking = Booking(self.booking_numbers.next(), flight, customer, travel_class,
+                                  self.pricing.fare_cents(flight, travel_class), epoch_minutes(), number)
+            self._log(BOOKING_CONFIRMED, new_booking.to_row())
+            self._commit_booking(new_booking)
+        self._after_mutation()
+        return new_booking
+
+    def book_many(self, requests, all_or_nothing: bool = True) -> BatchBookingResult:
+        """Book a group of (flight_no, passport_no, travel_class) requests in one operation
+
+        Customers and flights are resolved once per distinct passport and
+        flight number. The locks of every flight involved are then taken
+        together (in sorted order, so concurrent batches cannot deadlock),
+        seats are allocated, and all the bookings are logged with a single
+        commit.
+
+        With all_or_nothing (the default) any failure books nothing and
+        raises BatchBookingError listing every failed request. Otherwise
+        the requests are booked in order while seats last, and those that
+        could not be booked are reported in the result.
+
+        Each seat is priced as if the group's earlier seats on the same
+        flight and class were already sold, so a large group moves up
+        the fare buckets just as the same bookings made one by one would.
+
+        The requests for the same flight and class are seated together:
+        in the first row with that many adjacent free seats, or else in
+        the first free seats (see seat_map.CabinSeats.find_seats).
+        """
+        customers, flights, departed, failures, resolved = {}, {}, set(), [], []
+        for index, request in enumerate(requests):
+            flight_no, passport_no, travel_class = request
+            if passport_no not in customers:
+                customers[passport_no] = self.find_customer(passport_no)
+            if flight_no not in flights:
+                # Through get_flight(), as in _resolve(), so metrics count the lookup
+                flight = flights[flight_no] = self.get_flight(flight_no)
+                if flight and self.history is not None and self.backend.get_flight(flight_no) is not flight:
+                    departed.add(flight_no)
+
+            if flights[flight_no] is None:
+                failures.append((index, request, f"Flight {flight_no} not found!"))
+            elif flight_no in departed:
+                failures.append((index, request, f"Flight {flight_no} has already departed!"))
+            elif customers[passport_no] is None:
+                failures.append((index, request, "Customer not found! Please register first "
+                                                 "or try another passport number."))
+            elif travel_class not in TRAVEL_CLASSES:
+                failures.append((index, request, "Invalid class. Must be 'Economy' or 'Business'"))
+            else:
+                resolved.append((index, request, flights[flight_no], customers[passport_no],
+                                 intern_class(travel_class)))
+        if failures and all_or_nothing:
+            raise BatchBookingError(failures)
+
+        self.holds.expire_due()
+        new_bookings = []
+        with self._state_lock.shared(), \
+                self.flight_locks.hold(*(flight.flight_no for _, _, flight, _, _ in resolved)):
+            wanted = Counter((flight.flight_no, travel_class) for _, _, flight, _, travel_class in resolved)
+            taken, seats = Counter(), {}
+            for index, request, flight, customer, travel_class in resolved:
+                key = flight.flight_no, travel_class
+                if key not in seats:
+                    cabin = flight.cabin(travel_class)
+                    seats[key] = cabin.find_seats(min(wanted[key], cabin.available())) or []
+                if taken[key] >= len(seats[key]):
+                    failures.append((index, request, f"No {travel_class} seats available on this flight!"))
+                    continue
+                fare_cents = self.pricing.quote(flight, travel_class, taken[key]).fare_cents
+                new_bookings.append((flight, customer, travel_class, fare_cents, seats[key][taken[key]]))
+                taken[key] += 1
+            if failures and all_or_nothing:
+                raise BatchBookingError(failures)
+
+            booked_at = epoch_minutes()
+            new_bookings = [Booking(self.booking_numbers.next(), flight, customer, travel_class,
+                                    fare_cents, booked_at, seat)
+                            for flight, customer, travel_class, fare_cents, seat in new_bookings]
+            self._log_many(BOOKING_CONFIRMED, [booking.to_row() for booking in new_bookings])
+            self.backend.add_bookings(new_bookings)
+            for booking in new_bookings:
+                self.reports.add(booking)
+                for listener in self.booking_listeners:
+                    listener(booking)
+        self._after_mutation()
+        return BatchBookingResult(new_bookings, sorted(failures, key=lambda failure: failure[0]))
+
+    def _commit_booking(self, booking):
+        """Store a confirmed booking and mark its seat booked on the flight"""
+        self.backend.add_booking(booking)
+        self.reports.add(booking)
+        for listener in self.booking_listeners:
+            listener(booking)
+
+    def get_booking(self, booking_no: int) -> Optional[Booking]:
+        """Return the booking with this number, or None if it does not exist or was cancelled"""
+        booking = self.backend.get_booking(booking_no)
+        if booking is None and self.history is not None:
+            row = self.history.booking_row(booking_no)
+            if row is not None:
+                return self._booking_from_row(row)
+        return booking
+
+    def cancel(self, booking_no: int) -> Cancellation:
+        """Cancel a booking and give its seat to the waitlist, or back on sale
+
+        The cancellation and any promotion it triggers are logged and
+        applied under the flight's lock, so a concurrent booking can never
+        take the freed seat ahead of a waiting passenger.
+        """
+        booking = self.backend.get_booking(booking_no)
+        if booking is None:
+            if self.history is not None and self.history.booking_row(booking_no):
+                raise ValidationError(f"Booking B{booking_no:03d} is for a flight that has already departed!")
+            raise NotFoundError(f"Booking B{booking_no:03d} not found!")
+
+        flight = booking.flight
+        with self._state_lock.shared(), self.flight_locks.hold(flight.flight_no):
+            # Another thread may have cancelled it while we waited for the lock
+            booking = self.backend.get_booking(booking_no)
+            if booking is None:
+                raise NotFoundError(f"Booking B{booking_no:03d} not found!")
+            self._log(BOOKING_CANCELLED, [booking_no])
+            self._cancel_booking(booking)
+            promoted = self._promote(flight, booking.travel_class)
+        self._after_mutation()
+        return Cancellation(booking, promoted)
+
+    def _cancel_booking(self, booking):
+        """Remove a cancelled booking and give its seat back to the flight"""
+        self.backend.remove_booking(booking)
+        self.reports.remove(booking)
+        for listener in self.cancellation_listeners:
+            listener(booking)
+
+    def join_waitlist(self, flight_no: str, passport_no: str, travel_class: str,
+                      priority: int = DEFAULT_PRIORITY) -> WaitlistEntry:
+        """Put a passenger on the waitlist of a full class; lower priority numbers are promoted first"""
+        flight, customer, travel_class = self._resolve(flight_no, passport_no, travel_class)
+        self.holds.expire_due()
+
+        with self._state_lock.shared(), self.flight_locks.hold(flight.flight_no):
+            if flight.available(travel_class) > 0:
+                raise ValidationError(f"{travel_class.capitalize()} seats are still available on this "
+                                      f"flight. Please book instead.")
+            existing = self.waitlist.find(flight.flight_no, travel_class, customer.customer_id)
+            if existing is not None:
+                raise ValidationError(f"Customer is already on the {travel_class} waitlist for this "
+                                      f"flight (position {self.waitlist.position(existing.entry_id)})")
+
+            entry = WaitlistEntry(self.waitlist.entry_ids.next(), flight, customer, travel_class,
+                                  priority, epoch_minutes())
+            self._log(WAITLIST_JOINED, entry.to_row())
+            self._add_waitlist_entry(entry)
+        self._after_mutation()
+        return entry
+
+    def leave_waitlist(self, entry_id: int) -> WaitlistEntry:
+        """Take a passenger off a waitlist, returning their entry"""
+        entry = self.waitlist.get(entry_id)
+        if entry is None:
+            raise NotFoundError("Waitlist entry not found! It may already have been promoted.")
+
+        with self._state_lock.shared(), self.flight_locks.hold(entry.flight.flight_no):
+            if self.waitlist.get(entry_id) is None:
+                raise NotFoundError("Waitlist entry not found! It may already have been promoted.")
+            self._log(WAITLIST_LEFT, [entry_id])
+            self._remove_waitlist_entry(entry_id)
+        self._after_mutation()
+        return entry
+
+    def waitlist_position(self, entry_id: int) -> Optional[int]:
+        """1-based place of a waitlist entry in its queue, or None if it is no longer waiting"""
+        return self.waitlist.position(entry_id)
+
+    def _add_waitlist_entry(self, entry):
+        self.waitlist.add(entry)
+        self.backend.add_waitlist_entry(entry)
+
+    def _remove_waitlist_entry(self, entry_id):
+        self.waitlist.remove(entry_id)
+        self.backend.remove_waitlist_entry(entry_id)
+
+    def _promote(self, flight, travel_class) -> List[Booking]:
+        """Book free seats of a class for its waitlist, best priority first
+
+        The caller must hold the flight's lock. Each promotion is logged
+        as one record covering both the booking and the entry it
+        replaces, so a restart can never see one without the other.
+        """
+        promoted = []
+        while flight.available(travel_class) > 0:
+            entry = self.waitlist.peek(flight.flight_no, travel_class)
+            if entry is None:
+                break
+            new_booking = Booking(self.booking_numbers.next(), flight, entry.customer, travel_class,
+                                  self.pricing.fare_cents(flight, travel_class), epoch_minutes(),
+                                  flight.cabin(travel_class).first_free())
+            self._log(WAITLIST_PROMOTED, [entry.entry_id, new_booking.to_row()])
+            self._promote_entry(entry.entry_id, new_booking)
+            promoted.append(new_booking)
+        return promoted
+
+    def _promote_entry(self, entry_id, booking):
+        """Replace a waitlist entry with its booking"""
+        self.waitlist.remove(entry_id)
+        self.backend.promote_waitlist_entry(entry_id, booking)
+        self.reports.add(booking)
+        for listener in self.booking_listeners:
+            listener(booking)
+
+    def evict_flights(self, flights: List[Flight]):
+        """Drop archived flights, with their bookings and waitlist entries, from memory
+
+        Called by the store once the flights are safely in its history
+        archive, with the state lock held exclusively. Their bookings
+        leave self.reports too, so the reports cover the loaded flights
+        just as they do after a lazy restart. The eviction listeners
+        then drop them from the route planner, the seat holds and any
+        other view.
+        """
+        flight_nos = {flight.flight_no for flight in flights}
+        for entry in list(self.waitlist.iter_entries()):
+            if entry.flight.flight_no in flight_nos:
+                self._remove_waitlist_entry(entry.entry_id)
+        for booking in self.backend.remove_flights(flights):
+            self.reports.remove(booking)
+        for listener in self.eviction_listeners:
+            listener(flights)
+
+    def _archived_bookings(self, departure_date: str, flight_no: str) -> List[Booking]:
+        """Bookings on archived flights matching a date or flight filter"""
+        if self.history is None or not (departure_date or flight_no):
+            return []
+        if flight_no:
+            flight = self.history.get_flight(flight_no)
+            if flight is None or (departure_date and flight.departure_date != departure_date):
+                return []
+            rows = self.history.booking_rows(flight_no)
+        else:
+            rows = self.history.booking_rows_on(departure_date)
+        return [self._booking_from_row(row) for row in rows]
+
+    def list_bookings(self, departure_date: str = "", flight_no: str = "") -> List[Booking]:
+        """Return bookings, optionally filtered by departure date and flight"""
+        bookings = self.backend.list_bookings(departure_date, flight_no)
+        archived = self._archived_bookings(departure_date, flight_no)
+        if archived:
+            return sorted(archived + bookings, key=lambda booking: booking.booking_no)
+        return bookings
+
+    def page_bookings(self, departure_date: str = "", flight_no: str = "",
+                      cursor: Optional[int] = None, limit: int = 50) -> BookingPage:
+        """Return up to limit bookings after cursor, optionally filtered by date and flight
+
+        Start with cursor=None and pass each page's next_cursor back in
+        until it is None; only the requested page is materialised.
+        """
+        if limit <= 0:
+            raise ValidationError("Page size must be positive")
+        if self.history is None or not len(self.history) or not (departure_date or flight_no):
+            return self.backend.page_bookings(departure_date, flight_no, cursor, limit)
+        if flight_no and departure_date:
+            flight = self.history.get_flight(flight_no)
+            if flight is not None and flight.departure_date != departure_date:
+                return BookingPage([], None)
+        # Both sources are in booking number order, so merging them reads
+        # only as far as the page reaches
+        archived = (self._booking_from_row(row) for row in
+                    self.history.iter_booking_rows(departure_date, flight_no, cursor or 0))
+        live = self._iter_live_bookings(departure_date, flight_no, cursor, limit + 1)
+        bookings = list(islice(heapq.merge(archived, live, key=lambda booking: booking.booking_no), limit + 1))
+        if len(bookings) > limit:
+            return BookingPage(bookings[:limit], bookings[limit - 1].booking_no)
+        return BookingPage(bookings, None)
+
+    def _iter_live_bookings(self, departure_date: str, flight_no: str,
+                            cursor: Optional[int], chunk: int) -> Iterator[Booking]:
+        """Backend bookings after cursor, fetched a page of chunk at a time"""
+        while True:
+            page = self.backend.page_bookings(departure_date, flight_no, cursor, chunk)
+            yield from page.bookings
+            if page.next_cursor is None:
+                return
+            cursor = page.next_cursor
+
+    def bookings_by_date(self) -> Dict[str, List[Booking]]:
+        """Group bookings by departure date"""
+        return self.backend.bookings_by_date()
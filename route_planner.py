@@ -0,0 +1,294 @@
+import heapq
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+from records import ECONOMY, Flight
+
+# Shortest time allowed between arriving on one leg and departing on the next
+DEFAULT_MIN_CONNECTION = 60
+
+# Longest wait allowed at a connecting airport
+DEFAULT_MAX_LAYOVER = 6 * 60
+
+# Most flights in one itinerary
+DEFAULT_MAX_LEGS = 3
+
+# A planned journey: its flights in order, the total fare for the class
+# searched, and the first departure and last arrival in epoch minutes
+Itinerary = namedtuple("Itinerary", ["legs", "fare_cents", "departs_at", "arrives_at"])
+
+_NEVER = float("inf")
+
+
+class _Departures:
+    """Flights (all of them, or those leaving one airport) sorted by departure
+
+    The departure minutes are a parallel list of ints, so finding the
+    first flight after a given time is one bisect; the departure
+    airports are another, so a scan can skip flights from airports it
+    has not reached without touching the Flight objects.
+    """
+
+    __slots__ = ('times', 'flights', 'origins')
+
+    def __init__(self):
+        self.times: List[int] = []
+        self.flights: List[Flight] = []
+        self.origins: List[str] = []
+
+    def extend(self, flights):
+        self.flights = sorted(self.flights + list(flights),
+                              key=lambda flight: (flight.departs_at, flight.flight_no))
+        self.times = [flight.departs_at for flight in self.flights]
+        self.origins = [flight.departure_from for flight in self.flights]
+
+    def discard(self, flight_nos):
+        self.flights = [flight for flight in self.flights if flight.flight_no not in flight_nos]
+        self.times = [flight.departs_at for flight in self.flights]
+        self.origins = [flight.departure_from for flight in self.flights]
+
+
+class RoutePlanner:
+    """Itinerary search with connections over the whole flight schedule
+
+    The schedule forms a time-expanded graph: each flight is an edge from
+    (departure airport, departs_at) to (arrival airport, arrives_at), and
+    a connection is allowed when the next flight leaves at least
+    min_connection and at most max_layover minutes after the last one
+    lands. The graph is kept as departure-ordered arrays, one for the
+    whole schedule and one per airport, so reaching the first useful
+    flight is a bisect rather than a pass over every flight.
+
+    earliest_arrival() is a connection scan (CSA) over the schedule, and
+    cheapest() a Dijkstra over flights ordered by accumulated fare. With a
+    travel class, flights with no seat available in it are skipped; seat
+    counts are read live from the shared Flight objects, so availability
+    never needs reindexing.
+
+    Fares come from fare(flight, travel_class), the flight's base fare
+    unless the service passes its pricing engine.
+
+    New flights are queued by add() and merged into the sorted lists by
+    the next query, so bulk loads cost one sort, not one insert per
+    flight. All times are on one clock, like departs_at.
+    """
+
+    def __init__(self, min_connection: int = DEFAULT_MIN_CONNECTION,
+                 max_layover: int = DEFAULT_MAX_LAYOVER, fare: Optional[Callable[[Flight, str], int]] = None):
+        self.min_connection = min_connection
+        self.max_layover = max_layover
+        self.fare = fare if fare is not None else Flight.fare_cents
+        self._schedule = _Departures()
+        self._by_airport: Dict[str, _Departures] = {}
+        self._airports = set()
+        self._pending: List[Flight] = []
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def add(self, flight: Flight):
+        """Queue a flight for the next query"""
+        with self._lock:
+            self._pending.append(flight)
+            self._count += 1
+
+    def add_many(self, flights):
+        with self._lock:
+            before = len(self._pending)
+            self._pending.extend(flights)
+            self._count += len(self._pending) - before
+
+    def remove_many(self, flights):
+        """Take flights out of the schedule, e.g. once they are archived"""
+        flight_nos = {flight.flight_no for flight in flights}
+        self._refresh()
+        with self._lock:
+            before = len(self._schedule.flights)
+            self._schedule.discard(flight_nos)
+            for airport in {flight.departure_from for flight in flights}:
+                if airport in self._by_airport:
+                    self._by_airport[airport].discard(flight_nos)
+                    if not self._by_airport[airport].flights:
+                        del self._by_airport[airport]
+            # Only flights the planner held count, and airports no flight serves any more go
+            self._count -= before - len(self._schedule.flights)
+            self._airports = (set(self._schedule.origins)
+                              | {flight.arrival_to for flight in self._schedule.flights})
+
+    def airports(self) -> List[str]:
+        self._refresh()
+        return sorted(self._airports)
+
+    def _refresh(self):
+        """Merge queued flights into the sorted departure lists"""
+        if not self._pending:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, []
+            by_airport: Dict[str, List[Flight]] = {}
+            for flight in pending:
+                by_airport.setdefault(flight.departure_from, []).append(flight)
+                self._airports.add(flight.departure_from)
+                self._airports.add(flight.arrival_to)
+            self._schedule.extend(pending)
+            for airport, flights in by_airport.items():
+                self._by_airport.setdefault(airport, _Departures()).extend(flights)
+
+    def earliest_arrival(self, origin: str, destination: str, depart_after: int,
+                         depart_before: Optional[int] = None, travel_class: str = "",
+                         max_legs: int = DEFAULT_MAX_LEGS) -> Optional[Itinerary]:
+        """Return the itinerary landing at destination soonest
+
+        The first flight must leave origin in [depart_after, depart_before).
+        This is a connection scan: flights are visited once each, in
+        departure order from depart_after. A flight is reached when it
+        leaves origin, or leaves an airport within the connection window
+        of a reached flight landing there, with the fewest legs that can
+        make it. Arrivals wait in a heap per airport and leg count until
+        min_connection has passed; of those, the latest is the one that
+        can still connect when the next flight leaves, so a later landing
+        that makes a connection an earlier one misses is never lost. The
+        scan stops at the first departure after the best arrival at
+        destination, or once no airport reached so far could still
+        connect.
+        """
+        self._refresh()
+        if origin == destination:
+            return None
+        depart_before = _NEVER if depart_before is None else depart_before
+        times, flights, origins = self._schedule.times, self._schedule.flights, self._schedule.origins
+        min_connection, max_layover = self.min_connection, self.max_layover
+
+        # airport -> per leg count (index 0 unused): [heap of (arrives_at, flight index)
+        # not yet connectable, latest connectable (arrives_at, flight index) or None]
+        arrivals: Dict[str, List[Optional[list]]] = {}
+        # flight index -> index of the flight before it, None for the first leg
+        came_by: Dict[int, Optional[int]] = {}
+        best, best_flight, horizon = _NEVER, None, depart_before
+        for i in range(bisect_left(times, depart_after), len(times)):
+            departs_at = times[i]
+            if departs_at >= best or departs_at > horizon:
+                break
+            departure = origins[i]
+            if departure == origin:
+                if departs_at >= depart_before:
+                    continue
+                legs, previous = 0, None
+            else:
+                slots = arrivals.get(departure)
+                if slots is None:
+                    continue
+                for legs in range(1, max_legs):
+                    slot = slots[legs]
+                    if slot is None:
+                        continue
+                    waiting = slot[0]
+                    while waiting and waiting[0][0] + min_connection <= departs_at:
+                        slot[1] = heapq.heappop(waiting)
+                    if slot[1] is not None and departs_at <= slot[1][0] + max_layover:
+                        previous = slot[1][1]
+                        break
+                else:
+                    continue
+            flight = flights[i]
+            arrival = flight.arrival_to
+            if arrival == origin or (legs + 1 == max_legs and arrival != destination):
+                continue
+            if travel_class and flight.available(travel_class) <= 0:
+                continue
+
+            came_by[i] = previous
+            arrives_at = flight.arrives_at
+            if arrival == destination:
+                if arrives_at < best:
+                    best, best_flight = arrives_at, i
+                continue
+            slots = arrivals.get(arrival)
+            if slots is None:
+                slots = arrivals[arrival] = [None] * max_legs
+            if slots[legs + 1] is None:
+                slots[legs + 1] = [[], None]
+            heapq.heappush(slots[legs + 1][0], (arrives_at, i))
+            if arrives_at + max_layover > horizon:
+                horizon = arrives_at + max_layover
+
+        if best_flight is None:
+            return None
+        path, i = [], best_flight
+        while i is not None:
+            path.append(flights[i])
+            i = came_by[i]
+        path.reverse()
+        return self._make_itinerary(path, travel_class)
+
+    def cheapest(self, origin: str, destination: str, depart_after: int, depart_before: int,
+                 travel_class: str = ECONOMY, max_legs: int = DEFAULT_MAX_LEGS) -> Optional[Itinerary]:
+        """Return the lowest-fare itinerary whose first flight leaves origin in [depart_after, depart_before)
+
+        Flights are settled in order of the fare accumulated to reach
+        them, so the first flight landing at destination ends the
+        cheapest itinerary; ties go to the earlier arrival. Labels that
+        already cost more than the best complete itinerary found are not
+        expanded.
+        """
+        self._refresh()
+        travel_class = travel_class or ECONOMY
+        start = self._by_airport.get(origin)
+        if start is None or origin == destination:
+            return None
+
+        queue = []
+        parents: Dict[int, Tuple[Flight, Optional[int]]] = {}
+        best_fare = None
+        fare_of = self.fare
+
+        def push(flight, fare, legs, parent):
+            nonlocal best_fare
+            fare += fare_of(flight, travel_class)
+            if best_fare is not None and fare > best_fare:
+                return
+            if flight.arrival_to == destination and (best_fare is None or fare < best_fare):
+                best_fare = fare
+            label = len(parents)
+            parents[label] = (flight, parent)
+            heapq.heappush(queue, (fare, flight.arrives_at, legs, label))
+
+        for i in range(bisect_left(start.times, depart_after), bisect_left(start.times, depart_before)):
+            flight = start.flights[i]
+            if flight.arrival_to != origin and flight.available(travel_class) > 0:
+                push(flight, 0, 1, None)
+
+        settled = set()
+        while queue:
+            fare, arrives_at, legs, label = heapq.heappop(queue)
+            flight = parents[label][0]
+            if flight.arrival_to == destination:
+                path = []
+                while label is not None:
+                    leg, label = parents[label]
+                    path.append(leg)
+                path.reverse()
+                return self._make_itinerary(path, travel_class)
+            if (flight.flight_no, legs) in settled or legs == max_legs:
+                continue
+            settled.add((flight.flight_no, legs))
+
+            onward = self._by_airport.get(flight.arrival_to)
+            if onward is None:
+                continue
+            lo = bisect_left(onward.times, arrives_at + self.min_connection)
+            hi = bisect_left(onward.times, arrives_at + self.max_layover + 1)
+            for i in range(lo, hi):
+                following = onward.flights[i]
+                if following.arrival_to != origin and following.available(travel_class) > 0:
+                    push(following, fare, legs + 1, label)
+        return None
+
+    def _make_itinerary(self, legs: List[Flight], travel_class: str) -> Itinerary:
+        fare_class = travel_class or ECONOMY
+        return Itinerary(legs, sum(self.fare(flight, fare_class) for flight in legs),
+                         legs[0].departs_at, legs[-1].arrives_at)
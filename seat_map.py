@@ -0,0 +1,209 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Seat letters across a row, with "-" for each aisle
+ECONOMY_LAYOUT = "ABC-DEF"
+BUSINESS_LAYOUT = "AC-DF"
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python before 3.10
+    def popcount(bits: int) -> int:
+        return bin(bits).count("1")
+
+
+def _lowest(bits: int) -> int:
+    """Index of the lowest set bit"""
+    return (bits & -bits).bit_length() - 1
+
+
+class Cabin:
+    """The shape of one cabin: its seat count, the letters across a row, and its first row
+
+    Seat i is bit i of the cabin's bitsets, numbered front to back and
+    left to right, so it sits in row first_row + i // width. A partly
+    filled last row has only its leftmost seats. Cabins are immutable
+    and shared by every flight of the same size (see cabin_for()).
+    """
+
+    def __init__(self, seats: int, layout: str, first_row: int = 1):
+        self.seats = seats
+        self.layout = layout
+        self.letters = layout.replace("-", "")
+        self.width = len(self.letters)
+        self.first_row = first_row
+        self.rows = -(-seats // self.width)
+        self.all_seats = (1 << seats) - 1
+        # Seats across the row at which each block between aisles starts
+        self._block_starts = []
+        offset = 0
+        for block in layout.split("-"):
+            self._block_starts.append(offset)
+            offset += len(block)
+        self._run_starts: Dict[int, Tuple[int, int]] = {}
+
+    def __repr__(self):
+        return f"Cabin({self.seats}, {self.layout!r}, first_row={self.first_row})"
+
+    def __reduce__(self):
+        # Flights sent between processes share the receiver's cabins
+        return cabin_for, (self.seats, self.layout, self.first_row)
+
+    @property
+    def last_row(self) -> int:
+        return self.first_row + self.rows - 1
+
+    def label(self, seat: int) -> str:
+        """Seat label such as '12C'"""
+        return f"{self.first_row + seat // self.width}{self.letters[seat % self.width]}"
+
+    def index(self, label: str) -> Optional[int]:
+        """Seat number of a label in this cabin, or None if the cabin has no such seat"""
+        label = label.strip().upper()
+        row, letter = label[:-1], label[-1:]
+        if not row.isdigit() or not letter or letter not in self.letters:
+            return None
+        seat = (int(row) - self.first_row) * self.width + self.letters.index(letter)
+        return seat if int(row) >= self.first_row and seat < self.seats else None
+
+    def run_starts(self, count: int) -> Tuple[int, int]:
+        """Bitmasks of the seats where count adjacent seats can start
+
+        The first mask keeps the run within one block between aisles,
+        the second only within one row.
+        """
+        starts = self._run_starts.get(count)
+        if starts is None:
+            block_ends = self._block_starts[1:] + [self.width]
+            in_block = in_row = 0
+            for seat in range(self.seats - count + 1):
+                across = seat % self.width
+                if across + count > self.width:
+                    continue
+                in_row |= 1 << seat
+                block = max(i for i, start in enumerate(self._block_starts) if start <= across)
+                if across + count <= block_ends[block]:
+                    in_block |= 1 << seat
+            starts = self._run_starts[count] = (in_block, in_row)
+        return starts
+
+
+@lru_cache(maxsize=None)
+def cabin_for(seats: int, layout: str, first_row: int = 1) -> Cabin:
+    """The shared Cabin of a size, layout and first row"""
+    return Cabin(seats, layout, first_row)
+
+
+class CabinSeats:
+    """Per-seat state of one cabin of one flight, as two bitsets
+
+    A set bit in booked or held marks seat i as sold or held for an
+    unconfirmed booking (see holds.py); a seat in neither is free. So
+    availability is a popcount and finding seats takes a few operations
+    on whole rows of bits at a time, and a cabin costs two ints however
+    many seats it has.
+    """
+
+    __slots__ = ('cabin', 'booked', 'held')
+
+    def __init__(self, cabin: Cabin):
+        self.cabin = cabin
+        self.booked = 0
+        self.held = 0
+
+    def __repr__(self):
+        return f"CabinSeats({self.cabin!r}, available={self.available()})"
+
+    def free(self) -> int:
+        """Bitset of the free seats"""
+        return ~(self.booked | self.held) & self.cabin.all_seats
+
+    def available(self) -> int:
+        return self.cabin.seats - popcount(self.booked | self.held)
+
+    def is_free(self, seat: int) -> bool:
+        return 0 <= seat < self.cabin.seats and not (self.booked | self.held) >> seat & 1
+
+    def first_free(self) -> Optional[int]:
+        free = self.free()
+        return _lowest(free) if free else None
+
+    def find_together(self, count: int) -> Optional[List[int]]:
+        """The first count adjacent free seats in one row, or None
+
+        A run that stays between two aisles is preferred to one that
+        spans an aisle. Bit i of runs is set when seats i to i+count-1
+        are all free, so each candidate start is tested at once.
+        """
+        if not 0 < count <= self.cabin.width:
+            return None
+        free = runs = self.free()
+        for offset in range(1, count):
+            runs &= free >> offset
+        for starts in self.cabin.run_starts(count):
+            hits = runs & starts
+            if hits:
+                start = _lowest(hits)
+                return list(range(start, start + count))
+        return None
+
+    def find_seats(self, count: int) -> Optional[List[int]]:
+        """Seats for a group: together in one row if possible, else the first count free; None if too few"""
+        seats = self.find_together(count)
+        if seats is not None:
+            return seats
+        free, seats = self.free(), []
+        while free and len(seats) < count:
+            lowest = free & -free
+            seats.append(lowest.bit_length() - 1)
+            free ^= lowest
+        return seats if len(seats) == count else None
+
+    def book(self, seat: int):
+        if not self.is_free(seat):
+            raise ValueError(f"Seat {self.cabin.label(seat)} is not free")
+        self.booked |= 1 << seat
+
+    def hold(self, seat: int):
+        if not self.is_free(seat):
+            raise ValueError(f"Seat {self.cabin.label(seat)} is not free")
+        self.held |= 1 << seat
+
+    def unbook(self, seat: int):
+        self.booked &= ~(1 << seat)
+
+    def unhold(self, seat: int):
+        self.held &= ~(1 << seat)
+
+    def set_count(self, state: str, count: int):
+        """Make count seats booked or held, taking the first free seats or giving back the last ones
+
+        For records that carry only counts, such as archived flights.
+        """
+        bits = getattr(self, state)
+        while popcount(bits) > count:
+            bits &= ~(1 << (bits.bit_length() - 1))
+        free = self.free()
+        for _ in range(count - popcount(bits)):
+            if not free:
+                raise ValueError(f"Only {self.cabin.seats} seats in the cabin")
+            lowest = free & -free
+            bits |= lowest
+            free ^= lowest
+        setattr(self, state, bits)
+
+    def chart(self) -> List[str]:
+        """The cabin drawn a row per line: '.' for a free seat, 'X' for a booked or held one"""
+        cabin, taken = self.cabin, self.booked | self.held
+        margin = len(str(cabin.last_row))
+        lines = [" " * (margin + 1) + " ".join(cabin.layout.replace("-", " "))]
+        for row in range(cabin.rows):
+            marks, seat = [], row * cabin.width
+            for letter in cabin.layout:
+                if letter == "-":
+                    marks.append(" ")
+                    continue
+                marks.append(" " if seat >= cabin.seats else "X" if taken >> seat & 1 else ".")
+                seat += 1
+            lines.append(f"{cabin.first_row + row:>{margin}} " + " ".join(marks))
+        return lines
@@ -0,0 +1,343 @@
+"""JSON-over-TCP front-end serving the reservation service to many clients
+
+    python server.py --host 127.0.0.1 --port 8765
+
+Each request is one JSON line ``{"id": 1, "op": "book", "args": {...}}``
+and gets one JSON line back, ``{"id": 1, "ok": true, "result": ...}`` or
+``{"id": 1, "ok": false, "error": "SeatUnavailableError", "message": ...}``.
+A connection must ``login`` before it can search, register, book, cancel
+or join a waitlist.
+
+With --metrics-file or --metrics-port the service is instrumented (see
+metrics.py) and the ``metrics`` operation returns a snapshot. The
+``profile`` operation starts, stops or reports the sampling profiler,
+``{"action": "start"}``; --profile starts it with the server and writes
+its collapsed stacks to a file on shutdown.
+"""
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from history import DEFAULT_ARCHIVE_AFTER_DAYS
+from metrics import SamplingProfiler, instrument
+from pricing import PricingEngine, load_rules
+from records import format_fare
+from reservation_service import ReservationError, ReservationService, ValidationError
+from sharding import ShardCluster
+from storage import DurableStore
+from validation import parse_booking_id
+
+# Longest request line accepted, in bytes
+MAX_LINE = 64 * 1024
+
+# JSON type each known argument must have, checked before an operation runs
+ARG_TYPES = {
+    'flight_no': str, 'passport_no': str, 'travel_class': str, 'seat': str, 'customer_id': str,
+    'name': str, 'address': str, 'telephone': str, 'departure_date': str, 'departure_time': str,
+    'destination': str, 'date_from': str, 'date_to': str, 'booking_id': str, 'action': str,
+    'priority': int, 'top': int,
+}
+
+
+class ProtocolError(Exception):
+    """Raised when a request is malformed or not allowed on the connection"""
+
+
+def flight_result(flight, pricing=None):
+    """Serialise a flight with its current availability and, given a pricing engine, its quoted fares"""
+    result = flight.as_dict()
+    result['economy_available'] = flight.available("economy")
+    result['business_available'] = flight.available("business")
+    if pricing is not None:
+        for travel_class in ("economy", "business"):
+            quote = pricing.quote(flight, travel_class)
+            result[f'{travel_class}_quote'] = format_fare(quote.fare_cents)
+            result[f'{travel_class}_bucket'] = quote.bucket
+    return result
+
+
+def booking_result(booking):
+    return booking.as_dict()
+
+
+class ReservationServer:
+    """Serves the reservation operations over newline-delimited JSON
+
+    Connections are cheap asyncio tasks, so thousands can stay open. Each
+    connection handles one request at a time; the request goes onto a
+    bounded queue drained by `workers` tasks, which run the blocking
+    service calls in a thread pool. When the queue is full a connection
+    waits to enqueue and stops reading its socket, so the kernel buffers
+    fill and slow clients down instead of the server growing without
+    bound. Replies wait for the socket to drain for the same reason.
+    Connections beyond max_connections are refused with an error line.
+    """
+
+    def __init__(self, service: ReservationService, host: str = "127.0.0.1", port: int = 8765,
+                 workers: int = 8, queue_size: int = 1024, max_connections: int = 10000,
+                 profiler: Optional[SamplingProfiler] = None):
+        self.service = service
+        self.profiler = profiler or SamplingProfiler()
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self.connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reservation")
+        self._handlers = {
+            'search': self._search,
+            'register': self._register,
+            'book': self._book,
+            'cancel': self._cancel,
+            'join_waitlist': self._join_waitlist,
+            'metrics': self._metrics,
+            'profile': self._profile,
+        }
+
+    async def start(self):
+        """Start listening; returns once the socket is bound"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  limit=MAX_LINE, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        """Stop accepting connections and shut the workers down"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            handler, args, future = await self._queue.get()
+            try:
+                result = await loop.run_in_executor(self._executor, handler, args)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if self.connections >= self.max_connections:
+            writer.write(self._encode(None, error="ServerBusy", message="Too many connections"))
+            await self._close(writer)
+            return
+
+        self.connections += 1
+        authenticated = False
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(self._encode(None, error="ProtocolError", message="Request too long"))
+                    break
+                if not line:
+                    break
+
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ProtocolError("Request must be a JSON object")
+                    request_id = request.get('id')
+                    op, args = request.get('op'), request.get('args') or {}
+                    if not isinstance(args, dict):
+                        raise ProtocolError("args must be a JSON object")
+                    self._check_types(args)
+
+                    if op == 'login':
+                        authenticated = self.service.authenticate(str(args.get('username', '')),
+                                                                  str(args.get('password', '')))
+                        if not authenticated:
+                            raise ProtocolError("Login failed")
+                        response = self._encode(request_id, result=True)
+                    elif op not in self._handlers:
+                        raise ProtocolError(f"Unknown operation {op!r}")
+                    elif not authenticated:
+                        raise ProtocolError("Please log in first")
+                    else:
+                        future = asyncio.get_running_loop().create_future()
+                        await self._queue.put((self._handlers[op], args, future))
+                        response = self._encode(request_id, result=await future)
+                except json.JSONDecodeError:
+                    response = self._encode(request_id, error="ProtocolError", message="Invalid JSON")
+                except (ReservationError, ProtocolError) as e:
+                    response = self._encode(request_id, error=type(e).__name__, message=str(e))
+                except TypeError as e:
+                    # Missing or unexpected arguments for the operation
+                    response = self._encode(request_id, error="ProtocolError", message=str(e))
+                except Exception as e:
+                    # A bug should fail the request, not drop the connection
+                    response = self._encode(request_id, error="InternalError",
+                                            message=f"{type(e).__name__}: {e}")
+
+                writer.write(response)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            await self._close(writer)
+
+    @staticmethod
+    def _check_types(args):
+        for key, value in args.items():
+            expected = ARG_TYPES.get(key)
+            # bool is an int subclass, but true is never a valid number here
+            if expected is not None and (not isinstance(value, expected) or isinstance(value, bool)):
+                raise ProtocolError(f"{key} must be a JSON {'string' if expected is str else 'integer'}")
+
+    @staticmethod
+    async def _close(writer):
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    @staticmethod
+    def _encode(request_id, result=None, error=None, message=None) -> bytes:
+        if error is None:
+            response = {'id': request_id, 'ok': True, 'result': result}
+        else:
+            response = {'id': request_id, 'ok': False, 'error': error, 'message': message}
+        return json.dumps(response, separators=(',', ':')).encode() + b"\n"
+
+    # Operations, run on the thread pool
+
+    def _search(self, args):
+        return [flight_result(flight, self.service.pricing) for flight in self.service.search(**args)]
+
+    def _register(self, args):
+        return self.service.register(**args).as_dict()
+
+    def _book(self, args):
+        booking = self.service.book(**args)
+        return {'booking_id': booking.booking_id, 'fare': format_fare(booking.fare_cents),
+                'seat': booking.seat_label}
+
+    def _cancel(self, args):
+        booking_no = parse_booking_id(str(args.get('booking_id', '')))
+        if booking_no is None:
+            raise ValidationError("Invalid booking ID. Must be B followed by digits (e.g., B001)")
+        cancellation = self.service.cancel(booking_no)
+        return {'booking_id': cancellation.booking.booking_id,
+                'promoted': [booking.booking_id for booking in cancellation.promoted]}
+
+    def _join_waitlist(self, args):
+        entry = self.service.join_waitlist(**args)
+        return {'entry_id': entry.entry_id, 'position': self.service.waitlist_position(entry.entry_id)}
+
+    def _metrics(self, args):
+        metrics = getattr(self.service, 'metrics', None)
+        if metrics is None:
+            raise ProtocolError("Metrics are off; start the server with --metrics-file or --metrics-port")
+        return metrics.snapshot()
+
+    def _profile(self, args):
+        action = args.get('action', 'status')
+        if action == 'start':
+            self.profiler.start()
+        elif action == 'stop':
+            self.profiler.stop()
+        elif action != 'status':
+            raise ProtocolError("action must be 'start', 'stop' or 'status'")
+        top = args.get('top', 10)
+        if not isinstance(top, int) or top < 0:
+            raise ProtocolError("top must be a non-negative integer")
+        return {'running': self.profiler.running, 'samples': self.profiler.samples,
+                'top': self.profiler.top(top)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the reservation system over JSON/TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data", default="reservation_data", help="directory for the log and snapshots")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=1024)
+    parser.add_argument("--max-connections", type=int, default=10000)
+    parser.add_argument("--fare-rules", help="JSON fare rules file (see pricing.FareRules.to_dict)")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="run flights in this many worker processes (see sharding.py)")
+    parser.add_argument("--archive-after-days", type=int, default=DEFAULT_ARCHIVE_AFTER_DAYS,
+                        help="load lazily, archiving flights that departed this many days ago (see history.py)")
+    parser.add_argument("--metrics-file", help="instrument the service and keep Prometheus text in this file")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                        help="seconds between rewrites of --metrics-file")
+    parser.add_argument("--metrics-port", type=int,
+                        help="instrument the service and serve /metrics on this local port")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="run the sampling profiler from the start and write collapsed stacks here on exit")
+    args = parser.parse_args(argv)
+    if args.shards > 1 and (args.metrics_file or args.metrics_port is not None):
+        parser.error("metrics are collected in the serving process; they need --shards 1")
+
+    rules = load_rules(args.fare_rules) if args.fare_rules else None
+    if args.shards > 1:
+        cluster = ShardCluster(args.shards, args.data, rules, args.archive_after_days)
+        service = cluster.start()
+        stop = cluster.stop
+    else:
+        service = ReservationService(DurableStore(args.data, archive_after_days=args.archive_after_days),
+                                     pricing=PricingEngine(rules))
+        stop = service.close
+    if not service.flight_count() and not service.archived_flight_count():
+        service.initialize_default_flights()
+
+    metrics = metrics_file_stop = metrics_server = None
+    if args.metrics_file or args.metrics_port is not None:
+        metrics = instrument(service)
+        if args.metrics_file:
+            metrics_file_stop = metrics.write_every(args.metrics_file, args.metrics_interval)
+        if args.metrics_port is not None:
+            metrics_server = metrics.serve(args.metrics_port)
+            print(f"Metrics on http://127.0.0.1:{metrics_server.server_address[1]}/metrics")
+    profiler = SamplingProfiler()
+    if args.profile:
+        profiler.start()
+
+    server = ReservationServer(service, args.host, args.port, workers=args.workers,
+                               queue_size=args.queue_size, max_connections=args.max_connections,
+                               profiler=profiler)
+    print(f"Serving on {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        profiler.stop()
+        if args.profile:
+            profiler.write_collapsed(args.profile)
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        stop()
+        if metrics_file_stop is not None:
+            metrics_file_stop.set()
+            metrics.write_prometheus(args.metrics_file)
+
+
+if __name__ == "__main__":
+    main()
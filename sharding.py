@@ -0,0 +1,565 @@
+"""Run the reservation service as several worker processes, one shard each
+
+    cluster = ShardCluster(4, data_dir="reservation_data")
+    service = cluster.start()          # a ShardRouter
+    service.book("JFK001", "P123", "economy")
+    cluster.stop()
+
+Flights, with their inventory, bookings and waitlists, are partitioned
+by a stable hash of flight_no, so every booking is handled entirely by
+one shard's process and shards never coordinate. Customers are
+replicated to every shard. Searches and listings that span flights fan
+out to all the shards and merge their already-sorted results.
+"""
+import heapq
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import zlib
+from collections import defaultdict
+from itertools import islice
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pricing import FareRules, PricingEngine
+from records import Booking, Customer, Flight
+from reporting import BookingPage
+from reservation_service import (BatchBookingError, BatchBookingResult, ReservationError, ReservationService,
+                                 ValidationError)
+from storage import DurableStore
+
+# ReservationService methods a shard serves; the router decides which shard
+SHARD_OPERATIONS = frozenset((
+    "authenticate", "create_flight", "import_flights", "register", "import_customers", "search",
+    "get_flight", "get_customer", "find_customer", "flight_count", "archived_flight_count",
+    "customer_count", "booking_count",
+    "quote", "quote_fare", "hold_seat", "confirm_hold", "release_hold", "book", "book_many",
+    "get_booking", "cancel", "join_waitlist", "leave_waitlist", "waitlist_position", "list_bookings",
+    "page_bookings", "bookings_by_date", "set_fare_rules", "reprice_all", "checkpoint",
+))
+
+_SHUTDOWN = "shutdown"
+# Runs a list of (op, args, kwargs) requests in order and replies with every (ok, result)
+_BATCH = "batch"
+
+# Connections a router keeps open per shard between calls; any more are closed
+MAX_IDLE_CONNECTIONS = 16
+
+
+def shard_for(flight_no: str, shards: int) -> int:
+    """Shard owning a flight; CRC32 is stable across processes, unlike hash()"""
+    return zlib.crc32(flight_no.encode()) % shards
+
+
+def shard_of_number(number: int, shards: int) -> int:
+    """Shard that issued a booking number, waitlist entry ID or hold ID"""
+    return (number - 1) % shards
+
+
+def _run_operation(service, op, args, kwargs) -> Tuple[bool, object]:
+    try:
+        if op not in SHARD_OPERATIONS:
+            raise ValidationError(f"Unknown shard operation {op!r}")
+        return True, getattr(service, op)(*args, **kwargs)
+    except Exception as e:
+        return False, e
+
+
+def _serve_connection(service, conn, stop, address, authkey):
+    """Answer (op, args, kwargs) requests on one router connection until it closes"""
+    with conn:
+        while True:
+            try:
+                op, args, kwargs = conn.recv()
+            except (EOFError, OSError):
+                return
+            if op == _SHUTDOWN:
+                stop.set()
+                conn.send((True, None))
+                # Wake the accept loop so it sees the stop flag
+                Client(address, authkey=authkey).close()
+                return
+            if op == _BATCH:
+                reply = (True, [_run_operation(service, *request) for request in args])
+            else:
+                reply = _run_operation(service, op, args, kwargs)
+            try:
+                conn.send(reply)
+            except Exception as e:
+                # The result or error could not be pickled
+                conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+def run_shard(index: int, count: int, data_dir: Optional[str], rules: Optional[FareRules],
+              authkey: bytes, ready, archive_after_days: Optional[int] = None):
+    """Entry point of a shard process: load the shard, then serve routers until shut down
+
+    The listening address is sent back through ready once the shard's
+    saved state is loaded. Each router connection gets a thread; the
+    service is as thread-safe here as in a single process.
+
+    Ctrl-C reaches every process in the terminal's group; shards ignore
+    it and wait for the parent to shut them down, so no store is left
+    half-written.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    store = (DurableStore(os.path.join(data_dir, f"shard-{index}"), archive_after_days=archive_after_days)
+             if data_dir else None)
+    service = ReservationService(store, pricing=PricingEngine(rules), shard=(index, count))
+    listener = Listener(authkey=authkey)
+    ready.send(listener.address)
+    ready.close()
+    stop = threading.Event()
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, OSError):
+                # A client with the wrong key, or one that went away mid-handshake
+                continue
+            if stop.is_set():
+                conn.close()
+                break
+            threading.Thread(target=_serve_connection, args=(service, conn, stop, listener.address, authkey),
+                             daemon=True).start()
+    finally:
+        listener.close()
+        service.close()
+
+
+class ShardRouter:
+    """ReservationService API in front of a set of shard processes
+
+    Single-flight operations go to the flight's shard, and booking and
+    waitlist operations to the shard encoded in their number. Customers
+    register on shard 0 first, which checks IDs and passports for
+    uniqueness for the whole cluster, and are then copied to the other
+    shards in parallel. Searches and listings are sent to every shard at
+    once and their sorted results merged.
+
+    Results are copies: a Flight or Booking returned here is a snapshot
+    of the shard's record, not a live object.
+
+    A router is thread-safe and keeps a pool of connections per shard, so
+    concurrent callers do not queue behind one another. At most max_idle
+    of them per shard stay open between calls. Any process that knows the
+    addresses and authkey can open its own router.
+    """
+
+    def __init__(self, addresses: Sequence, authkey: bytes, rules: Optional[FareRules] = None,
+                 max_idle: int = MAX_IDLE_CONNECTIONS):
+        self.addresses = list(addresses)
+        self.authkey = authkey
+        self.shards = len(self.addresses)
+        # Quotes search results the way the shards price them
+        self.pricing = PricingEngine(rules)
+        self.max_idle = max_idle
+        self._idle: List[List] = [[] for _ in self.addresses]
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Close the router's connections; the shards keep running"""
+        with self._lock:
+            idle, self._idle = self._idle, [[] for _ in self.addresses]
+        for conn in itertools.chain.from_iterable(idle):
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Transport
+    # ------------------------------------------------------------------
+
+    def _acquire(self, shard):
+        with self._lock:
+            if self._idle[shard]:
+                return self._idle[shard].pop()
+        return Client(self.addresses[shard], authkey=self.authkey)
+
+    def _release(self, shard, conn):
+        with self._lock:
+            if len(self._idle[shard]) < self.max_idle:
+                self._idle[shard].append(conn)
+                return
+        conn.close()
+
+    def _scatter(self, calls) -> List[Tuple[bool, object]]:
+        """Send (shard, op, args, kwargs) calls, then collect every (ok, result) in order
+
+        All the requests are sent before any reply is read, so the shards
+        work on them in parallel.
+        """
+        conns = []
+        try:
+            for shard, op, args, kwargs in calls:
+                conn = self._acquire(shard)
+                conns.append((shard, conn))
+                conn.send((op, args, kwargs))
+            replies = [conn.recv() for _, conn in conns]
+        except BaseException:
+            # A connection may be half-way through a request; never reuse it
+            for _, conn in conns:
+                conn.close()
+            raise
+        for shard, conn in conns:
+            self._release(shard, conn)
+        return replies
+
+    def _scatter_batched(self, calls) -> List[Tuple[bool, object]]:
+        """Like _scatter(), but each shard's calls go as one batch over one connection
+
+        A shard runs its batch in order, so the calls for one shard are
+        not parallel with each other, only with the other shards' batches.
+        """
+        batches = defaultdict(list)
+        for position, (shard, op, args, kwargs) in enumerate(calls):
+            batches[shard].append((position, (op, args, kwargs)))
+        shards = list(batches)
+        results = self._scatter([(shard, _BATCH, [request for _, request in batches[shard]], {})
+                                 for shard in shards])
+        replies: List[Tuple[bool, object]] = [None] * len(calls)
+        for shard, (ok, result) in zip(shards, results):
+            if not ok:
+                raise result
+            for (position, _), reply in zip(batches[shard], result):
+                replies[position] = reply
+        return replies
+
+    def _call(self, shard: int, op: str, *args, **kwargs):
+        ok, result = self._scatter([(shard, op, args, kwargs)])[0]
+        if not ok:
+            raise result
+        return result
+
+    def _call_all(self, op: str, *args, **kwargs) -> list:
+        """Run the same call on every shard, raising the first error after all have replied"""
+        replies = self._scatter([(shard, op, args, kwargs) for shard in range(self.shards)])
+        for ok, result in replies:
+            if not ok:
+                raise result
+        return [result for _, result in replies]
+
+    def shutdown(self):
+        """Stop every shard process, letting each close its store"""
+        for shard in range(self.shards):
+            conn = self._acquire(shard)
+            try:
+                conn.send((_SHUTDOWN, (), {}))
+                conn.recv()
+            except (EOFError, OSError):
+                pass
+            finally:
+                conn.close()
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Catalog
+    # ------------------------------------------------------------------
+
+    def authenticate(self, username: str, password: str) -> bool:
+        return self._call(0, "authenticate", username, password)
+
+    # Creates the default flights through create_flight(), so each lands on its shard
+    initialize_default_flights = ReservationService.initialize_default_flights
+
+    def create_flight(self, flight_no: str, *args, **kwargs) -> Flight:
+        return self._call(shard_for(flight_no, self.shards), "create_flight", flight_no, *args, **kwargs)
+
+    def import_flights(self, flights: List[Flight]) -> List[Tuple[Flight, str]]:
+        """Import validated flights, each batch on its own shard in parallel"""
+        batches = defaultdict(list)
+        for flight in flights:
+            batches[shard_for(flight.flight_no, self.shards)].append(flight)
+        rejected = []
+        for ok, result in self._scatter([(shard, "import_flights", (batch,), {})
+                                         for shard, batch in batches.items()]):
+            if not ok:
+                raise result
+            rejected.extend(result)
+        return rejected
+
+    def register(self, *args, **kwargs) -> Customer:
+        """Register a customer on shard 0, which checks uniqueness, then on every other shard"""
+        customer = self._call(0, "register", *args, **kwargs)
+        self._replicate([customer])
+        return customer
+
+    def import_customers(self, customers: List[Customer]) -> List[Tuple[Customer, str]]:
+        """Import validated customers through shard 0, then copy the accepted ones to every other shard"""
+        customers = list(customers)
+        rejected = self._call(0, "import_customers", customers)
+        # Rejections come back as copies, in input order; walk both lists to find the accepted ones
+        accepted, pending = [], iter(rejected)
+        next_rejected = next(pending, None)
+        for customer in customers:
+            if next_rejected is not None and customer.to_row() == next_rejected[0].to_row():
+                next_rejected = next(pending, None)
+            else:
+                accepted.append(customer)
+        if accepted:
+            self._replicate(accepted)
+        return rejected
+
+    def _replicate(self, customers: List[Customer]):
+        replies = self._scatter([(shard, "import_customers", (customers,), {})
+                                 for shard in range(1, self.shards)])
+        for ok, result in replies:
+            if not ok:
+                raise result
+            if result:
+                raise RuntimeError(f"Shards disagree about customer {result[0][0].customer_id}: {result[0][1]}")
+
+    def get_flight(self, flight_no: str) -> Optional[Flight]:
+        return self._call(shard_for(flight_no, self.shards), "get_flight", flight_no)
+
+    def get_customer(self, customer_id: str) -> Optional[Customer]:
+        return self._call(shard_for(customer_id, self.shards), "get_customer", customer_id)
+
+    def find_customer(self, passport_no: str) -> Optional[Customer]:
+        return self._call(shard_for(passport_no, self.shards), "find_customer", passport_no)
+
+    def flight_count(self) -> int:
+        return sum(self._call_all("flight_count"))
+
+    def archived_flight_count(self) -> int:
+        return sum(self._call_all("archived_flight_count"))
+
+    def customer_count(self) -> int:
+        return self._call(0, "customer_count")
+
+    def booking_count(self) -> int:
+        return sum(self._call_all("booking_count"))
+
+    def search(self, **criteria) -> List[Flight]:
+        """Search every shard and merge the results, ordered by departure"""
+        results = self._call_all("search", **criteria)
+        return list(heapq.merge(*results, key=lambda flight: (flight.departs_at, flight.flight_no)))
+
+    # ------------------------------------------------------------------
+    # Bookings
+    # ------------------------------------------------------------------
+
+    def quote(self, flight_no: str, passport_no: str, travel_class: str):
+        return self._call(shard_for(flight_no, self.shards), "quote", flight_no, passport_no, travel_class)
+
+    def quote_fare(self, flight: Flight, travel_class: str):
+        """Quote a fare from a flight snapshot; the shard prices its live record the same way"""
+        return self.pricing.quote(flight, travel_class)
+
+    def plan_trip(self, *args, **kwargs):
+        raise ValidationError("Trip planning needs the whole schedule in one process; "
+                              "it is not available on a sharded cluster")
+
+    def hold_seat(self, flight_no: str, *args, **kwargs):
+        return self._call(shard_for(flight_no, self.shards), "hold_seat", flight_no, *args, **kwargs)
+
+    def confirm_hold(self, hold_id: int) -> Booking:
+        return self._call(shard_of_number(hold_id, self.shards), "confirm_hold", hold_id)
+
+    def release_hold(self, hold_id: int) -> bool:
+        return self._call(shard_of_number(hold_id, self.shards), "release_hold", hold_id)
+
+    def book(self, flight_no: str, passport_no: str, travel_class: str, seat: str = "") -> Booking:
+        return self._call(shard_for(flight_no, self.shards), "book", flight_no, passport_no, travel_class, seat)
+
+    def book_many(self, requests, all_or_nothing: bool = True) -> BatchBookingResult:
+        """Book a group across shards
+
+        A group on one shard, or one booked while seats last, is sent as
+        each shard's part of book_many(), in parallel. An all-or-nothing
+        group spanning shards is booked in two phases instead. First
+        every seat is held with hold_seat(). If any hold fails, the
+        others are released and BatchBookingError is raised, so no seat
+        was ever sold. Otherwise every hold is confirmed. Only a hold
+        lost between the phases, such as one that expired, makes the
+        group fail after some seats were confirmed; those bookings are
+        cancelled again.
+
+        Each phase sends every shard its part as one batch over one
+        connection. Held seats are taken one request at a time, so a
+        group spread over shards is not seated together the way
+        book_many() seats a group on one shard.
+        """
+        requests = list(requests)
+        parts = defaultdict(list)
+        for index, request in enumerate(requests):
+            parts[shard_for(request[0], self.shards)].append(index)
+        shards = list(parts)
+        if all_or_nothing and len(shards) > 1:
+            return self._book_many_held(requests)
+        replies = self._scatter([(shard, "book_many", ([requests[i] for i in parts[shard]], all_or_nothing), {})
+                                 for shard in shards])
+
+        bookings, failures = [], []
+        for shard, (ok, result) in zip(shards, replies):
+            indexes = parts[shard]
+            if ok:
+                bookings.extend(result.bookings)
+                failures.extend((indexes[i], request, message) for i, request, message in result.failures)
+            elif isinstance(result, BatchBookingError):
+                failures.extend((indexes[i], request, message) for i, request, message in result.failures)
+            else:
+                raise result
+        if failures and all_or_nothing:
+            raise BatchBookingError(sorted(failures, key=lambda failure: failure[0]))
+        return BatchBookingResult(sorted(bookings, key=lambda booking: booking.booking_no),
+                                  sorted(failures, key=lambda failure: failure[0]))
+
+    def _book_many_held(self, requests) -> BatchBookingResult:
+        """All-or-nothing book_many() across shards: hold every seat, then confirm every hold"""
+        replies = self._scatter_batched([(shard_for(request[0], self.shards), "hold_seat", tuple(request), {})
+                                          for request in requests])
+        holds = [result for ok, result in replies if ok]
+        errors = [(index, request, result) for index, (request, (ok, result)) in enumerate(zip(requests, replies))
+                  if not ok]
+        if errors:
+            self._release_holds(holds)
+            for _, _, error in errors:
+                if not isinstance(error, ReservationError):
+                    raise error
+            raise BatchBookingError([(index, request, str(error)) for index, request, error in errors])
+
+        replies = self._scatter_batched([(shard_of_number(hold.hold_id, self.shards), "confirm_hold",
+                                          (hold.hold_id,), {}) for hold in holds])
+        bookings = [result for ok, result in replies if ok]
+        errors = [(index, request, result) for index, (request, (ok, result)) in enumerate(zip(requests, replies))
+                  if not ok]
+        if errors:
+            # A hold lost between the phases; undo what was confirmed and give back what was not
+            for booking in bookings:
+                self.cancel(booking.booking_no)
+            self._release_holds([hold for hold, (ok, _) in zip(holds, replies) if not ok])
+            for _, _, error in errors:
+                if not isinstance(error, ReservationError):
+                    raise error
+            raise BatchBookingError([(index, request, str(error)) for index, request, error in errors])
+        return BatchBookingResult(sorted(bookings, key=lambda booking: booking.booking_no), [])
+
+    def _release_holds(self, holds):
+        self._scatter_batched([(shard_of_number(hold.hold_id, self.shards), "release_hold", (hold.hold_id,), {})
+                               for hold in holds])
+
+    def get_booking(self, booking_no: int) -> Optional[Booking]:
+        return self._call(shard_of_number(booking_no, self.shards), "get_booking", booking_no)
+
+    def cancel(self, booking_no: int):
+        return self._call(shard_of_number(booking_no, self.shards), "cancel", booking_no)
+
+    def join_waitlist(self, flight_no: str, *args, **kwargs):
+        return self._call(shard_for(flight_no, self.shards), "join_waitlist", flight_no, *args, **kwargs)
+
+    def leave_waitlist(self, entry_id: int):
+        return self._call(shard_of_number(entry_id, self.shards), "leave_waitlist", entry_id)
+
+    def waitlist_position(self, entry_id: int) -> Optional[int]:
+        return self._call(shard_of_number(entry_id, self.shards), "waitlist_position", entry_id)
+
+    def list_bookings(self, departure_date: str = "", flight_no: str = "") -> List[Booking]:
+        """Return bookings in booking number order, from the flight's shard or from all of them"""
+        if flight_no:
+            return self._call(shard_for(flight_no, self.shards), "list_bookings", departure_date, flight_no)
+        results = self._call_all("list_bookings", departure_date)
+        return sorted(itertools.chain.from_iterable(results), key=lambda booking: booking.booking_no)
+
+    def page_bookings(self, departure_date: str = "", flight_no: str = "",
+                      cursor: Optional[int] = None, limit: int = 50) -> BookingPage:
+        """Return one page in booking number order, from the flight's shard or merged from all of them
+
+        The cursor is a booking number, which every shard pages by, so
+        each shard returns its next limit bookings and the merge keeps
+        the lowest limit of them.
+        """
+        if flight_no:
+            return self._call(shard_for(flight_no, self.shards), "page_bookings",
+                              departure_date, flight_no, cursor, limit)
+        pages = self._call_all("page_bookings", departure_date, "", cursor, limit)
+        bookings = list(islice(heapq.merge(*(page.bookings for page in pages),
+                                           key=lambda booking: booking.booking_no), limit))
+        more = (sum(len(page.bookings) for page in pages) > limit
+                or any(page.next_cursor is not None for page in pages))
+        return BookingPage(bookings, bookings[-1].booking_no if more else None)
+
+    def bookings_by_date(self) -> Dict[str, List[Booking]]:
+        merged = defaultdict(list)
+        for result in self._call_all("bookings_by_date"):
+            for date, bookings in result.items():
+                merged[date].extend(bookings)
+        return {date: sorted(merged[date], key=lambda booking: booking.booking_no) for date in sorted(merged)}
+
+    # ------------------------------------------------------------------
+    # Pricing and persistence
+    # ------------------------------------------------------------------
+
+    def set_fare_rules(self, rules: FareRules):
+        """Switch every shard to new fare rules and return the repriced fares of every flight"""
+        self.pricing.set_rules(rules)
+        return list(itertools.chain.from_iterable(self._call_all("set_fare_rules", rules)))
+
+    def reprice_all(self):
+        return list(itertools.chain.from_iterable(self._call_all("reprice_all")))
+
+    def checkpoint(self):
+        self._call_all("checkpoint")
+
+
+class ShardCluster:
+    """Starts and stops the shard processes of one sharded deployment
+
+    With data_dir, shard i keeps its log and snapshots in
+    data_dir/shard-i, so the same number of shards must be used on every
+    restart: flights are placed by flight_no modulo the shard count.
+    archive_after_days makes each shard's store load lazily (see
+    storage.DurableStore).
+    """
+
+    def __init__(self, shards: int, data_dir: Optional[str] = None, rules: Optional[FareRules] = None,
+                 archive_after_days: Optional[int] = None):
+        if shards < 1:
+            raise ValueError("A cluster needs at least one shard")
+        self.shards = shards
+        self.data_dir = data_dir
+        self.rules = rules
+        self.archive_after_days = archive_after_days
+        self.authkey = os.urandom(16)
+        self.addresses: List = []
+        self._processes = []
+        self._router: Optional[ShardRouter] = None
+
+    def start(self) -> ShardRouter:
+        """Start the shard processes, wait until each has loaded its state, and return a router"""
+        context = multiprocessing.get_context("spawn")
+        pipes = []
+        for index in range(self.shards):
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=run_shard, name=f"shard-{index}", daemon=True,
+                                      args=(index, self.shards, self.data_dir, self.rules, self.authkey, sender,
+                                            self.archive_after_days))
+            process.start()
+            sender.close()
+            self._processes.append(process)
+            pipes.append(receiver)
+        self.addresses = [receiver.recv() for receiver in pipes]
+        for receiver in pipes:
+            receiver.close()
+        self._router = self.router()
+        return self._router
+
+    def router(self) -> ShardRouter:
+        """Open another router onto the running shards"""
+        return ShardRouter(self.addresses, self.authkey, self.rules)
+
+    def stop(self):
+        """Shut the shards down cleanly and wait for their processes to exit"""
+        if self._router is not None:
+            self._router.shutdown()
+            self._router = None
+        for process in self._processes:
+            process.join()
+        self._processes = []
+
+    def __enter__(self) -> ShardRouter:
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
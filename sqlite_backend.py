@@ -0,0 +1,431 @@
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterator, List, Optional
+
+from records import Booking, Customer, Flight
+from reporting import BookingPage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flights (
+    flight_no TEXT PRIMARY KEY,
+    departure_from TEXT NOT NULL,
+    arrival_to TEXT NOT NULL,
+    departure_date TEXT NOT NULL,
+    departure_time TEXT NOT NULL,
+    economy_seats INTEGER NOT NULL,
+    business_seats INTEGER NOT NULL,
+    economy_fare_cents INTEGER NOT NULL,
+    business_fare_cents INTEGER NOT NULL,
+    economy_booked INTEGER NOT NULL DEFAULT 0,
+    business_booked INTEGER NOT NULL DEFAULT 0,
+    economy_held INTEGER NOT NULL DEFAULT 0,
+    business_held INTEGER NOT NULL DEFAULT 0,
+    duration_minutes INTEGER
+);
+CREATE INDEX IF NOT EXISTS flights_departure ON flights (departure_date, departure_time);
+CREATE INDEX IF NOT EXISTS flights_destination ON flights (arrival_to, departure_date, departure_time);
+CREATE INDEX IF NOT EXISTS flights_time ON flights (departure_time, departure_date);
+
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    passport_no TEXT NOT NULL UNIQUE,
+    address TEXT NOT NULL,
+    telephone TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    booking_no INTEGER PRIMARY KEY,
+    flight_no TEXT NOT NULL REFERENCES flights (flight_no),
+    customer_id TEXT NOT NULL REFERENCES customers (customer_id),
+    travel_class TEXT NOT NULL,
+    fare_cents INTEGER NOT NULL,
+    booked_at INTEGER NOT NULL,
+    seat INTEGER
+);
+CREATE INDEX IF NOT EXISTS bookings_flight ON bookings (flight_no, booking_no);
+
+CREATE TABLE IF NOT EXISTS cancelled_bookings (
+    booking_no INTEGER PRIMARY KEY,
+    flight_no TEXT NOT NULL,
+    customer_id TEXT NOT NULL,
+    travel_class TEXT NOT NULL,
+    fare_cents INTEGER NOT NULL,
+    booked_at INTEGER NOT NULL,
+    seat INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS waitlist (
+    entry_id INTEGER PRIMARY KEY,
+    flight_no TEXT NOT NULL REFERENCES flights (flight_no),
+    customer_id TEXT NOT NULL REFERENCES customers (customer_id),
+    travel_class TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    requested_at INTEGER NOT NULL
+);
+"""
+
+FLIGHT_COLUMNS = ("flight_no, departure_from, arrival_to, departure_date, departure_time, "
+                  "economy_seats, business_seats, economy_fare_cents, business_fare_cents, "
+                  "economy_booked, business_booked, economy_held, business_held, duration_minutes")
+FLIGHT_INSERT = f"INSERT INTO flights ({FLIGHT_COLUMNS}) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
+BOOKING_INSERT = "INSERT INTO bookings VALUES (?,?,?,?,?,?,?)"
+
+BOOKING_QUERY = (
+    "SELECT b.booking_no, b.travel_class, b.fare_cents, b.booked_at, b.seat, "
+    "c.customer_id, c.name, c.passport_no, c.address, c.telephone, "
+    + ", ".join(f"f.{column.strip()}" for column in FLIGHT_COLUMNS.split(",")) +
+    " FROM bookings b JOIN flights f ON f.flight_no = b.flight_no"
+    " JOIN customers c ON c.customer_id = b.customer_id"
+)
+
+
+def _flight_values(flight: Flight):
+    """Column values of a flight in FLIGHT_COLUMNS order"""
+    return (*flight.to_row()[:9], flight.economy_booked, flight.business_booked,
+            flight.economy_held, flight.business_held, flight.duration_minutes)
+
+
+class SQLiteBackend:
+    """Storage backend on the stdlib sqlite3 module
+
+    One connection is opened in WAL mode and reused for every call, guarded
+    by a lock so worker threads can share it. All statements are constant
+    parameterised SQL, so sqlite3's statement cache prepares each one once.
+    Searches and the per-date booking listing run as indexed queries.
+
+    Flight objects are kept in an identity map so bookings and callers
+    share one instance per flight, and its seat map stays current. A
+    flight's seat map is rebuilt from its bookings' seats when it is
+    first read; the counter columns mirror it for the search query.
+    """
+
+    def __init__(self, path: str = ":memory:", synchronous: str = "NORMAL"):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     cached_statements=128)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(flights)")}
+        if "duration_minutes" not in columns:
+            # Databases created before flights had a duration
+            self._conn.execute("ALTER TABLE flights ADD COLUMN duration_minutes INTEGER")
+        for table in ("bookings", "cancelled_bookings"):
+            if "seat" not in {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}:
+                # Databases created before bookings had seats
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN seat INTEGER")
+        # Seat holds live only as long as the process that placed them
+        self._conn.execute("UPDATE flights SET economy_held = 0, business_held = 0")
+        self._flights: Dict[str, Flight] = {}
+        # Reading a flight seats its unseated bookings, so no booking is read without a seat
+        for (flight_no,) in self._conn.execute("SELECT DISTINCT flight_no FROM bookings "
+                                               "WHERE seat IS NULL").fetchall():
+            self.get_flight(flight_no)
+
+    def _flight_from_row(self, row) -> Flight:
+        """Return the shared Flight for a row, building its seat map on first read"""
+        flight = self._flights.get(row[0])
+        if flight is None:
+            flight = Flight(*row[:9], duration_minutes=row[13])
+            unseated = []
+            for booking_no, travel_class, seat in self._conn.execute(
+                    "SELECT booking_no, travel_class, seat FROM bookings WHERE flight_no = ? "
+                    "ORDER BY booking_no", (flight.flight_no,)).fetchall():
+                if seat is None:
+                    unseated.append((booking_no, travel_class))
+                else:
+                    flight.book_seat(travel_class, seat)
+            if unseated:
+                self._conn.executemany("UPDATE bookings SET seat = ? WHERE booking_no = ?",
+                                       [(flight.book_seat(travel_class), booking_no)
+                                        for booking_no, travel_class in unseated])
+            self._flights[flight.flight_no] = flight
+        return flight
+
+    def _book_seats(self, bookings: List[Booking]):
+        """Mark the seats of bookings about to be inserted, first free ones for those without"""
+        for booking in bookings:
+            booking.seat = booking.flight.book_seat(booking.travel_class, booking.seat)
+
+    def _free_seats(self, bookings: List[Booking]):
+        for booking in bookings:
+            booking.flight.free_seat(booking.travel_class, booking.seat)
+
+    def _transaction(self, sql, rows):
+        """Run one statement for many rows inside a single transaction"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(sql, rows)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    # Flights
+
+    def add_flight(self, flight: Flight):
+        with self._lock:
+            self._conn.execute(FLIGHT_INSERT, _flight_values(flight))
+            self._flights[flight.flight_no] = flight
+
+    def add_flights(self, flights: List[Flight]):
+        """Insert a batch of flights in one transaction"""
+        with self._lock:
+            self._transaction(FLIGHT_INSERT, [_flight_values(flight) for flight in flights])
+            for flight in flights:
+                self._flights[flight.flight_no] = flight
+
+    def get_flight(self, flight_no: str) -> Optional[Flight]:
+        with self._lock:
+            flight = self._flights.get(flight_no)
+            if flight is not None:
+                return flight
+            row = self._conn.execute(f"SELECT {FLIGHT_COLUMNS} FROM flights WHERE flight_no = ?",
+                                     (flight_no,)).fetchone()
+            return self._flight_from_row(row) if row else None
+
+    def iter_flights(self) -> Iterator[Flight]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {FLIGHT_COLUMNS} FROM flights ORDER BY rowid").fetchall()
+            return iter([self._flight_from_row(row) for row in rows])
+
+    def flight_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM flights").fetchone()[0]
+
+    def search(self, departure_date: str = "", departure_time: str = "", destination: str = "",
+               travel_class: str = "", date_from: str = "", date_to: str = "") -> List[Flight]:
+        """Run the search filters as one indexed query, ordered by departure"""
+        clauses, params = [], []
+        if departure_date:
+            clauses.append("departure_date = ?")
+            params.append(departure_date)
+        if date_from:
+            clauses.append("departure_date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("departure_date <= ?")
+            params.append(date_to)
+        if departure_time:
+            clauses.append("departure_time = ?")
+            params.append(departure_time)
+        if destination:
+            clauses.append("arrival_to = ?")
+            params.append(destination)
+        if travel_class == "economy":
+            clauses.append("economy_booked + economy_held < economy_seats")
+        elif travel_class == "business":
+            clauses.append("business_booked + business_held < business_seats")
+
+        sql = f"SELECT {FLIGHT_COLUMNS} FROM flights"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY departure_date, departure_time, flight_no"
+        with self._lock:
+            return [self._flight_from_row(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def update_availability(self, flight: Flight):
+        """Write a flight's seat counts, popcounts of its seat map, back to its row"""
+        with self._lock:
+            self._conn.execute("UPDATE flights SET economy_booked = ?, business_booked = ?, "
+                               "economy_held = ?, business_held = ? WHERE flight_no = ?",
+                               (flight.economy_booked, flight.business_booked,
+                                flight.economy_held, flight.business_held, flight.flight_no))
+
+    # Customers
+
+    def add_customer(self, customer: Customer):
+        with self._lock:
+            self._conn.execute("INSERT INTO customers VALUES (?,?,?,?,?)", customer.to_row())
+
+    def add_customers(self, customers: List[Customer]):
+        """Insert a batch of customers in one transaction"""
+        with self._lock:
+            self._transaction("INSERT INTO customers VALUES (?,?,?,?,?)",
+                              [customer.to_row() for customer in customers])
+
+    def get_customer(self, customer_id: str) -> Optional[Customer]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM customers WHERE customer_id = ?",
+                                     (customer_id,)).fetchone()
+        return Customer(*row) if row else None
+
+    def find_customer(self, passport_no: str) -> Optional[Customer]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM customers WHERE passport_no = ?",
+                                     (passport_no,)).fetchone()
+        return Customer(*row) if row else None
+
+    def iter_customers(self) -> Iterator[Customer]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM customers ORDER BY rowid").fetchall()
+        return (Customer(*row) for row in rows)
+
+    def customer_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+
+    # Bookings
+
+    def add_booking(self, booking: Booking):
+        """Insert a booking and count its seat against the flight in one transaction"""
+        column = "economy_booked" if booking.travel_class == "economy" else "business_booked"
+        with self._lock:
+            self._book_seats([booking])
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(BOOKING_INSERT, booking.to_row())
+                self._conn.execute(f"UPDATE flights SET {column} = {column} + 1 WHERE flight_no = ?",
+                                   (booking.flight.flight_no,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._free_seats([booking])
+                raise
+
+    def add_bookings(self, bookings: List[Booking]):
+        """Insert a batch of bookings and their seat counts in one transaction"""
+        booked = Counter((booking.flight, booking.travel_class) for booking in bookings)
+        with self._lock:
+            self._book_seats(bookings)
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(BOOKING_INSERT, [booking.to_row() for booking in bookings])
+                for (flight, travel_class), count in booked.items():
+                    column = "economy_booked" if travel_class == "economy" else "business_booked"
+                    self._conn.execute(f"UPDATE flights SET {column} = {column} + ? WHERE flight_no = ?",
+                                       (count, flight.flight_no))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._free_seats(bookings)
+                raise
+
+    def get_booking(self, booking_no: int) -> Optional[Booking]:
+        with self._lock:
+            rows = self._conn.execute(BOOKING_QUERY + " WHERE b.booking_no = ?", (booking_no,)).fetchall()
+            bookings = self._bookings_from_rows(rows)
+        return bookings[0] if bookings else None
+
+    def remove_booking(self, booking: Booking):
+        """Move a cancelled booking out of the bookings table and give its seat back
+
+        Cancelled rows are kept in cancelled_bookings, so their booking
+        numbers are never handed out again.
+        """
+        column = "economy_booked" if booking.travel_class == "economy" else "business_booked"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT INTO cancelled_bookings SELECT * FROM bookings WHERE booking_no = ?",
+                                   (booking.booking_no,))
+                self._conn.execute("DELETE FROM bookings WHERE booking_no = ?", (booking.booking_no,))
+                self._conn.execute(f"UPDATE flights SET {column} = {column} - 1 WHERE flight_no = ?",
+                                   (booking.flight.flight_no,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._free_seats([booking])
+
+    def _bookings_from_rows(self, rows) -> List[Booking]:
+        return [Booking(row[0], self._flight_from_row(row[10:]), Customer(*row[5:10]),
+                        row[1], row[2], row[3], row[4])
+                for row in rows]
+
+    def iter_bookings(self) -> Iterator[Booking]:
+        with self._lock:
+            rows = self._conn.execute(BOOKING_QUERY + " ORDER BY b.booking_no").fetchall()
+            return iter(self._bookings_from_rows(rows))
+
+    def booking_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+
+    def max_booking_no(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT MAX(COALESCE((SELECT MAX(booking_no) FROM bookings), 0), "
+                                      "COALESCE((SELECT MAX(booking_no) FROM cancelled_bookings), 0))"
+                                      ).fetchone()[0]
+
+    def list_bookings(self, departure_date: str = "", flight_no: str = "") -> List[Booking]:
+        clauses, params = [], []
+        if departure_date:
+            clauses.append("f.departure_date = ?")
+            params.append(departure_date)
+        if flight_no:
+            clauses.append("b.flight_no = ?")
+            params.append(flight_no)
+        sql = BOOKING_QUERY
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY b.booking_no"
+        with self._lock:
+            return self._bookings_from_rows(self._conn.execute(sql, params).fetchall())
+
+    def page_bookings(self, departure_date: str = "", flight_no: str = "",
+                      cursor: Optional[int] = None, limit: int = 50) -> BookingPage:
+        """Return one page of bookings; the cursor is the last booking number already returned"""
+        clauses, params = ["b.booking_no > ?"], [cursor or 0]
+        if departure_date:
+            clauses.append("f.departure_date = ?")
+            params.append(departure_date)
+        if flight_no:
+            clauses.append("b.flight_no = ?")
+            params.append(flight_no)
+        sql = BOOKING_QUERY + " WHERE " + " AND ".join(clauses) + " ORDER BY b.booking_no LIMIT ?"
+        with self._lock:
+            # One extra row tells us whether another page follows
+            bookings = self._bookings_from_rows(self._conn.execute(sql, (*params, limit + 1)).fetchall())
+        if len(bookings) > limit:
+            return BookingPage(bookings[:limit], bookings[limit - 1].booking_no)
+        return BookingPage(bookings, None)
+
+    def bookings_by_date(self) -> Dict[str, List[Booking]]:
+        """Group bookings by departure date with the grouping done by an indexed sort"""
+        grouped = {}
+        with self._lock:
+            rows = self._conn.execute(BOOKING_QUERY + " ORDER BY f.departure_date, b.booking_no").fetchall()
+            for booking in self._bookings_from_rows(rows):
+                grouped.setdefault(booking.flight.departure_date, []).append(booking)
+        return grouped
+
+    # Waitlist
+
+    def add_waitlist_entry(self, entry):
+        with self._lock:
+            self._conn.execute("INSERT INTO waitlist VALUES (?,?,?,?,?,?)", entry.to_row())
+
+    def remove_waitlist_entry(self, entry_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM waitlist WHERE entry_id = ?", (entry_id,))
+
+    def promote_waitlist_entry(self, entry_id: int, booking: Booking):
+        """Book a promoted waitlist entry's seat and drop the entry in one transaction"""
+        column = "economy_booked" if booking.travel_class == "economy" else "business_booked"
+        with self._lock:
+            self._book_seats([booking])
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM waitlist WHERE entry_id = ?", (entry_id,))
+                self._conn.execute(BOOKING_INSERT, booking.to_row())
+                self._conn.execute(f"UPDATE flights SET {column} = {column} + 1 WHERE flight_no = ?",
+                                   (booking.flight.flight_no,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._free_seats([booking])
+                raise
+
+    def iter_waitlist_rows(self) -> Iterator[list]:
+        """Return the saved waitlist entries as rows, in request order"""
+        with self._lock:
+            return iter(self._conn.execute("SELECT * FROM waitlist ORDER BY entry_id").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,422 @@
+import datetime
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+from history import HistoryArchive
+
+# Mutation types written to the log
+FLIGHT_ADDED = "flight_added"
+CUSTOMER_REGISTERED = "customer_registered"
+BOOKING_CONFIRMED = "booking_confirmed"
+BOOKING_CANCELLED = "booking_cancelled"
+WAITLIST_JOINED = "waitlist_joined"
+WAITLIST_LEFT = "waitlist_left"
+WAITLIST_PROMOTED = "waitlist_promoted"
+
+SNAPSHOT_FILE = "snapshot.jsonl"
+HISTORY_DIR = "history"
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+
+
+class CorruptLogError(Exception):
+    """Raised when a log record fails its checksum before the end of the log"""
+
+
+def _encode(record) -> bytes:
+    """Encode one record as a checksummed JSON line"""
+    payload = json.dumps(record, separators=(',', ':')).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def _decode(line: bytes):
+    """Decode a checksummed JSON line, returning None if it is torn or corrupt"""
+    if not line.endswith(b"\n") or len(line) < 10:
+        return None
+    checksum, payload = line[:8], line[9:-1]
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def _fsync_directory(directory):
+    """Make renames and new files in a directory durable (no-op where unsupported)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """Append-only mutation log with batched fsync and group commit
+
+    Records are numbered with a sequence and buffered in memory; a single
+    flusher thread writes whatever has accumulated and fsyncs once per
+    batch. In synchronous mode append() returns only after its record is
+    on disk, so concurrent writers share fsyncs (group commit). In
+    asynchronous mode append() returns at once and the flusher waits
+    flush_interval seconds between batches, bounding how much can be lost
+    in a crash without paying one fsync per record.
+
+    The log is split into segment files named after their first sequence
+    number, so everything covered by a snapshot can be dropped by deleting
+    whole segments.
+    """
+
+    def __init__(self, directory: str, next_seq: int = 1, synchronous: bool = True,
+                 flush_interval: float = 0.01, fsync: bool = True):
+        self.directory = directory
+        self.synchronous = synchronous
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._has_work = threading.Condition(self._lock)
+        self._durable = threading.Condition(self._lock)
+        self._io_lock = threading.Lock()
+        self._pending: List[bytes] = []
+        self._next_seq = next_seq
+        self._durable_seq = next_seq - 1
+        self._closed = False
+
+        self._file = self._open_segment(next_seq)
+        self._flusher = threading.Thread(target=self._run, name="wal-flusher", daemon=True)
+        self._flusher.start()
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the most recently appended record"""
+        with self._lock:
+            return self._next_seq - 1
+
+    def _open_segment(self, first_seq):
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{first_seq:012d}{SEGMENT_SUFFIX}")
+        segment = open(path, "ab")
+        _fsync_directory(self.directory)
+        return segment
+
+    def append(self, op: str, payload) -> int:
+        """Append a mutation and return its sequence number"""
+        with self._lock:
+            if self._closed:
+                raise ValueError("write-ahead log is closed")
+            seq = self._next_seq
+            self._next_seq += 1
+            self._pending.append(_encode([seq, op, payload]))
+            self._has_work.notify()
+
+        if self.synchronous:
+            self.wait(seq)
+        return seq
+
+    def append_many(self, op: str, payloads) -> int:
+        """Append several mutations as one batch and return the last sequence number"""
+        with self._lock:
+            if self._closed:
+                raise ValueError("write-ahead log is closed")
+            for payload in payloads:
+                self._pending.append(_encode([self._next_seq, op, payload]))
+                self._next_seq += 1
+            seq = self._next_seq - 1
+            self._has_work.notify()
+
+        if self.synchronous:
+            self.wait(seq)
+        return seq
+
+    def wait(self, seq: int):
+        """Block until the record with this sequence number is durable"""
+        with self._lock:
+            while self._durable_seq < seq:
+                self._durable.wait()
+
+    def flush(self):
+        """Write and fsync everything appended so far"""
+        self._write_pending()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._has_work.wait()
+                if self._closed and not self._pending:
+                    return
+            if not self.synchronous and self.flush_interval:
+                # Let more records accumulate so one fsync covers them all
+                time.sleep(self.flush_interval)
+            self._write_pending()
+
+    def _write_pending(self):
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                last = self._next_seq - 1
+            if batch:
+                self._file.write(b"".join(batch))
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+            with self._lock:
+                if last > self._durable_seq:
+                    self._durable_seq = last
+                self._durable.notify_all()
+
+    def rotate(self) -> int:
+        """Flush, start a new segment and return the last sequence in the old ones"""
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                last = self._next_seq - 1
+            if batch:
+                self._file.write(b"".join(batch))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = self._open_segment(last + 1)
+            with self._lock:
+                self._durable_seq = max(self._durable_seq, last)
+                self._durable.notify_all()
+        return last
+
+    def close(self):
+        """Flush outstanding records and stop the flusher thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._has_work.notify()
+        self._flusher.join()
+        self._write_pending()
+        self._file.close()
+
+
+def list_segments(directory) -> List[Tuple[int, str]]:
+    """Return (first_seq, path) for every log segment, oldest first"""
+    segments = []
+    for name in os.listdir(directory):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            first_seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            segments.append((first_seq, os.path.join(directory, name)))
+    return sorted(segments)
+
+
+def repair_tail(directory) -> int:
+    """Truncate a torn or corrupt record off the end of the newest segment
+
+    A crash mid-write can only damage the end of the newest segment; the
+    valid prefix is kept and the number of bytes dropped is returned.
+    """
+    segments = list_segments(directory)
+    if not segments:
+        return 0
+    path = segments[-1][1]
+    valid_length = 0
+    with open(path, "rb") as segment:
+        for line in segment:
+            if _decode(line) is None:
+                break
+            valid_length += len(line)
+    size = os.path.getsize(path)
+    if valid_length < size:
+        with open(path, "r+b") as segment:
+            segment.truncate(valid_length)
+            os.fsync(segment.fileno())
+    return size - valid_length
+
+
+def read_log(directory, after_seq: int = 0) -> Iterator[list]:
+    """Yield [seq, op, payload] records newer than after_seq"""
+    for _, path in list_segments(directory):
+        with open(path, "rb") as segment:
+            for line in segment:
+                record = _decode(line)
+                if record is None:
+                    raise CorruptLogError(f"corrupt record in {path}")
+                if record[0] > after_seq:
+                    yield record
+
+
+class DurableStore:
+    """Write-ahead log plus periodic snapshots for a ReservationService
+
+    Every mutation is appended to the log. After snapshot_every records the
+    whole state is written to a compact snapshot and the log segments it
+    covers are deleted, so startup loads one snapshot and replays at most
+    snapshot_every records regardless of how long the system has run.
+
+    With archive_after_days set the store loads lazily: each snapshot
+    moves flights that departed more than that many days before today,
+    with their bookings, into a history.HistoryArchive under
+    <directory>/history and drops them from the service, and only the
+    active and future flights go into the snapshot. Startup then loads
+    those and maps the archive, so it takes the same time however much
+    history has built up; the service reads departed flights and their
+    bookings from the archive when asked for them. Waitlist entries of
+    archived flights are dropped, since they can no longer be served.
+
+    The snapshot header records the setting and the archive's state, so
+    a store opened on the same directory without archive_after_days
+    (a tool such as bulk_import or export) still archives with it, or at
+    least reads the archive and carries its state into its own
+    snapshots instead of losing it.
+    """
+
+    def __init__(self, directory: str, snapshot_every: int = 10000, synchronous: bool = True,
+                 flush_interval: float = 0.01, fsync: bool = True, archive_after_days: Optional[int] = None):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.synchronous = synchronous
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.wal: Optional[WriteAheadLog] = None
+        self.snapshot_seq = 0
+        self._since_snapshot = 0
+        self._count_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        header = self._read_header()
+        if archive_after_days is None:
+            archive_after_days = header.get('archive_after_days')
+        self.archive_after_days = archive_after_days
+        self.history: Optional[HistoryArchive] = None
+        if archive_after_days is not None or 'history' in header:
+            self.history = HistoryArchive(os.path.join(directory, HISTORY_DIR))
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, SNAPSHOT_FILE)
+
+    def load(self, service):
+        """Restore the latest snapshot and log tail into service, then open the log"""
+        last_seq = self.snapshot_seq = self._read_snapshot(service)
+        repair_tail(self.directory)
+        replayed = 0
+        for seq, op, payload in read_log(self.directory, after_seq=last_seq):
+            service.apply_event(op, payload)
+            last_seq = seq
+            replayed += 1
+
+        # Appends always go to a new segment after the replayed ones
+        self.wal = WriteAheadLog(self.directory, next_seq=last_seq + 1,
+                                 synchronous=self.synchronous,
+                                 flush_interval=self.flush_interval, fsync=self.fsync)
+        self._since_snapshot = replayed
+        return replayed
+
+    def append(self, op: str, payload) -> int:
+        """Log one mutation and return its sequence number"""
+        with self._count_lock:
+            self._since_snapshot += 1
+        return self.wal.append(op, payload)
+
+    def append_many(self, op: str, payloads) -> int:
+        """Log a batch of mutations with one commit and return the last sequence number"""
+        with self._count_lock:
+            self._since_snapshot += len(payloads)
+        return self.wal.append_many(op, payloads)
+
+    def needs_snapshot(self) -> bool:
+        return bool(self.snapshot_every) and self._since_snapshot >= self.snapshot_every
+
+    def snapshot(self, service):
+        """Write the service state to a new snapshot and drop the log it covers
+
+        The caller must stop mutations while this runs so the snapshot
+        matches the last logged sequence number.
+        """
+        seq = self.wal.rotate()
+        header = {'seq': seq, 'format': 1, 'archive_after_days': self.archive_after_days}
+        if self.history is not None:
+            if self.archive_after_days is not None:
+                self._archive_departed(service, seq)
+            header['history'] = self.history.state()
+        # The counters cover numbers last used by since-cancelled bookings
+        # and promoted entries, which the records below no longer show
+        header['booking_no'] = service.booking_numbers.last
+        header['waitlist_id'] = service.waitlist.entry_ids.last
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(_encode(header))
+            for flight in service.iter_flights():
+                out.write(_encode(["F", flight.to_row()]))
+            for customer in service.iter_customers():
+                out.write(_encode(["C", customer.to_row()]))
+            for booking in service.iter_bookings():
+                out.write(_encode(["B", booking.to_row()]))
+            for entry in service.waitlist.iter_entries():
+                out.write(_encode(["W", entry.to_row()]))
+            out.flush()
+            if self.fsync:
+                os.fsync(out.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_directory(self.directory)
+
+        for first_seq, path in list_segments(self.directory):
+            if first_seq <= seq:
+                os.remove(path)
+        if self.history is not None:
+            self.history.prune()
+        self.snapshot_seq = seq
+        self._since_snapshot = 0
+        return seq
+
+    def _archive_departed(self, service, seq):
+        """Move flights past the archive age into the history archive, then out of the service"""
+        cutoff = (datetime.date.today() - datetime.timedelta(days=self.archive_after_days)).isoformat()
+        departed = [flight for flight in service.iter_flights() if flight.departure_date < cutoff]
+        if not departed:
+            return
+        self.history.append(seq, [(flight, service.list_bookings(flight_no=flight.flight_no))
+                                  for flight in departed], fsync=self.fsync)
+        _fsync_directory(self.history.directory)
+        service.evict_flights(departed)
+
+    def _read_header(self) -> dict:
+        """The latest snapshot's header, or {} before the first snapshot"""
+        if not os.path.exists(self.snapshot_path):
+            return {}
+        with open(self.snapshot_path, "rb") as snapshot:
+            # A corrupt header is reported when the snapshot is loaded
+            return _decode(snapshot.readline()) or {}
+
+    def _read_snapshot(self, service) -> int:
+        if not os.path.exists(self.snapshot_path):
+            if self.history is not None:
+                self.history.open(None)
+            return 0
+        events = {"F": FLIGHT_ADDED, "C": CUSTOMER_REGISTERED, "B": BOOKING_CONFIRMED, "W": WAITLIST_JOINED}
+        with open(self.snapshot_path, "rb") as snapshot:
+            header = _decode(snapshot.readline())
+            if header is None:
+                raise CorruptLogError(f"corrupt snapshot header in {self.snapshot_path}")
+            if self.history is not None:
+                self.history.open(header.get('history'))
+            for line in snapshot:
+                record = _decode(line)
+                if record is None:
+                    raise CorruptLogError(f"corrupt record in {self.snapshot_path}")
+                service.apply_event(events[record[0]], record[1])
+        service.booking_numbers.observe(header.get('booking_no', 0))
+        service.waitlist.entry_ids.observe(header.get('waitlist_id', 0))
+        return header['seq']
+
+    def flush(self):
+        if self.wal:
+            self.wal.flush()
+
+    def close(self):
+        if self.wal:
+            self.wal.close()
@@ -0,0 +1,119 @@
+import datetime
+from functools import lru_cache
+
+# Route network served by the reservation system. Flights may join any
+# two airports; ORIGIN is the hub used when no origin is given
+ORIGIN = "JFK"
+DESTINATIONS = ("Orlando", "Miami", "Los Angeles")
+AIRPORTS = (ORIGIN,) + DESTINATIONS
+TRAVEL_CLASSES = ("economy", "business")
+
+# Scheduled block time per route in minutes, either direction, used when
+# a flight does not give its own duration
+BLOCK_MINUTES = {
+    frozenset(("JFK", "Orlando")): 165,
+    frozenset(("JFK", "Miami")): 190,
+    frozenset(("JFK", "Los Angeles")): 380,
+    frozenset(("Orlando", "Miami")): 65,
+    frozenset(("Orlando", "Los Angeles")): 320,
+    frozenset(("Miami", "Los Angeles")): 340,
+}
+DEFAULT_BLOCK_MINUTES = 180
+
+# Distinct dates and times seen by the parsers below; a few years of
+# schedule is well under this many, so hot values never fall out
+PARSE_CACHE_SIZE = 4096
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_date(date_str):
+    """Parse a YYYY-MM-DD date, returning a datetime.date or None if invalid
+
+    Slices the fixed-width fields instead of going through strptime and
+    its locale-aware regex machinery, and remembers recent results.
+    """
+    if (len(date_str) != 10 or date_str[4] != '-' or date_str[7] != '-'
+            or not date_str.isascii()):
+        return None
+    year, month, day = date_str[:4], date_str[5:7], date_str[8:]
+    if not (year.isdigit() and month.isdigit() and day.isdigit()):
+        return None
+    try:
+        return datetime.date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_time(time_str):
+    """Parse an HH:MM time, returning minutes after midnight or None if invalid"""
+    if len(time_str) != 5 or time_str[2] != ':' or not time_str.isascii():
+        return None
+    hours, minutes = time_str[:2], time_str[3:]
+    if not (hours.isdigit() and minutes.isdigit()):
+        return None
+    hours, minutes = int(hours), int(minutes)
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+def departure_minutes(date_str, time_str):
+    """Return a departure as minutes since 1970-01-01 00:00 local time, or None if invalid"""
+    date, minutes = parse_date(date_str), parse_time(time_str)
+    if date is None or minutes is None:
+        return None
+    return (date.toordinal() - _EPOCH_ORDINAL) * 1440 + minutes
+
+
+def format_minutes(minutes):
+    """Format minutes since the epoch, as from departure_minutes(), as 'YYYY-MM-DD HH:MM'"""
+    day, minute = divmod(minutes, 1440)
+    return f"{datetime.date.fromordinal(_EPOCH_ORDINAL + day).isoformat()} {minute // 60:02d}:{minute % 60:02d}"
+
+
+def block_minutes(departure_from, arrival_to):
+    """Scheduled flying time between two airports, in minutes"""
+    return BLOCK_MINUTES.get(frozenset((departure_from, arrival_to)), DEFAULT_BLOCK_MINUTES)
+
+
+def airport_name(name):
+    """Return the served airport matching a name in any letter case, or None"""
+    for airport in AIRPORTS:
+        if airport.lower() == name.strip().lower():
+            return airport
+    return None
+
+
+def validate_date(date_str):
+    """Validate date format (YYYY-MM-DD)"""
+    return parse_date(date_str) is not None
+
+
+def validate_time(time_str):
+    """Validate time format (HH:MM)"""
+    return parse_time(time_str) is not None
+
+
+def is_valid_flight_no(flight_no):
+    """Check the JFKxxx flight number format"""
+    return flight_no.startswith(ORIGIN) and flight_no[3:].isdigit() and len(flight_no) == 6
+
+
+def is_valid_customer_id(customer_id):
+    """Check the Cxxx customer ID format"""
+    return customer_id.startswith('C') and customer_id[1:].isdigit() and len(customer_id) == 4
+
+
+def is_valid_telephone(telephone):
+    """Check the telephone number is at least 7 digits"""
+    return telephone.isdigit() and len(telephone) >= 7
+
+
+def parse_booking_id(booking_id):
+    """Return the number of a Bxxx booking ID, or None if the format is wrong"""
+    if len(booking_id) >= 4 and booking_id[0] in "Bb" and booking_id[1:].isdigit():
+        return int(booking_id[1:])
+    return None
@@ -0,0 +1,118 @@
+import heapq
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from concurrency import SequenceGenerator
+
+# Priority given to a waitlist request when none is specified; lower
+# numbers are promoted first
+DEFAULT_PRIORITY = 100
+
+
+class WaitlistEntry:
+    """A passenger waiting for a seat in one class of one flight"""
+
+    __slots__ = ('entry_id', 'flight', 'customer', 'travel_class', 'priority', 'requested_at')
+
+    def __init__(self, entry_id, flight, customer, travel_class, priority, requested_at):
+        self.entry_id = entry_id
+        self.flight = flight
+        self.customer = customer
+        self.travel_class = travel_class
+        self.priority = priority
+        # Minutes since the Unix epoch
+        self.requested_at = requested_at
+
+    def __repr__(self):
+        return (f"WaitlistEntry({self.entry_id!r}, {self.flight.flight_no!r}, "
+                f"{self.customer.customer_id!r}, priority={self.priority})")
+
+    def to_row(self):
+        """Return the entry as a list, referencing its flight and customer by ID"""
+        return [self.entry_id, self.flight.flight_no, self.customer.customer_id, self.travel_class,
+                self.priority, self.requested_at]
+
+
+class Waitlist:
+    """Per-flight, per-class waitlists kept as heaps keyed by (priority, entry_id)
+
+    Entry IDs are handed out in request order, so among equal priorities
+    the earliest request is promoted first. Adding and promoting cost
+    O(log n). A withdrawn entry is dropped from the index straight away
+    and its heap slot is discarded when it reaches the top.
+
+    The service only changes a flight's waitlist while holding that
+    flight's lock, so a freed seat and the promotion it triggers are one
+    atomic step.
+    """
+
+    def __init__(self, entry_ids: Optional[SequenceGenerator] = None):
+        self.entry_ids = entry_ids if entry_ids is not None else SequenceGenerator()
+        self._entries: Dict[int, WaitlistEntry] = {}
+        self._heaps: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+        self._waiting: Dict[Tuple[str, str], int] = {}
+        # (flight_no, class, customer_id) -> entry_id, one request per passenger
+        self._requests: Dict[Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry: WaitlistEntry):
+        key = (entry.flight.flight_no, entry.travel_class)
+        with self._lock:
+            self._entries[entry.entry_id] = entry
+            self._requests[key + (entry.customer.customer_id,)] = entry.entry_id
+            heapq.heappush(self._heaps.setdefault(key, []), (entry.priority, entry.entry_id))
+            self._waiting[key] = self._waiting.get(key, 0) + 1
+        self.entry_ids.observe(entry.entry_id)
+
+    def get(self, entry_id: int) -> Optional[WaitlistEntry]:
+        return self._entries.get(entry_id)
+
+    def find(self, flight_no: str, travel_class: str, customer_id: str) -> Optional[WaitlistEntry]:
+        """Return a passenger's waiting entry for a class of a flight, or None"""
+        entry_id = self._requests.get((flight_no, travel_class, customer_id))
+        return None if entry_id is None else self._entries.get(entry_id)
+
+    def remove(self, entry_id: int) -> Optional[WaitlistEntry]:
+        """Withdraw an entry, returning it, or None if it is no longer waiting"""
+        with self._lock:
+            entry = self._entries.pop(entry_id, None)
+            if entry is not None:
+                key = (entry.flight.flight_no, entry.travel_class)
+                self._waiting[key] -= 1
+                del self._requests[key + (entry.customer.customer_id,)]
+        return entry
+
+    def peek(self, flight_no: str, travel_class: str) -> Optional[WaitlistEntry]:
+        """Return the entry that would be promoted next, without removing it"""
+        with self._lock:
+            heap = self._heaps.get((flight_no, travel_class))
+            while heap:
+                entry = self._entries.get(heap[0][1])
+                if entry is not None:
+                    return entry
+                heapq.heappop(heap)
+        return None
+
+    def waiting(self, flight_no: str, travel_class: str) -> int:
+        """Number of passengers waiting for a class of a flight"""
+        return self._waiting.get((flight_no, travel_class), 0)
+
+    def position(self, entry_id: int) -> Optional[int]:
+        """1-based place of an entry in its queue, or None if it is not waiting"""
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return None
+        with self._lock:
+            heap = self._heaps[entry.flight.flight_no, entry.travel_class]
+            ahead = sum(1 for priority, other_id in heap
+                        if (priority, other_id) < (entry.priority, entry_id) and other_id in self._entries)
+        return ahead + 1
+
+    def iter_entries(self) -> Iterator[WaitlistEntry]:
+        """Iterate over every waiting entry in request order"""
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda entry: entry.entry_id)
+        return iter(entries)